@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+from collections import deque
+from typing import Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Set ADMISSION_ENABLED=0 to turn load shedding off
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") != "0"
+# Seconds a rejected client is asked to wait before retrying
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "2"))
+
+# Per route class: (concurrent requests, queued requests, seconds a request may wait)
+ADMISSION_DEFAULTS = {
+    "auth": (4, 50, 3.0),      # bcrypt hashing and verifying
+    "render": (8, 100, 2.0),   # full-list pages and reports
+    "write": (4, 50, 5.0),     # everything else that changes data
+}
+
+# Routes that hash or verify passwords
+AUTH_ROUTES = {
+    ("POST", "/login"),
+    ("POST", "/register"),
+    ("POST", "/users"),
+    ("POST", "/profile/change-password"),
+}
+# Pages and endpoints that render or serialize whole tables
+RENDER_ROUTES = {"/", "/home", "/employees", "/users", "/api/employees", "/api/users"}
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Route class for a request, or None for cheap routes that are never limited"""
+    if (method, path) in AUTH_ROUTES or (method == "POST" and path.endswith("/reset-password")):
+        return "auth"
+    if method == "POST":
+        return "write"
+    if method in ("GET", "HEAD") and (path in RENDER_ROUTES or path.startswith("/api/reports/")):
+        return "render"
+    return None
+
+class RouteClassLimiter:
+    """Concurrency limit with a bounded FIFO wait queue and a wait deadline"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters = deque()
+        self.counts = {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0, "max_queue_depth": 0}
+
+    def reset(self):
+        """Drop loop-bound state (called on startup)"""
+        self.active = 0
+        self._waiters.clear()
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting in line up to max_wait; False means shed the request"""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.counts["admitted"] += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.counts["rejected_queue_full"] += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.counts["max_queue_depth"] = max(self.counts["max_queue_depth"], len(self._waiters))
+        try:
+            # release() hands its slot straight to the first waiter
+            await asyncio.wait_for(waiter, self.max_wait)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.counts["rejected_timeout"] += 1
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            self._discard(waiter)
+            raise
+        self.counts["admitted"] += 1
+        return True
+
+    def _discard(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "max_wait": self.max_wait,
+            "active": self.active,
+            "queued": len(self._waiters),
+            **self.counts,
+        }
+
+def _load_limiters() -> dict:
+    limiters = {}
+    for name, (limit, queue_size, max_wait) in ADMISSION_DEFAULTS.items():
+        prefix = f"ADMISSION_{name.upper()}"
+        limiters[name] = RouteClassLimiter(
+            name,
+            int(os.getenv(f"{prefix}_LIMIT", str(limit))),
+            int(os.getenv(f"{prefix}_QUEUE", str(queue_size))),
+            float(os.getenv(f"{prefix}_WAIT", str(max_wait))),
+        )
+    return limiters
+
+limiters = _load_limiters()
+
+def reset():
+    for limiter in limiters.values():
+        limiter.reset()
+
+def get_admission_stats() -> dict:
+    return {"enabled": ADMISSION_ENABLED, **{name: limiter.stats() for name, limiter in limiters.items()}}
+
+async def _send_busy(scope, send, route_class: str):
+    """Fast 503 telling the client when to come back"""
+    headers = dict((key.decode().lower(), value.decode()) for key, value in scope.get("headers", []))
+    if "text/html" in headers.get("accept", ""):
+        body = b"<h1>Server busy</h1><p>Too many requests right now. Please try again in a moment.</p>"
+        content_type = b"text/html; charset=utf-8"
+    else:
+        body = json.dumps({"detail": f"Server busy ({route_class}), retry shortly"}).encode()
+        content_type = b"application/json"
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", content_type),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(ADMISSION_RETRY_AFTER).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class AdmissionMiddleware:
+    """ASGI middleware that limits concurrent expensive requests per route class"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_ENABLED:
+            return await self.app(scope, receive, send)
+        route_class = classify(scope["method"], scope["path"])
+        if route_class is None:
+            return await self.app(scope, receive, send)
+
+        limiter = limiters[route_class]
+        if not await limiter.acquire():
+            return await _send_busy(scope, send, route_class)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -0,0 +1,411 @@
+"""Incremental columnar exports of the Employee and Log tables for analytics.
+
+Each dataset lives in ANALYTICS_DIR/<dataset>/:
+
+    base-000012.parquet     full data as of the last compaction
+    delta-000013.parquet    rows changed since the previous export
+    manifest.json           files in load order, schema and watermark
+
+Employee files are upserts keyed by employee_id; rows with `_deleted` true
+are deletions. Log files are append-only, keyed by log_id.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+import sqlalchemy
+from dotenv import load_dotenv
+import app.db as db
+from app.jobs import job_type, submit_job, JobContext
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Set ANALYTICS_ENABLED=0 to stop exporting (and recording deletions for export)
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "1") != "0"
+ANALYTICS_DIR = os.getenv("ANALYTICS_DIR", os.path.join("data", "analytics"))
+# Rows per database read and per Parquet row group
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "5000"))
+# Minutes between scheduled exports (0 turns the schedule off)
+ANALYTICS_INTERVAL_MINUTES = float(os.getenv("ANALYTICS_INTERVAL_MINUTES", "60"))
+# Deltas kept before they are compacted into a new base file
+ANALYTICS_COMPACT_AFTER = int(os.getenv("ANALYTICS_COMPACT_AFTER", "24"))
+# Employee rows changed this recently wait for the next run, so a write whose
+# updated_at is slightly older than one already exported is never skipped
+ANALYTICS_SETTLE_SECONDS = 10
+ANALYTICS_CHECK_SECONDS = 60
+ANALYTICS_LOCK_SECONDS = 3600
+ANALYTICS_STATE_PREFIX = "analytics:"
+ANALYTICS_DATASETS = ("employees", "logs")
+
+def _arrow_type(column):
+    import pyarrow as pa
+    column_type = column.type
+    if isinstance(column_type, sqlalchemy.Boolean):
+        return pa.bool_()
+    if isinstance(column_type, sqlalchemy.Integer):
+        return pa.int64()
+    if isinstance(column_type, sqlalchemy.Float):
+        return pa.float64()
+    if isinstance(column_type, sqlalchemy.DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, sqlalchemy.Date):
+        return pa.date32()
+    return pa.string()
+
+def table_schema(table: sqlalchemy.Table, with_deleted: bool = False):
+    """Arrow schema for a table, derived from the SQLAlchemy metadata"""
+    import pyarrow as pa
+    fields = [pa.field(column.name, _arrow_type(column)) for column in table.columns]
+    if with_deleted:
+        fields.append(pa.field("_deleted", pa.bool_(), nullable=False))
+    return pa.schema(fields)
+
+def _to_array(values: list, arrow_type):
+    import pyarrow as pa
+    if pa.types.is_date32(arrow_type) or pa.types.is_timestamp(arrow_type):
+        # SQLite hands dates and datetimes back as ISO text
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string()).cast(arrow_type)
+    if pa.types.is_boolean(arrow_type):
+        return pa.array([None if value is None else bool(value) for value in values], type=arrow_type)
+    return pa.array(values, type=arrow_type)
+
+def to_record_batch(rows, schema, deleted: bool = False):
+    """Record batch from database rows (missing columns become nulls)"""
+    import pyarrow as pa
+    arrays = []
+    for field in schema:
+        if field.name == "_deleted":
+            arrays.append(pa.array([deleted] * len(rows), type=pa.bool_()))
+        else:
+            arrays.append(_to_array([row[field.name] if field.name in row else None for row in rows], field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def conform_batch(batch, schema):
+    """Line a record batch read from an older file up with the current schema.
+
+    Columns are selected and cast as whole Arrow arrays; columns the file
+    predates become nulls.
+    """
+    import pyarrow as pa
+    arrays = []
+    for field in schema:
+        index = batch.schema.get_field_index(field.name)
+        if index < 0:
+            arrays.append(pa.nulls(batch.num_rows, type=field.type))
+        else:
+            arrays.append(batch.column(index).cast(field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+class ParquetSink:
+    """Writes record batches to `<path>.part` and renames it into place on close"""
+
+    def __init__(self, path: str, schema):
+        self.path = path
+        self.schema = schema
+        self.rows = 0
+        self._writer = None
+
+    async def write(self, batch):
+        import pyarrow.parquet as pq
+        if batch.num_rows == 0:
+            return
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._writer = pq.ParquetWriter(self.path + ".part", self.schema, compression="zstd")
+        # Encoding and compression are CPU work; keep them off the event loop
+        await asyncio.to_thread(self._writer.write_batch, batch)
+        self.rows += batch.num_rows
+
+    def close(self) -> Optional[str]:
+        """File name if anything was written, else None"""
+        if self._writer is None:
+            return None
+        self._writer.close()
+        os.replace(self.path + ".part", self.path)
+        return os.path.basename(self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            os.remove(self.path + ".part")
+
+def dataset_dir(dataset: str) -> str:
+    return os.path.join(ANALYTICS_DIR, dataset)
+
+def _file_path(dataset: str, kind: str, seq: int) -> str:
+    return os.path.join(dataset_dir(dataset), f"{kind}-{seq:06d}.parquet")
+
+async def get_state(dataset: str) -> dict:
+    """Watermark and file list for a dataset (kept in SharedState)"""
+    value = await db.get_shared_value(ANALYTICS_STATE_PREFIX + dataset)
+    state = json.loads(value) if value else {}
+    state.setdefault("seq", 0)
+    state.setdefault("files", [])
+    state.setdefault("watermark", {})
+    return state
+
+async def _save_state(dataset: str, state: dict, schema):
+    state["exported_at"] = time.time()
+    await db.set_shared_value(ANALYTICS_STATE_PREFIX + dataset, json.dumps(state))
+    # Same information for consumers, written atomically next to the files
+    manifest = {
+        "dataset": dataset,
+        "key": "employee_id" if dataset == "employees" else "log_id",
+        "files": state["files"],
+        "watermark": state["watermark"],
+        "exported_at": state["exported_at"],
+        "schema": [{"name": field.name, "type": str(field.type)} for field in schema],
+    }
+    path = os.path.join(dataset_dir(dataset), "manifest.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".part", "w", encoding="utf-8") as output:
+        json.dump(manifest, output, indent=2)
+    os.replace(path + ".part", path)
+
+def _remove_files(dataset: str, names: List[str]):
+    for name in names:
+        try:
+            os.remove(os.path.join(dataset_dir(dataset), name))
+        except FileNotFoundError:
+            pass
+
+async def export_employee_changes() -> dict:
+    """Write employees changed (or deleted) since the watermark as one delta file"""
+    state = await get_state("employees")
+    watermark = state["watermark"]
+    updated_at = watermark.get("updated_at") or ""
+    employee_id = watermark.get("employee_id", 0)
+    tombstone_id = watermark.get("tombstone_id", 0)
+    settled = str(datetime.utcnow() - timedelta(seconds=ANALYTICS_SETTLE_SECONDS))
+
+    seq = state["seq"] + 1
+    schema = table_schema(db.employees_table, with_deleted=True)
+    # The sequence number only advances once the watermark is saved, so a
+    # crashed run rewrites the same delta file instead of adding a second one
+    sink = ParquetSink(_file_path("employees", "delta", seq), schema)
+    try:
+        while True:
+            rows = await db.database.fetch_all(
+                """
+                SELECT * FROM Employee
+                WHERE (updated_at, employee_id) > (:updated_at, :employee_id) AND updated_at <= :settled
+                ORDER BY updated_at, employee_id LIMIT :limit
+                """,
+                {"updated_at": updated_at, "employee_id": employee_id, "settled": settled, "limit": ANALYTICS_BATCH_SIZE}
+            )
+            if not rows:
+                break
+            await sink.write(to_record_batch(rows, schema))
+            updated_at, employee_id = str(rows[-1]["updated_at"]), rows[-1]["employee_id"]
+
+        # Deletions go last so an update and delete in the same window end deleted
+        while True:
+            rows = await db.database.fetch_all(
+                """
+                SELECT tombstone_id, employee_id FROM AnalyticsTombstone
+                WHERE tombstone_id > :tombstone_id ORDER BY tombstone_id LIMIT :limit
+                """,
+                {"tombstone_id": tombstone_id, "limit": ANALYTICS_BATCH_SIZE}
+            )
+            if not rows:
+                break
+            await sink.write(to_record_batch(rows, schema, deleted=True))
+            tombstone_id = rows[-1]["tombstone_id"]
+    except BaseException:
+        sink.abort()
+        raise
+
+    name = sink.close()
+    if name is None:
+        return {"rows": 0, "file": None}
+    state["seq"] = seq
+    state["files"].append(name)
+    state["watermark"] = {"updated_at": updated_at, "employee_id": employee_id, "tombstone_id": tombstone_id}
+    await _save_state("employees", state, schema)
+    return {"rows": sink.rows, "file": name}
+
+async def export_log_changes() -> dict:
+    """Append Log rows past the log_id watermark as one delta file"""
+    state = await get_state("logs")
+    log_id = state["watermark"].get("log_id", 0)
+    seq = state["seq"] + 1
+    schema = table_schema(db.logs_table)
+    sink = ParquetSink(_file_path("logs", "delta", seq), schema)
+    try:
+        while True:
+            rows = await db.database.fetch_all(
+                "SELECT * FROM Log WHERE log_id > :log_id ORDER BY log_id LIMIT :limit",
+                {"log_id": log_id, "limit": ANALYTICS_BATCH_SIZE}
+            )
+            if not rows:
+                break
+            await sink.write(to_record_batch(rows, schema))
+            log_id = rows[-1]["log_id"]
+    except BaseException:
+        sink.abort()
+        raise
+
+    name = sink.close()
+    if name is None:
+        return {"rows": 0, "file": None}
+    state["seq"] = seq
+    state["files"].append(name)
+    state["watermark"] = {"log_id": log_id}
+    await _save_state("logs", state, schema)
+    return {"rows": sink.rows, "file": name}
+
+async def compact_employees() -> dict:
+    """Replace base + deltas with one base file read from the current table"""
+    state = await get_state("employees")
+    seq = state["seq"] + 1
+    schema = table_schema(db.employees_table, with_deleted=True)
+    sink = ParquetSink(_file_path("employees", "base", seq), schema)
+    last_id = 0
+    try:
+        while True:
+            rows = await db.database.fetch_all(
+                "SELECT * FROM Employee WHERE employee_id > :last_id ORDER BY employee_id LIMIT :limit",
+                {"last_id": last_id, "limit": ANALYTICS_BATCH_SIZE}
+            )
+            if not rows:
+                break
+            await sink.write(to_record_batch(rows, schema))
+            last_id = rows[-1]["employee_id"]
+    except BaseException:
+        sink.abort()
+        raise
+
+    old_files = state["files"]
+    name = sink.close()
+    state["seq"] = seq
+    state["files"] = [name] if name else []
+    # Rows changed during the scan are in the base and may appear again in
+    # the next delta, which is harmless for upserts
+    await _save_state("employees", state, schema)
+    _remove_files("employees", old_files)
+    # Deletions up to the watermark are now reflected in the base
+    await db.database.execute(
+        "DELETE FROM AnalyticsTombstone WHERE tombstone_id <= :tombstone_id",
+        {"tombstone_id": state["watermark"].get("tombstone_id", 0)}
+    )
+    return {"rows": sink.rows, "file": name, "replaced": len(old_files)}
+
+async def compact_logs() -> dict:
+    """Concatenate base + deltas into one base file, a row group at a time"""
+    import pyarrow.parquet as pq
+    state = await get_state("logs")
+    seq = state["seq"] + 1
+    schema = table_schema(db.logs_table)
+    sink = ParquetSink(_file_path("logs", "base", seq), schema)
+    try:
+        for old in state["files"]:
+            parquet_file = pq.ParquetFile(os.path.join(dataset_dir("logs"), old))
+            for batch in parquet_file.iter_batches(batch_size=ANALYTICS_BATCH_SIZE):
+                await sink.write(conform_batch(batch, schema))
+    except BaseException:
+        sink.abort()
+        raise
+
+    old_files = state["files"]
+    name = sink.close()
+    state["seq"] = seq
+    state["files"] = [name] if name else []
+    await _save_state("logs", state, schema)
+    _remove_files("logs", old_files)
+    return {"rows": sink.rows, "file": name, "replaced": len(old_files)}
+
+async def run_export(compact: bool = False) -> dict:
+    """Export the deltas for every dataset, compacting those with too many files"""
+    results = {}
+    for dataset, export, compactor in (
+        ("employees", export_employee_changes, compact_employees),
+        ("logs", export_log_changes, compact_logs),
+    ):
+        result = {"delta": await export()}
+        state = await get_state(dataset)
+        if compact or len(state["files"]) > ANALYTICS_COMPACT_AFTER:
+            result["compaction"] = await compactor()
+        results[dataset] = result
+    return results
+
+async def _acquire_lock(owner: str) -> bool:
+    """Cross-worker export lock in SharedState, expiring in case its holder died"""
+    now = time.time()
+    await db.database.execute(
+        """
+        INSERT INTO SharedState (key, value, expires_at) VALUES (:key, :owner, :expires_at)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+        WHERE SharedState.expires_at < :now
+        """,
+        {"key": ANALYTICS_STATE_PREFIX + "lock", "owner": owner, "expires_at": now + ANALYTICS_LOCK_SECONDS, "now": now}
+    )
+    return await db.get_shared_value(ANALYTICS_STATE_PREFIX + "lock") == owner
+
+async def _release_lock(owner: str):
+    await db.database.execute(
+        "DELETE FROM SharedState WHERE key = :key AND value = :owner",
+        {"key": ANALYTICS_STATE_PREFIX + "lock", "owner": owner}
+    )
+
+@job_type("analytics_export", roles=("admin",))
+async def run_analytics_export(ctx: JobContext) -> dict:
+    """Incremental Parquet export of employees and logs"""
+    if not await _acquire_lock(ctx.job_id):
+        raise RuntimeError("Another analytics export is running")
+    try:
+        await ctx.progress(0, message="Exporting changes")
+        return await run_export(compact=bool(ctx.params.get("compact")))
+    finally:
+        await _release_lock(ctx.job_id)
+
+async def get_analytics_status() -> dict:
+    return {
+        "enabled": ANALYTICS_ENABLED,
+        "directory": ANALYTICS_DIR,
+        "datasets": {dataset: await get_state(dataset) for dataset in ANALYTICS_DATASETS},
+    }
+
+async def schedule_analytics():
+    """Queue one export per interval; the fixed job id stops workers doubling up"""
+    if not ANALYTICS_ENABLED or ANALYTICS_INTERVAL_MINUTES <= 0:
+        return
+    interval = ANALYTICS_INTERVAL_MINUTES * 60
+    while True:
+        await asyncio.sleep(ANALYTICS_CHECK_SECONDS)
+        try:
+            period = int(time.time() // interval)
+            await submit_job("analytics_export", {}, job_id=f"analytics-{period}")
+        except Exception as e:
+            logger.exception("Analytics scheduler error: %s", e)
+
+async def record_deletions(ids: Iterable[int]):
+    """Tombstone deleted employees for the next delta.
+
+    Call inside the transaction that deletes them, so a crash cannot keep
+    the delete and lose the tombstone.
+    """
+    ids = sorted(set(ids))
+    if not ANALYTICS_ENABLED or not ids:
+        return
+    now = datetime.utcnow()
+    await db.database.execute_many(
+        "INSERT INTO AnalyticsTombstone (employee_id, deleted_at) VALUES (:employee_id, :deleted_at)",
+        [{"employee_id": employee_id, "deleted_at": now} for employee_id in ids]
+    )
+
+async def clear_deletions(ids: Iterable[int]):
+    """Drop pending tombstones of employees back under the same id (re-hires).
+
+    A pending tombstone would otherwise follow the new row and delete it;
+    call inside the transaction that restores them.
+    """
+    await db.database.execute_many(
+        "DELETE FROM AnalyticsTombstone WHERE employee_id = :employee_id",
+        [{"employee_id": employee_id} for employee_id in sorted(set(ids))]
+    )
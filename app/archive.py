@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from dotenv import load_dotenv
+import app.db as db
+from app.analytics import clear_deletions, record_deletions
+from app.audit import log_event
+from app.events import notify_change
+from app.jobs import job_type, submit_job, JobContext
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Employees whose leave_date is more than this many days ago move to EmployeeArchive (0 turns archiving off)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "730"))
+# Employees moved per transaction, so writers are never blocked for long
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24"))
+ARCHIVE_CHECK_SECONDS = 300
+ARCHIVE_LOG_CODES = 50
+ARCHIVE_SEARCH_LIMIT = 50
+
+# Columns both tables share; archived_at is only in the archive
+ARCHIVE_COLUMNS = [column.name for column in db.employees_table.columns]
+_COLUMN_LIST = ", ".join(ARCHIVE_COLUMNS)
+# A re-hire copies the archived row except for the new employment period
+_REHIRE_VALUES = {"start_date": ":start_date", "leave_date": "NULL", "employment_status": "NULL", "updated_at": ":now"}
+_REHIRE_SELECT = ", ".join(_REHIRE_VALUES.get(column, column) for column in ARCHIVE_COLUMNS)
+
+def archive_cutoff(today: Optional[date] = None) -> date:
+    """Employees who left before this day are archived"""
+    return (today or date.today()) - timedelta(days=ARCHIVE_AFTER_DAYS)
+
+async def archive_departed(today: Optional[date] = None, batch_size: int = ARCHIVE_BATCH_SIZE) -> dict:
+    """Move employees who left before the cutoff into EmployeeArchive.
+
+    Each batch is copied and deleted in one transaction, so an employee is
+    always in exactly one of the two tables. Listeners see an "archived"
+    event: the read model drops them, while the duplicate index keeps them
+    so a re-hire under a new code is still flagged.
+    """
+    cutoff = archive_cutoff(today)
+    moved = []
+    while True:
+        async with db.database.transaction():
+            # Writing first takes the write lock up front; a SELECT first would
+            # leave a read snapshot that a concurrent writer can invalidate
+            rows = await db.database.fetch_all(
+                f"""
+                INSERT INTO EmployeeArchive ({_COLUMN_LIST}, archived_at)
+                SELECT {_COLUMN_LIST}, :now FROM Employee WHERE employee_id IN (
+                    SELECT employee_id FROM Employee WHERE leave_date < :cutoff ORDER BY leave_date LIMIT :limit
+                )
+                RETURNING employee_id, emp_code
+                """,
+                {"cutoff": cutoff.isoformat(), "limit": batch_size, "now": datetime.utcnow()}
+            )
+            if not rows:
+                break
+            ids = [row["employee_id"] for row in rows]
+            placeholders, id_values = db.in_clause(ids)
+            await db.database.execute(f"DELETE FROM Employee WHERE employee_id IN ({placeholders})", id_values)
+            await record_deletions(ids)
+            codes = sorted(row["emp_code"] for row in rows)
+            await log_event(
+                "EMPLOYEE_ARCHIVED",
+                subject_ids=ids, count=len(ids), cutoff=cutoff.isoformat(), codes=codes[:ARCHIVE_LOG_CODES]
+            )
+            version = await db.bump_data_version()
+        await notify_change("employee", "archived", ids, version)
+        moved.extend(ids)
+        if len(rows) < batch_size:
+            break
+    if moved:
+        logger.info("Archive: moved %d departed employee(s) left before %s", len(moved), cutoff)
+    return {"cutoff": cutoff.isoformat(), "archived": len(moved)}
+
+async def find_archived(employee_id: Optional[int] = None, emp_code: Optional[str] = None):
+    """The latest archived employment period of an employee, by id or code, or None"""
+    if employee_id is not None:
+        return await db.database.fetch_one(
+            "SELECT * FROM EmployeeArchive WHERE employee_id = :employee_id ORDER BY archive_id DESC LIMIT 1",
+            {"employee_id": employee_id}
+        )
+    return await db.database.fetch_one(
+        "SELECT * FROM EmployeeArchive WHERE emp_code = :emp_code ORDER BY archive_id DESC LIMIT 1",
+        {"emp_code": emp_code}
+    )
+
+async def restore_employee(employee_id: int, user_id: Optional[int] = None, start_date: Optional[date] = None) -> bool:
+    """Re-hire an archived employee as a new employment period.
+
+    The archived row stays as the record of the earlier period. A new hot
+    row with the same id, code and details starts on start_date (today by
+    default), which must be after the archived leave_date, so reports count
+    both periods and nothing in between. Returns False when the employee is
+    not archived; raises ValueError when the re-hire is not possible.
+    """
+    start_date = start_date or date.today()
+    async with db.database.transaction():
+        # Insert first (see archive_departed); the conditions live in SQL
+        inserted = await db.database.fetch_one(
+            f"""
+            INSERT INTO Employee ({_COLUMN_LIST})
+            SELECT {_REHIRE_SELECT} FROM EmployeeArchive
+            WHERE employee_id = :employee_id
+                AND (leave_date IS NULL OR leave_date < :start_date)
+                AND NOT EXISTS (SELECT 1 FROM Employee WHERE employee_id = :employee_id)
+                AND archive_id = (SELECT MAX(archive_id) FROM EmployeeArchive WHERE employee_id = :employee_id)
+            RETURNING emp_code
+            """,
+            {"employee_id": employee_id, "start_date": start_date.isoformat(), "now": datetime.utcnow()}
+        )
+        previous = await find_archived(employee_id)
+        if inserted is None:
+            if previous is None:
+                return False
+            if await db.database.fetch_val(
+                "SELECT 1 FROM Employee WHERE employee_id = :employee_id", {"employee_id": employee_id}
+            ):
+                raise ValueError("Employee is already employed")
+            raise ValueError(f"Re-hire start date must be after the previous leave date ({previous['leave_date']})")
+        await clear_deletions([employee_id])
+        await log_event(
+            "EMPLOYEE_RESTORED", user_id,
+            entity_id=employee_id, emp_code=inserted["emp_code"],
+            changed_fields=["start_date", "leave_date", "employment_status"],
+            start_date=start_date.isoformat(),
+            previous_start_date=previous["start_date"], previous_leave_date=previous["leave_date"],
+            previous_employment_status=previous["employment_status"]
+        )
+        version = await db.bump_data_version()
+    await notify_change("employee", "created", [employee_id], version)
+    return True
+
+async def search_archive(q: Optional[str] = None, limit: int = ARCHIVE_SEARCH_LIMIT) -> List[dict]:
+    """Archived employees matching a code, name or email fragment, most recent leavers first"""
+    query = "SELECT * FROM EmployeeArchive"
+    values = {"limit": limit}
+    if q and q.strip():
+        query += """
+        WHERE emp_code LIKE :pattern OR first_name LIKE :pattern OR last_name LIKE :pattern
+            OR email LIKE :pattern OR (first_name || ' ' || last_name) LIKE :pattern
+        """
+        values["pattern"] = f"%{q.strip()}%"
+    query += " ORDER BY leave_date DESC, archive_id DESC LIMIT :limit"
+    rows = await db.database.fetch_all(query, values)
+    return [dict(row) for row in rows]
+
+async def get_archive_stats() -> dict:
+    return {
+        "enabled": ARCHIVE_AFTER_DAYS > 0,
+        "after_days": ARCHIVE_AFTER_DAYS,
+        "cutoff": archive_cutoff().isoformat() if ARCHIVE_AFTER_DAYS > 0 else None,
+        "hot": await db.database.fetch_val("SELECT COUNT(*) FROM Employee"),
+        "archived": await db.database.fetch_val("SELECT COUNT(*) FROM EmployeeArchive"),
+        "due": await db.database.fetch_val(
+            "SELECT COUNT(*) FROM Employee WHERE leave_date < :cutoff", {"cutoff": archive_cutoff().isoformat()}
+        ) if ARCHIVE_AFTER_DAYS > 0 else 0,
+    }
+
+@job_type("employee_archive", roles=("admin",))
+async def run_employee_archive(ctx: JobContext) -> dict:
+    """Archive departed employees in batches"""
+    if ARCHIVE_AFTER_DAYS <= 0:
+        return {"archived": 0, "disabled": True}
+    return await archive_departed()
+
+async def schedule_archive():
+    """Queue one archive job per interval; the fixed job id stops workers doubling up"""
+    if ARCHIVE_AFTER_DAYS <= 0 or ARCHIVE_INTERVAL_HOURS <= 0:
+        return
+    interval = ARCHIVE_INTERVAL_HOURS * 3600
+    while True:
+        await asyncio.sleep(ARCHIVE_CHECK_SECONDS)
+        try:
+            period = int(time.time() // interval)
+            await submit_job("employee_archive", {}, job_id=f"archive-{period}")
+        except Exception as e:
+            logger.exception("Archive scheduler error: %s", e)
@@ -0,0 +1,270 @@
+"""Structured audit log.
+
+Every Log row names what it is about in indexed columns (entity_type,
+entity_id, emp_code) and lists the fields it changed, with anything else
+kept as compact JSON in details. Events that touch many employees at once
+(bulk edits, leave-date transitions) write one Log row plus one LogSubject
+row per employee, so a per-entity history is always an index lookup.
+"""
+import json
+import logging
+import re
+from datetime import date, datetime
+from typing import Iterable, List, Optional
+import app.db as db
+
+logger = logging.getLogger(__name__)
+
+AUDIT_HISTORY_LIMIT = 100
+AUDIT_MIGRATION_BATCH = 500
+
+def _compact(details: dict) -> Optional[str]:
+    if not details:
+        return None
+    return json.dumps(details, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def _entity_type_for(action: str) -> str:
+    prefix = action.split("_", 1)[0].lower()
+    return prefix if prefix in ("employee", "user") else "system"
+
+async def log_event(
+    action: str,
+    user_id: Optional[int] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    emp_code: Optional[str] = None,
+    changed_fields: Optional[Iterable[str]] = None,
+    subject_ids: Optional[Iterable[int]] = None,
+    **details,
+) -> int:
+    """Write one audit event; extra keyword arguments become the JSON details"""
+    changed = ",".join(changed_fields) if changed_fields else None
+    log_id = await db.database.execute(
+        """
+        INSERT INTO Log (user_id, action, details, timestamp, entity_type, entity_id, emp_code, changed_fields)
+        VALUES (:user_id, :action, :details, :timestamp, :entity_type, :entity_id, :emp_code, :changed_fields)
+        """,
+        {
+            "user_id": user_id,
+            "action": action,
+            "details": _compact(details),
+            "timestamp": datetime.utcnow(),
+            "entity_type": entity_type or _entity_type_for(action),
+            "entity_id": entity_id,
+            "emp_code": emp_code,
+            "changed_fields": changed,
+        }
+    )
+    subject_ids = sorted(set(subject_ids or ()))
+    if subject_ids:
+        await db.database.execute_many(
+            "INSERT OR IGNORE INTO LogSubject (entity_type, entity_id, log_id) VALUES (:entity_type, :entity_id, :log_id)",
+            [
+                {"entity_type": entity_type or _entity_type_for(action), "entity_id": subject_id, "log_id": log_id}
+                for subject_id in subject_ids
+            ]
+        )
+    return log_id
+
+def _comparable(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+def changed_fields(before, after: dict) -> List[str]:
+    """Fields in `after` whose value differs from the stored row `before`"""
+    changed = []
+    for field, value in after.items():
+        old = before[field]
+        if isinstance(value, date) and old is not None:
+            # SQLite hands dates back as text
+            value = value.isoformat()
+            old = str(old)[:len(value)]
+        if isinstance(old, float) and isinstance(value, str):
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        if _comparable(old) != _comparable(value):
+            changed.append(field)
+    return changed
+
+def _row_to_event(row) -> dict:
+    details = row["details"]
+    try:
+        details = json.loads(details) if details else {}
+    except ValueError:
+        details = {"message": details}
+    return {
+        "log_id": row["log_id"],
+        "action": row["action"],
+        "timestamp": row["timestamp"],
+        "user_id": row["user_id"],
+        "username": row["username"],
+        "entity_type": row["entity_type"],
+        "entity_id": row["entity_id"],
+        "emp_code": row["emp_code"],
+        "changed_fields": row["changed_fields"].split(",") if row["changed_fields"] else [],
+        "details": details,
+    }
+
+async def fetch_history(
+    entity_type: str,
+    entity_id: Optional[int] = None,
+    emp_code: Optional[str] = None,
+    before: Optional[int] = None,
+    limit: int = AUDIT_HISTORY_LIMIT,
+) -> List[dict]:
+    """Audit events about one entity, newest first.
+
+    Each branch is a range scan on ix_Log_entity, ix_Log_emp_code or the
+    LogSubject primary key; `before` (a log_id) pages further back.
+    """
+    branches = []
+    values = {"entity_type": entity_type, "before": before if before is not None else 2 ** 62, "limit": limit}
+    if entity_id is not None:
+        values["entity_id"] = entity_id
+        branches.append(
+            "SELECT log_id FROM Log WHERE entity_type = :entity_type AND entity_id = :entity_id AND log_id < :before"
+        )
+        branches.append(
+            "SELECT log_id FROM LogSubject WHERE entity_type = :entity_type AND entity_id = :entity_id AND log_id < :before"
+        )
+    if emp_code:
+        values["emp_code"] = emp_code
+        branches.append(
+            "SELECT log_id FROM Log WHERE emp_code = :emp_code AND entity_type = :entity_type AND log_id < :before"
+        )
+    if not branches:
+        return []
+    rows = await db.database.fetch_all(
+        f"""
+        SELECT l.log_id, l.action, l.timestamp, l.user_id, u.username, l.entity_type, l.entity_id,
+               l.emp_code, l.changed_fields, l.details
+        FROM Log l LEFT JOIN User u ON u.user_id = l.user_id
+        WHERE l.log_id IN ({" UNION ".join(branches)})
+        ORDER BY l.log_id DESC LIMIT :limit
+        """,
+        values
+    )
+    return [_row_to_event(row) for row in rows]
+
+# Free-text details written before the structured columns existed (the
+# only formats the app ever wrote; anything else is kept as a message)
+_LEGACY_PATTERNS = {
+    "EMPLOYEE_CREATED": re.compile(r"^Employee (?P<emp_code>\S+) \((?P<name>.*)\) created$"),
+    "EMPLOYEE_UPDATED": re.compile(r"^Employee (?P<emp_code>\S+) \((?P<name>.*)\) updated$"),
+    "EMPLOYEE_DELETED": re.compile(r"^Employee (?P<emp_code>\S+) \((?P<name>.*)\) deleted$"),
+    "USER_CREATED": re.compile(r"^Admin (?P<admin>\S+) created new user (?P<username>\S+)$"),
+    "USER_REGISTERED": re.compile(r"^New user (?P<username>\S+) registered successfully$"),
+}
+
+def parse_legacy(action: str, text: Optional[str]) -> dict:
+    """Structured columns for an old free-text row; unknown text is kept as details.message"""
+    parsed = {"entity_type": _entity_type_for(action), "emp_code": None, "changed_fields": None, "details": {}}
+    match = _LEGACY_PATTERNS[action].match(text or "") if action in _LEGACY_PATTERNS else None
+    if not match:
+        if text:
+            parsed["details"] = {"message": text}
+        return parsed
+    fields = match.groupdict()
+    if "emp_code" in fields:
+        parsed["emp_code"] = fields["emp_code"]
+        parsed["details"] = {"name": fields["name"]}
+    else:
+        parsed["details"] = {"username": fields["username"]}
+    return parsed
+
+def _second(value) -> str:
+    """A stored timestamp to the second, for comparing across formats"""
+    return str(value).replace("T", " ")[:19]
+
+async def _candidates(tables: Iterable[str], key: str, id_column: str, names: set) -> dict:
+    """Every (id, created_at) holding each name now, across the given tables"""
+    candidates = {}
+    for table in tables:
+        for chunk in db.chunked(sorted(names)):
+            placeholders, values = db.in_clause(chunk, "k")
+            rows = await db.database.fetch_all(
+                f"SELECT DISTINCT {id_column}, {key}, created_at FROM {table} WHERE {key} IN ({placeholders})", values
+            )
+            for row in rows:
+                candidates.setdefault(row[key], set()).add((row[id_column], _second(row["created_at"])))
+    return candidates
+
+def _resolve(candidates: dict, name: Optional[str], timestamp) -> Optional[int]:
+    """The one id that already existed under name when the row was written, else None.
+
+    Codes and usernames can be reused after a delete, so a name alone may
+    point at someone created after the event.
+    """
+    ids = {entity_id for entity_id, created_at in candidates.get(name, ()) if created_at <= _second(timestamp)}
+    return ids.pop() if len(ids) == 1 else None
+
+async def migrate_legacy_rows() -> int:
+    """Fill the structured columns for rows written before they existed.
+
+    Rows still needing it are the ones with no entity_type, found through
+    ix_Log_entity; every processed row gets one, so reruns (and other
+    workers racing this one) find nothing left to do. A row is linked to an
+    employee or user only when exactly one with its code or username was
+    created by the row's timestamp; other rows, and deleted employees, keep
+    only the code.
+    """
+    migrated = 0
+    while True:
+        rows = await db.database.fetch_all(
+            "SELECT log_id, action, details, timestamp FROM Log WHERE entity_type IS NULL ORDER BY log_id LIMIT :limit",
+            {"limit": AUDIT_MIGRATION_BATCH}
+        )
+        if not rows:
+            return migrated
+        parsed = {row["log_id"]: parse_legacy(row["action"], row["details"]) for row in rows}
+        codes, usernames = set(), set()
+        for row in rows:
+            event = parsed[row["log_id"]]
+            if event["emp_code"] and row["action"] != "EMPLOYEE_DELETED":
+                codes.add(event["emp_code"])
+            if event["entity_type"] == "user" and "username" in event["details"]:
+                usernames.add(event["details"]["username"])
+        # Archived employees keep their id and code, so their old rows still link
+        employees = await _candidates(("Employee", "EmployeeArchive"), "emp_code", "employee_id", codes)
+        users = await _candidates(("User",), "username", "user_id", usernames)
+
+        updates = []
+        for row in rows:
+            event = parsed[row["log_id"]]
+            entity_id = None
+            if event["emp_code"] and row["action"] != "EMPLOYEE_DELETED":
+                entity_id = _resolve(employees, event["emp_code"], row["timestamp"])
+            elif event["entity_type"] == "user":
+                entity_id = _resolve(users, event["details"].get("username"), row["timestamp"])
+            updates.append({
+                "log_id": row["log_id"],
+                "entity_type": event["entity_type"],
+                "entity_id": entity_id,
+                "emp_code": event["emp_code"],
+                "changed_fields": ",".join(event["changed_fields"]) if event["changed_fields"] else None,
+                "details": _compact(event["details"]),
+            })
+        async with db.database.transaction():
+            await db.database.execute_many(
+                """
+                UPDATE Log SET entity_type = :entity_type, entity_id = :entity_id, emp_code = :emp_code,
+                    changed_fields = :changed_fields, details = :details
+                WHERE log_id = :log_id AND entity_type IS NULL
+                """,
+                updates
+            )
+        migrated += len(updates)
+
+async def ensure_migrated():
+    """Run the legacy migration once on startup (no-op when nothing is left)"""
+    try:
+        migrated = await migrate_legacy_rows()
+        if migrated:
+            logger.info("Audit log: structured %d legacy row(s)", migrated)
+    except Exception as e:
+        logger.exception("Audit log migration error: %s", e)
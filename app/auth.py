@@ -5,16 +5,31 @@ from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from databases import Database
 from typing import Optional
+from collections import OrderedDict
+from starlette.concurrency import run_in_threadpool
+import hashlib
+import os
+import time
 import app.db as db
+from app.loader import get_loader
 from app.schemas import User, TokenData, Token
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor; pick one for this hardware with `python -m app.calibrate`.
+# Stored hashes with a different cost are rehashed on the user's next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 SECRET_KEY = "your-secret-key-change-this-in-production"  # Change this in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Simple in-memory rate limiting
-login_attempts = {}
+# Verified token claims, keyed by SHA-256 digest of the token and kept until
+# the token's exp claim. Bounded LRU so memory stays flat.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+_token_cache = OrderedDict()
+token_cache_stats = {"hits": 0, "misses": 0}
+
+# Login rate limiting is stored in the LoginAttempt table so that every
+# worker process sees the same attempt history
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -22,9 +37,22 @@ async def authenticate_user(database: Database, username: str, password: str):
     """Authenticate user with username and password"""
     query = "SELECT * FROM User WHERE username = :username"
     user = await database.fetch_one(query=query, values={"username": username})
-    if not user or not verify_password(password, user["password_hash"]):
+    if not user:
         return False
-    return dict(user)
+    # bcrypt is deliberately slow; keep it off the event loop
+    valid, new_hash = await run_in_threadpool(pwd_context.verify_and_update, password, user["password_hash"])
+    if not valid:
+        return False
+    user = dict(user)
+    if new_hash:
+        # The stored hash used another cost (or a deprecated scheme); upgrade it now
+        # that the plain password is known
+        await database.execute(
+            "UPDATE User SET password_hash = :password_hash WHERE user_id = :user_id",
+            {"password_hash": new_hash, "user_id": user["user_id"]}
+        )
+        user["password_hash"] = new_hash
+    return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
@@ -46,11 +74,51 @@ def get_password_hash(password: str) -> str:
     """Hash a password for storing"""
     return pwd_context.hash(password)
 
+def decode_token(token: str) -> dict:
+    """Decode and verify a JWT, reusing cached claims for tokens already verified"""
+    digest = hashlib.sha256(token.encode()).digest()
+    cached = _token_cache.get(digest)
+    if cached is not None:
+        claims, expires_at = cached
+        if expires_at > time.time():
+            token_cache_stats["hits"] += 1
+            _token_cache.move_to_end(digest)
+            return claims
+        # Expired - drop it and let jwt.decode raise ExpiredSignatureError
+        del _token_cache[digest]
+    
+    token_cache_stats["misses"] += 1
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    
+    # Only tokens with an expiry are cached, so nothing outlives its exp claim
+    expires_at = payload.get("exp")
+    if isinstance(expires_at, (int, float)) and TOKEN_CACHE_SIZE > 0:
+        _token_cache[digest] = (payload, expires_at)
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return payload
+
+def get_token_cache_stats() -> dict:
+    """Return hit/miss counters for the token claims cache"""
+    lookups = token_cache_stats["hits"] + token_cache_stats["misses"]
+    return {
+        "size": len(_token_cache),
+        "max_size": TOKEN_CACHE_SIZE,
+        "hits": token_cache_stats["hits"],
+        "misses": token_cache_stats["misses"],
+        "hit_rate": round(token_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+    }
+
 def get_token_from_cookie(request: Request) -> Optional[str]:
     """Extract token from cookie"""
     token = request.cookies.get("access_token")
     return token
 
+async def _fetch_user_by_username(username: str) -> Optional[dict]:
+    query = "SELECT * FROM User WHERE username = :username"
+    user = await db.database.fetch_one(query=query, values={"username": username})
+    return dict(user) if user else None
+
 async def get_current_user(request: Request):
     """Get current user from token in cookie"""
     credentials_exception = HTTPException(
@@ -64,20 +132,23 @@ async def get_current_user(request: Request):
         raise credentials_exception
     
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
+        payload = decode_token(token)
     except JWTError:
         raise credentials_exception
+    username = payload.get("sub")
+    if not isinstance(username, str):
+        raise credentials_exception
     
-    query = "SELECT * FROM User WHERE username = :username"
-    user = await db.database.fetch_one(query=query, values={"username": token_data.username})
+    # The user row is still loaded on every request, so deleting or renaming
+    # a user revokes their token immediately, exactly as before caching.
+    # Within one request it is loaded once and shared by id with later lookups.
+    loader = get_loader(request)
+    user = await loader.memo(("user_by_username", username), _fetch_user_by_username, username)
     
     if user is None:
         raise credentials_exception
     
+    loader.prime("user", user["user_id"], user)
     return dict(user)
 
 async def get_current_active_user(current_user: dict = Depends(get_current_user)):
@@ -131,20 +202,35 @@ def is_strong_password(password: str) -> bool:
     
     return True
 
-def check_rate_limit(username: str, max_attempts: int = 5, window_seconds: int = 300):
+async def record_login_attempt(username: str, when: Optional[datetime] = None):
+    """Record a login attempt for rate limiting"""
+    await db.database.execute(
+        "INSERT INTO LoginAttempt (username, attempted_at) VALUES (:username, :attempted_at)",
+        {"username": username, "attempted_at": when or datetime.utcnow()}
+    )
+
+async def check_rate_limit(username: str, max_attempts: int = 5, window_seconds: int = 300):
     """Check if user has exceeded login attempt rate limit"""
     now = datetime.utcnow()
-    if username in login_attempts:
-        attempts = [a for a in login_attempts[username] if now - a < timedelta(seconds=window_seconds)]
-        login_attempts[username] = attempts
-        if len(attempts) >= max_attempts:
-            # Calculate time until oldest attempt expires
-            if attempts:
-                oldest_attempt = min(attempts)
-                time_until_reset = (oldest_attempt + timedelta(seconds=window_seconds) - now).total_seconds()
-                return False, int(time_until_reset)
-    else:
-        login_attempts[username] = []
+    window_start = now - timedelta(seconds=window_seconds)
+    
+    # Drop attempts that fell out of the window
+    await db.database.execute(
+        "DELETE FROM LoginAttempt WHERE username = :username AND attempted_at < :window_start",
+        {"username": username, "window_start": window_start}
+    )
+    
+    row = await db.database.fetch_one(
+        "SELECT COUNT(*) AS attempts, MIN(attempted_at) AS oldest FROM LoginAttempt WHERE username = :username",
+        {"username": username}
+    )
+    if row["attempts"] >= max_attempts:
+        # Calculate time until oldest attempt expires
+        oldest_attempt = row["oldest"]
+        if isinstance(oldest_attempt, str):
+            oldest_attempt = datetime.fromisoformat(oldest_attempt)
+        time_until_reset = (oldest_attempt + timedelta(seconds=window_seconds) - now).total_seconds()
+        return False, int(time_until_reset)
     
-    login_attempts[username].append(now)
-    return True, 0
\ No newline at end of file
+    await record_login_attempt(username, now)
+    return True, 0
@@ -0,0 +1,76 @@
+"""Pick a bcrypt cost factor for this machine.
+
+Run from the project root:
+
+    python -m app.calibrate                      # print the recommended BCRYPT_ROUNDS
+    python -m app.calibrate --target-ms 300      # aim for a different verify time
+    python -m app.calibrate --env-file .env      # also save it to an env file
+"""
+import argparse
+import os
+import time
+from passlib.hash import bcrypt
+
+# Target time for one password verify; login latency is dominated by this
+DEFAULT_TARGET_MS = 250
+# Never recommend a cost below this, however slow the host is
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+SAMPLES = 5
+
+def measure_verify_ms(rounds: int, samples: int = SAMPLES) -> float:
+    """Median time in milliseconds to verify a password at the given cost"""
+    hashed = bcrypt.using(rounds=rounds).hash("calibration-password")
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.verify("calibration-password", hashed)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def recommend_rounds(target_ms: float) -> tuple:
+    """Return (rounds, measured ms): the highest cost whose verify time fits target_ms"""
+    # Each extra round doubles the work, so time one cheap cost and extrapolate
+    base_rounds = MIN_ROUNDS
+    base_ms = measure_verify_ms(base_rounds)
+    rounds = base_rounds
+    while rounds < MAX_ROUNDS and base_ms * 2 ** (rounds + 1 - base_rounds) <= target_ms:
+        rounds += 1
+
+    # Confirm with a real measurement and step down if the estimate was optimistic
+    measured = measure_verify_ms(rounds)
+    while rounds > MIN_ROUNDS and measured > target_ms:
+        rounds -= 1
+        measured = measure_verify_ms(rounds)
+    return rounds, measured
+
+def write_env_value(path: str, key: str, value) -> None:
+    """Set key=value in an env file, replacing an existing line for the key"""
+    lines = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as env_file:
+            lines = env_file.read().splitlines()
+    lines = [line for line in lines if not line.strip().startswith(f"{key}=")]
+    lines.append(f"{key}={value}")
+    with open(path, "w", encoding="utf-8") as env_file:
+        env_file.write("\n".join(lines) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the bcrypt cost factor (BCRYPT_ROUNDS)")
+    parser.add_argument("--target-ms", type=float, default=DEFAULT_TARGET_MS, help="target verify time in milliseconds")
+    parser.add_argument("--env-file", help="env file to write BCRYPT_ROUNDS into (e.g. .env or .env.docker)")
+    args = parser.parse_args()
+
+    rounds, measured = recommend_rounds(args.target_ms)
+    print(f"bcrypt verify at {rounds} rounds: {measured:.1f} ms (target {args.target_ms:.0f} ms)")
+    if measured > args.target_ms:
+        print(f"Warning: even the minimum of {MIN_ROUNDS} rounds is slower than the target on this host")
+    print(f"BCRYPT_ROUNDS={rounds}")
+
+    if args.env_file:
+        write_env_value(args.env_file, "BCRYPT_ROUNDS", rounds)
+        print(f"Saved to {args.env_file}; restart the app to apply. Existing hashes are upgraded on next login.")
+
+if __name__ == "__main__":
+    main()
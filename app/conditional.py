@@ -0,0 +1,82 @@
+from fastapi import Request
+from fastapi.responses import Response
+from email.utils import formatdate, parsedate_to_datetime
+from datetime import date
+from typing import Optional
+import hashlib
+import os
+import app.db as db
+
+TEMPLATE_DIR = "app/templates"
+
+def templates_mtime() -> float:
+    """Newest template modification time, so a deploy with new markup changes every ETag"""
+    latest = 0.0
+    for root, _, files in os.walk(TEMPLATE_DIR):
+        for name in files:
+            latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    return latest
+
+TEMPLATES_MTIME = templates_mtime()
+
+class Validators:
+    """ETag and Last-Modified values for one response"""
+
+    def __init__(self, etag: str, last_modified: Optional[float]):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def headers(self) -> dict:
+        # Vary on Cookie so a browser never reuses one user's copy for another
+        headers = {"ETag": self.etag, "Cache-Control": "private, no-cache", "Vary": "Cookie"}
+        if self.last_modified:
+            headers["Last-Modified"] = formatdate(self.last_modified, usegmt=True)
+        return headers
+
+    def apply(self, response: Response) -> Response:
+        """Attach validator headers to a response"""
+        response.headers.update(self.headers)
+        return response
+
+async def get_validators(request: Request, current_user: Optional[dict]) -> Validators:
+    """Build validators from the data version and the viewer's identity and role"""
+    version, modified_at = await db.get_data_version()
+    if current_user:
+        viewer = f"{current_user['user_id']}:{current_user['username']}:{current_user['role']}"
+    else:
+        viewer = "anonymous"
+    parts = [
+        str(version),
+        viewer,
+        request.url.path,
+        request.url.query,
+        date.today().isoformat(),  # pages show the current date
+        str(TEMPLATES_MTIME),
+    ]
+    digest = hashlib.sha1("|".join(parts).encode()).hexdigest()[:20]
+    return Validators(f'W/"{digest}"', modified_at or None)
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    """Check If-None-Match (or If-Modified-Since when no ETag was sent)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison: ignore W/ prefixes
+        wanted = validators.etag.removeprefix("W/")
+        return any(tag.strip().removeprefix("W/") == wanted for tag in if_none_match.split(","))
+    
+    # Last-Modified only covers the data version; the viewer is covered by Vary: Cookie
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(validators.last_modified) <= int(since)
+    return False
+
+def not_modified_response(validators: Validators) -> Response:
+    """Empty 304 response carrying the validators"""
+    return Response(status_code=304, headers=validators.headers)
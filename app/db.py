@@ -1,7 +1,11 @@
+import asyncio
 import databases
 import sqlalchemy
 from sqlalchemy import create_engine
 import os
+import time
+import tempfile
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -51,9 +55,34 @@ employees_table = sqlalchemy.Table(
     sqlalchemy.Column("address", sqlalchemy.Text),
     sqlalchemy.Column("start_date", sqlalchemy.Date),
     sqlalchemy.Column("leave_date", sqlalchemy.Date),
+    sqlalchemy.Column("photo_hash", sqlalchemy.String(64)),  # SHA-256 of the photo file, see app/photos.py
+    sqlalchemy.Column("employment_status", sqlalchemy.String(20)),  # Leaver state set by app/transitions.py
     sqlalchemy.Column("created_at", sqlalchemy.DateTime, nullable=False),
     sqlalchemy.Column("updated_at", sqlalchemy.DateTime, nullable=False),
 )
+# Range scans for due leave_date transitions (app/transitions.py); employment_status
+# is included so the scan never has to visit the table rows
+sqlalchemy.Index(
+    "ix_Employee_leave_date_employment_status", employees_table.c.leave_date, employees_table.c.employment_status
+)
+# Incremental analytics exports read changed rows in (updated_at, employee_id) order
+sqlalchemy.Index("ix_Employee_updated_at", employees_table.c.updated_at, employees_table.c.employee_id)
+
+# Departed employees moved out of the hot table (app/archive.py); same columns,
+# keeping employee_id so audit history lines up. One row per finished
+# employment period, so a re-hired employee can appear here more than once.
+employee_archive_table = sqlalchemy.Table(
+    "EmployeeArchive",
+    metadata,
+    sqlalchemy.Column("archive_id", sqlalchemy.Integer, primary_key=True, autoincrement=True),
+    *[
+        sqlalchemy.Column(column.name, column.type, nullable=column.nullable)
+        for column in employees_table.columns
+    ],
+    sqlalchemy.Column("archived_at", sqlalchemy.DateTime),
+)
+sqlalchemy.Index("ix_EmployeeArchive_employee_id", employee_archive_table.c.employee_id, employee_archive_table.c.archive_id)
+sqlalchemy.Index("ix_EmployeeArchive_emp_code", employee_archive_table.c.emp_code)
 
 # Log table
 logs_table = sqlalchemy.Table(
@@ -64,8 +93,128 @@ logs_table = sqlalchemy.Table(
     sqlalchemy.Column("action", sqlalchemy.String(50), nullable=False),
     sqlalchemy.Column("details", sqlalchemy.Text),
     sqlalchemy.Column("timestamp", sqlalchemy.DateTime, nullable=False, server_default=sqlalchemy.func.now()),
+    # Structured audit fields (app/audit.py); details holds compact JSON
+    sqlalchemy.Column("entity_type", sqlalchemy.String(20)),
+    sqlalchemy.Column("entity_id", sqlalchemy.Integer),
+    sqlalchemy.Column("emp_code", sqlalchemy.String(20)),
+    sqlalchemy.Column("changed_fields", sqlalchemy.String(500)),
+)
+# Per-entity history in log_id order, and lookups by code for deleted employees
+sqlalchemy.Index("ix_Log_entity", logs_table.c.entity_type, logs_table.c.entity_id, logs_table.c.log_id)
+sqlalchemy.Index("ix_Log_emp_code", logs_table.c.emp_code, logs_table.c.entity_type, logs_table.c.log_id)
+
+# Entities touched by audit events that cover many at once (bulk edits, transitions)
+log_subjects_table = sqlalchemy.Table(
+    "LogSubject",
+    metadata,
+    sqlalchemy.Column("entity_type", sqlalchemy.String(20), primary_key=True),
+    sqlalchemy.Column("entity_id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("log_id", sqlalchemy.Integer, primary_key=True),
+)
+
+# Shared key/value state (visible to every worker process)
+shared_state_table = sqlalchemy.Table(
+    "SharedState",
+    metadata,
+    sqlalchemy.Column("key", sqlalchemy.String(100), primary_key=True),
+    sqlalchemy.Column("value", sqlalchemy.Text),
+    sqlalchemy.Column("expires_at", sqlalchemy.Float),
+)
+
+# Login attempts used by the rate limiter (shared between workers)
+login_attempts_table = sqlalchemy.Table(
+    "LoginAttempt",
+    metadata,
+    sqlalchemy.Column("attempt_id", sqlalchemy.Integer, primary_key=True, autoincrement=True),
+    sqlalchemy.Column("username", sqlalchemy.String(50), nullable=False, index=True),
+    sqlalchemy.Column("attempted_at", sqlalchemy.DateTime, nullable=False),
+)
+
+# Blocking keys used to find duplicate employee candidates without comparing every pair
+employee_block_keys_table = sqlalchemy.Table(
+    "EmployeeBlockKey",
+    metadata,
+    sqlalchemy.Column("employee_id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("block_key", sqlalchemy.String(120), primary_key=True, index=True),
+)
+
+# Likely duplicate employee pairs (employee_id < duplicate_id)
+duplicate_candidates_table = sqlalchemy.Table(
+    "DuplicateCandidate",
+    metadata,
+    sqlalchemy.Column("employee_id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("duplicate_id", sqlalchemy.Integer, primary_key=True, index=True),
+    sqlalchemy.Column("score", sqlalchemy.Float, nullable=False),
+    sqlalchemy.Column("reasons", sqlalchemy.String(200)),
+    sqlalchemy.Column("detected_at", sqlalchemy.DateTime, nullable=False),
+)
+
+# Background jobs (exports, scans, maintenance) shared by all workers
+jobs_table = sqlalchemy.Table(
+    "Job",
+    metadata,
+    sqlalchemy.Column("job_id", sqlalchemy.String(32), primary_key=True),
+    sqlalchemy.Column("kind", sqlalchemy.String(50), nullable=False),
+    sqlalchemy.Column("status", sqlalchemy.String(20), nullable=False, index=True),
+    sqlalchemy.Column("params", sqlalchemy.Text),
+    sqlalchemy.Column("progress", sqlalchemy.Float, nullable=False, default=0),
+    sqlalchemy.Column("message", sqlalchemy.Text),
+    sqlalchemy.Column("checkpoint", sqlalchemy.Text),
+    sqlalchemy.Column("result", sqlalchemy.Text),
+    sqlalchemy.Column("result_file", sqlalchemy.String(255)),
+    sqlalchemy.Column("error", sqlalchemy.Text),
+    sqlalchemy.Column("attempts", sqlalchemy.Integer, nullable=False, default=0),
+    sqlalchemy.Column("cancel_requested", sqlalchemy.Boolean, nullable=False, default=False),
+    sqlalchemy.Column("claim", sqlalchemy.String(32)),
+    sqlalchemy.Column("heartbeat_at", sqlalchemy.Float),
+    sqlalchemy.Column("created_by", sqlalchemy.Integer, sqlalchemy.ForeignKey("User.user_id")),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column("started_at", sqlalchemy.DateTime),
+    sqlalchemy.Column("finished_at", sqlalchemy.DateTime),
+)
+
+# Deleted employees not yet exported to analytics (deletes leave no updated_at behind)
+analytics_tombstones_table = sqlalchemy.Table(
+    "AnalyticsTombstone",
+    metadata,
+    sqlalchemy.Column("tombstone_id", sqlalchemy.Integer, primary_key=True, autoincrement=True),
+    sqlalchemy.Column("employee_id", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("deleted_at", sqlalchemy.DateTime, nullable=False),
 )
 
+# Lock file guarding schema creation and seeding when several workers start at once
+if DATABASE_URL.startswith("sqlite:///"):
+    _default_lock_file = DATABASE_URL[len("sqlite:///"):] + ".init.lock"
+else:
+    _default_lock_file = os.path.join(tempfile.gettempdir(), "employee_management.init.lock")
+DB_INIT_LOCK_FILE = os.getenv("DB_INIT_LOCK_FILE", _default_lock_file)
+
+@contextmanager
+def init_lock():
+    """Hold an exclusive file lock so only one process initializes the database at a time"""
+    lock_file = open(DB_INIT_LOCK_FILE, "a+")
+    try:
+        try:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        except ImportError:
+            # Windows fallback
+            import msvcrt
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        yield
+    finally:
+        try:
+            try:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            except ImportError:
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            lock_file.close()
+
 # Connect to database
 async def connect_db():
     """Connect to the database and ensure tables exist"""
@@ -73,20 +222,28 @@ async def connect_db():
         await database.connect()
         print("Database connected successfully")
     
-    # After connecting, check if tables exist and create them if needed
-    try:
-        # Try to query the User table - if it fails, tables likely don't exist
-        await database.fetch_one("SELECT 1 FROM User LIMIT 1")
-        print("Database tables already exist")
-    except Exception as e:
-        if "no such table" in str(e).lower():
+    # Every worker runs this on startup, so schema creation and seeding are
+    # serialized with a file lock and written to be idempotent.
+    with init_lock():
+        try:
+            # Try to query the User table - if it fails, tables likely don't exist
+            await database.fetch_one("SELECT 1 FROM User LIMIT 1")
+            print("Database tables already exist")
+        except Exception as e:
+            if "no such table" not in str(e).lower():
+                raise
             print("Tables don't exist. Creating now...")
-            # Create tables synchronously
-            create_tables()
-            print("Tables created successfully")
-            
-            # Create default admin user
-            await create_default_admin()
+        
+        # create_all only creates missing tables, so this also picks up tables
+        # added after the database file was first created
+        create_tables()
+        
+        if DATABASE_URL.startswith("sqlite"):
+            # WAL lets readers in other workers proceed while one worker writes
+            await database.execute("PRAGMA journal_mode=WAL")
+        
+        # Create default admin user
+        await create_default_admin()
 
 async def create_default_admin():
     """Create a default admin user if none exists"""
@@ -115,18 +272,165 @@ async def create_default_admin():
                     "updated_at": now
                 }
             )
+            await bump_data_version()
             print("Created default admin user (username: admin, password: admin123)")
     except Exception as e:
         print(f"Warning: Could not create admin user: {str(e)}")
 
+DATA_VERSION_KEY = "data_version"
+DATA_MODIFIED_KEY = "data_modified_at"
+
+async def bump_data_version() -> int:
+    """Record that Employee or User data changed (used for HTTP cache validators).
+
+    Call inside the write's transaction, so the data and the version that
+    validators are built from commit together. Returns the new version.
+    """
+    version = await database.fetch_val(
+        """
+        INSERT INTO SharedState (key, value) VALUES (:key, '1')
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+        RETURNING value
+        """,
+        {"key": DATA_VERSION_KEY}
+    )
+    await set_shared_value(DATA_MODIFIED_KEY, time.time())
+    return int(version)
+
+async def get_data_version():
+    """Return (version, modified_at) for Employee/User data"""
+    rows = await database.fetch_all(
+        "SELECT key, value FROM SharedState WHERE key IN (:version_key, :modified_key)",
+        {"version_key": DATA_VERSION_KEY, "modified_key": DATA_MODIFIED_KEY}
+    )
+    values = {row["key"]: row["value"] for row in rows}
+    version = int(values.get(DATA_VERSION_KEY) or 0)
+    modified_at = float(values.get(DATA_MODIFIED_KEY) or 0)
+    return version, modified_at
+
+async def get_shared_value(key: str):
+    """Read a value from the shared state table, ignoring expired entries"""
+    row = await database.fetch_one(
+        "SELECT value, expires_at FROM SharedState WHERE key = :key",
+        {"key": key}
+    )
+    if not row:
+        return None
+    if row["expires_at"] is not None and row["expires_at"] < time.time():
+        return None
+    return row["value"]
+
+async def set_shared_value(key: str, value, ttl_seconds: float = None):
+    """Store a value in the shared state table, optionally expiring after ttl_seconds"""
+    expires_at = time.time() + ttl_seconds if ttl_seconds else None
+    await database.execute(
+        """
+        INSERT INTO SharedState (key, value, expires_at) VALUES (:key, :value, :expires_at)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at
+        """,
+        {"key": key, "value": None if value is None else str(value), "expires_at": expires_at}
+    )
+
+# Values bound per IN (...) list, kept under SQLite's host parameter limit
+IN_CHUNK_SIZE = 500
+
+def chunked(values, size: int = IN_CHUNK_SIZE):
+    """Split values into lists small enough for one IN (...) list"""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def in_clause(values, prefix: str = "id") -> tuple:
+    """Placeholders and bind values for an IN (...) list in raw SQL"""
+    params = {f"{prefix}{i}": value for i, value in enumerate(values)}
+    return ", ".join(f":{key}" for key in params), params
+
+def add_missing_columns(connection):
+    """Add nullable columns that were added to the metadata after a table was created"""
+    inspector = sqlalchemy.inspect(connection)
+    for table in metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} to an existing table")
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+            print(f"Added column {table.name}.{column.name}")
+
+# Indexes older versions created that nothing reads any more
+RETIRED_INDEXES = ("ix_Employee_leave_date_status",)
+
+def add_missing_indexes(connection):
+    """Create indexes that were added to the metadata after a table was created"""
+    for name in RETIRED_INDEXES:
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    inspector = sqlalchemy.inspect(connection)
+    for table in metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(connection)
+                print(f"Created index {index.name}")
+
+def upgrade_employee_archive(connection):
+    """Rebuild an EmployeeArchive created when employee_id was its primary key"""
+    inspector = sqlalchemy.inspect(connection)
+    if "EmployeeArchive" not in inspector.get_table_names():
+        return
+    columns = [column["name"] for column in inspector.get_columns("EmployeeArchive")]
+    if "archive_id" in columns:
+        return
+    connection.exec_driver_sql("ALTER TABLE EmployeeArchive RENAME TO EmployeeArchive_old")
+    employee_archive_table.create(connection)
+    column_list = ", ".join(columns)
+    connection.exec_driver_sql(
+        f"INSERT INTO EmployeeArchive ({column_list}) SELECT {column_list} FROM EmployeeArchive_old ORDER BY archived_at"
+    )
+    connection.exec_driver_sql("DROP TABLE EmployeeArchive_old")
+    print("Rebuilt EmployeeArchive with one row per employment period")
+
 def create_tables():
     """Create all tables defined in metadata"""
     try:
-        metadata.create_all(engine)
+        with engine.begin() as connection:
+            if DATABASE_URL.startswith("sqlite"):
+                # Only takes effect on a brand-new file; lets maintenance reclaim
+                # free pages with PRAGMA incremental_vacuum instead of a full VACUUM
+                connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+            upgrade_employee_archive(connection)
+            metadata.create_all(connection)
+            add_missing_columns(connection)
+            add_missing_indexes(connection)
     except Exception as e:
         print(f"Error creating tables: {str(e)}")
         raise
 
+async def ping_database(timeout: float = 2.0) -> dict:
+    """Round-trip a trivial query and report connection details for health checks.
+
+    A database that does not answer within timeout seconds counts as down,
+    so a locked or stuck database fails the check instead of hanging it.
+    """
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(database.fetch_val("SELECT 1"), timeout)
+        error = None
+    except asyncio.TimeoutError:
+        error = f"No answer within {timeout:g} seconds"
+    except Exception as e:
+        error = str(e)
+    return {
+        "ok": error is None,
+        "error": error,
+        "ping_ms": round((time.perf_counter() - start) * 1000, 2),
+        "connected": database.is_connected,
+        "backend": database.url.scheme,
+        # `databases` opens one connection per task (SQLite has no shared pool)
+        "open_connections": len(getattr(database, "_connection_map", {})),
+    }
+
 # Disconnect from database
 async def disconnect_db():
     """Disconnect from the database"""
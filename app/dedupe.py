@@ -0,0 +1,399 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List
+from dotenv import load_dotenv
+import app.db as db
+from app.events import hub
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Pairs scoring at or above this are reported as likely duplicates
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.5"))
+# Blocks larger than this (e.g. a very common surname) are skipped when pairing
+DEDUPE_MAX_BLOCK = int(os.getenv("DEDUPE_MAX_BLOCK", "200"))
+
+DEDUPE_COLUMNS = (
+    "employee_id", "emp_code", "first_name", "last_name", "email", "phone", "thai_id_or_passport",
+)
+
+# Weight each matching signal adds to a pair's score (capped at 1.0)
+MATCH_WEIGHTS = {
+    "thai_id_or_passport": 0.6,
+    "email": 0.3,
+    "phone": 0.2,
+    "name": 0.35,
+}
+# Minimum full-name similarity before the name counts as a signal
+NAME_SIMILARITY = 0.85
+# A write may commit this long after it set updated_at; a rebuild re-indexes
+# employees updated this long before it started, in case it missed them
+REBUILD_WRITE_MARGIN = timedelta(minutes=1)
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"), "l": "4", **dict.fromkeys("mn", "5"), "r": "6",
+}
+
+def normalize_id(value) -> str:
+    """Thai ID / passport with spaces and dashes removed"""
+    return re.sub(r"[^0-9A-Za-z]", "", value or "").upper()
+
+def normalize_email(value) -> str:
+    """Lowercased email without a +tag"""
+    value = (value or "").strip().lower()
+    if "@" not in value:
+        return ""
+    local, domain = value.rsplit("@", 1)
+    return f"{local.split('+', 1)[0]}@{domain}"
+
+def normalize_phone(value) -> str:
+    """Last nine digits, so +66 81 234 5678 and 081-234-5678 match"""
+    digits = re.sub(r"\D", "", value or "")
+    return digits[-9:] if len(digits) >= 7 else ""
+
+def soundex(name) -> str:
+    """American Soundex code; non-Latin names fall back to their casefolded form"""
+    letters = re.sub(r"[^a-z]", "", (name or "").lower())
+    if not letters:
+        return re.sub(r"\s+", "", (name or "").casefold())
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code
+        if letter not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+def full_name(record: dict) -> str:
+    return f"{record.get('first_name') or ''} {record.get('last_name') or ''}".strip().casefold()
+
+def prepare(record) -> dict:
+    """Normalized fields used for blocking and scoring"""
+    record = {name: record[name] for name in DEDUPE_COLUMNS}
+    record["norm_id"] = normalize_id(record["thai_id_or_passport"])
+    record["norm_email"] = normalize_email(record["email"])
+    record["norm_phone"] = normalize_phone(record["phone"])
+    record["norm_name"] = full_name(record)
+    return record
+
+def blocking_keys(record: dict) -> List[str]:
+    """Keys that put possible duplicates of this employee into the same block"""
+    keys = []
+    if record["norm_id"]:
+        keys.append(f"id:{record['norm_id']}")
+    if record["norm_email"]:
+        keys.append(f"email:{record['norm_email']}")
+    if record["norm_phone"]:
+        keys.append(f"phone:{record['norm_phone']}")
+    if record["first_name"] and record["last_name"]:
+        keys.append(f"name:{soundex(record['last_name'])}:{soundex(record['first_name'])}")
+    return keys
+
+def score_pair(a: dict, b: dict):
+    """Return (score, matched signals) for two prepared records"""
+    reasons = []
+    if a["norm_id"] and a["norm_id"] == b["norm_id"]:
+        reasons.append("thai_id_or_passport")
+    if a["norm_email"] and a["norm_email"] == b["norm_email"]:
+        reasons.append("email")
+    if a["norm_phone"] and a["norm_phone"] == b["norm_phone"]:
+        reasons.append("phone")
+    score = sum(MATCH_WEIGHTS[reason] for reason in reasons)
+
+    similarity = SequenceMatcher(None, a["norm_name"], b["norm_name"]).ratio()
+    if similarity >= NAME_SIMILARITY:
+        reasons.append("name")
+        score += MATCH_WEIGHTS["name"] * similarity
+    return round(min(score, 1.0), 3), reasons
+
+# Latest archived period of everyone not currently employed. Archived
+# employees stay in the index, so a re-hire under a new code is still flagged.
+_ARCHIVED_RECORDS = f"""
+    SELECT {', '.join(DEDUPE_COLUMNS)} FROM EmployeeArchive
+    WHERE archive_id IN (SELECT MAX(archive_id) FROM EmployeeArchive GROUP BY employee_id)
+        AND employee_id NOT IN (SELECT employee_id FROM Employee)
+"""
+
+async def _fetch_records(ids: Iterable[int]) -> Dict[int, dict]:
+    """Prepared records by id, from Employee or else the latest archived period"""
+    records = {}
+    for chunk in db.chunked(ids):
+        placeholders, params = db.in_clause(chunk)
+        rows = await db.database.fetch_all(
+            f"SELECT {', '.join(DEDUPE_COLUMNS)} FROM Employee WHERE employee_id IN ({placeholders})",
+            params
+        )
+        for row in rows:
+            records[row["employee_id"]] = prepare(row)
+        missing = [employee_id for employee_id in chunk if employee_id not in records]
+        if missing:
+            placeholders, params = db.in_clause(missing)
+            rows = await db.database.fetch_all(
+                f"SELECT {', '.join(DEDUPE_COLUMNS)} FROM EmployeeArchive WHERE employee_id IN ({placeholders}) ORDER BY archive_id",
+                params
+            )
+            # Later periods overwrite earlier ones
+            for row in rows:
+                records[row["employee_id"]] = prepare(row)
+    return records
+
+async def _save_candidates(pairs: list):
+    """Insert scored pairs as (low id, high id, score, reasons)"""
+    now = datetime.utcnow()
+    await db.database.execute_many(
+        """
+        INSERT OR REPLACE INTO DuplicateCandidate (employee_id, duplicate_id, score, reasons, detected_at)
+        VALUES (:employee_id, :duplicate_id, :score, :reasons, :detected_at)
+        """,
+        [
+            {"employee_id": low, "duplicate_id": high, "score": score, "reasons": ",".join(reasons), "detected_at": now}
+            for low, high, score, reasons in pairs
+        ]
+    )
+
+async def remove_employees(ids: List[int]):
+    """Drop blocking keys and candidate pairs for deleted employees"""
+    for chunk in db.chunked(ids):
+        placeholders, params = db.in_clause(chunk)
+        await db.database.execute(f"DELETE FROM EmployeeBlockKey WHERE employee_id IN ({placeholders})", params)
+        await db.database.execute(
+            f"DELETE FROM DuplicateCandidate WHERE employee_id IN ({placeholders}) OR duplicate_id IN ({placeholders})",
+            params
+        )
+
+async def index_employees(ids: List[int]) -> List[dict]:
+    """Re-key the given employees and score them against their blocks.
+
+    Used after creates and updates; only employees sharing a blocking key
+    are compared, so the cost depends on block sizes rather than table size.
+    """
+    records = await _fetch_records(ids)
+    await remove_employees(list(ids))
+    if not records:
+        return []
+
+    keys_by_id = {employee_id: blocking_keys(record) for employee_id, record in records.items()}
+    all_keys = sorted({key for keys in keys_by_id.values() for key in keys})
+
+    # Existing members of each block, read before the new keys are written
+    members = defaultdict(set)
+    for chunk in db.chunked(all_keys):
+        placeholders, params = db.in_clause(chunk, "key")
+        rows = await db.database.fetch_all(
+            f"SELECT block_key, employee_id FROM EmployeeBlockKey WHERE block_key IN ({placeholders})",
+            params
+        )
+        for row in rows:
+            members[row["block_key"]].add(row["employee_id"])
+
+    await db.database.execute_many(
+        "INSERT OR IGNORE INTO EmployeeBlockKey (employee_id, block_key) VALUES (:employee_id, :block_key)",
+        [{"employee_id": employee_id, "block_key": key} for employee_id, keys in keys_by_id.items() for key in keys]
+    )
+
+    # Indexed ids also block against each other (bulk updates, imports)
+    for employee_id, keys in keys_by_id.items():
+        for key in keys:
+            members[key].add(employee_id)
+
+    candidates = {}
+    for employee_id, keys in keys_by_id.items():
+        for key in keys:
+            block = members[key]
+            if len(block) > DEDUPE_MAX_BLOCK:
+                continue
+            for other_id in block:
+                if other_id != employee_id:
+                    candidates[(min(employee_id, other_id), max(employee_id, other_id))] = None
+
+    others = await _fetch_records({other for pair in candidates for other in pair} - set(records))
+    others.update(records)
+
+    pairs = []
+    for low, high in candidates:
+        if low in others and high in others:
+            score, reasons = score_pair(others[low], others[high])
+            if score >= DEDUPE_THRESHOLD:
+                pairs.append((low, high, score, reasons))
+    if pairs:
+        await _save_candidates(pairs)
+
+    return [
+        {"employee_id": low, "duplicate_id": high, "score": score, "reasons": reasons}
+        for low, high, score, reasons in sorted(pairs, key=lambda pair: -pair[2])
+    ]
+
+def _score_blocks(records: Dict[int, dict]) -> tuple:
+    """Block every record and score each pair once; pure CPU work for a thread"""
+    blocks = defaultdict(list)
+    for employee_id, record in records.items():
+        for key in blocking_keys(record):
+            blocks[key].append(employee_id)
+
+    pairs = []
+    seen = set()
+    oversized = 0
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        if len(members) > DEDUPE_MAX_BLOCK:
+            oversized += 1
+            continue
+        members.sort()
+        for i, low in enumerate(members):
+            for high in members[i + 1:]:
+                if (low, high) in seen:
+                    continue
+                seen.add((low, high))
+                score, reasons = score_pair(records[low], records[high])
+                if score >= DEDUPE_THRESHOLD:
+                    pairs.append((low, high, score, reasons))
+    return blocks, pairs, len(seen), oversized
+
+async def rebuild_index() -> dict:
+    """Batch mode: rebuild every blocking key and rescore the whole table.
+
+    Blocking and scoring run in a thread so the event loop keeps serving
+    requests (and job heartbeats) during a large scan. Writes that land
+    meanwhile are indexed incrementally and then overwritten by the scan's
+    older rows, so when the data version has moved, employees updated since
+    the scan started are re-indexed (and deleted ones dropped) in the same
+    transaction that replaces the index.
+    """
+    started = time.perf_counter()
+    scan_started = datetime.utcnow()
+    version, _ = await db.get_data_version()
+    rows = await db.database.fetch_all(f"SELECT {', '.join(DEDUPE_COLUMNS)} FROM Employee")
+    rows += await db.database.fetch_all(_ARCHIVED_RECORDS)
+    records = {row["employee_id"]: prepare(row) for row in rows}
+    blocks, pairs, scored, oversized = await asyncio.to_thread(_score_blocks, records)
+
+    reindexed = []
+    async with db.database.transaction():
+        await db.database.execute("DELETE FROM EmployeeBlockKey")
+        await db.database.execute("DELETE FROM DuplicateCandidate")
+        await db.database.execute_many(
+            "INSERT INTO EmployeeBlockKey (employee_id, block_key) VALUES (:employee_id, :block_key)",
+            [{"employee_id": employee_id, "block_key": key} for key, members in blocks.items() for employee_id in members]
+        )
+        if pairs:
+            await _save_candidates(pairs)
+        # The DELETE above holds the write lock, so the version cannot move again until commit
+        if (await db.get_data_version())[0] != version:
+            gone = await db.database.fetch_all(
+                """
+                SELECT DISTINCT employee_id FROM EmployeeBlockKey
+                WHERE employee_id NOT IN (SELECT employee_id FROM Employee)
+                    AND employee_id NOT IN (SELECT employee_id FROM EmployeeArchive)
+                """
+            )
+            await remove_employees([row["employee_id"] for row in gone])
+            changed = await db.database.fetch_all(
+                "SELECT employee_id FROM Employee WHERE updated_at >= :since",
+                {"since": scan_started - REBUILD_WRITE_MARGIN}
+            )
+            reindexed = [row["employee_id"] for row in changed]
+            await index_employees(reindexed)
+
+    return {
+        "employees": len(records),
+        "blocks": len(blocks),
+        "oversized_blocks": oversized,
+        "pairs_scored": scored,
+        "duplicates": len(pairs),
+        "reindexed": len(reindexed),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+async def ensure_index():
+    """Build the index once for databases created before duplicate detection existed"""
+    try:
+        indexed = await db.database.fetch_val("SELECT COUNT(*) FROM EmployeeBlockKey")
+        employees = await db.database.fetch_val("SELECT COUNT(*) FROM Employee")
+        if employees and not indexed:
+            stats = await rebuild_index()
+            logger.info("Duplicate index built: %s", stats)
+    except Exception as e:
+        logger.exception("Duplicate index build error: %s", e)
+
+async def fetch_duplicates(employee_id: int = None, limit: int = 100) -> List[dict]:
+    """Stored duplicate pairs, highest score first, with both employees' codes and names.
+
+    Archived employees are named from their latest period. Pairs where both
+    sides are archived are left out.
+    """
+    query = """
+        SELECT d.employee_id, d.duplicate_id, d.score, d.reasons, d.detected_at,
+               COALESCE(a.emp_code, aa.emp_code) AS emp_code,
+               COALESCE(a.first_name, aa.first_name) AS first_name,
+               COALESCE(a.last_name, aa.last_name) AS last_name,
+               a.employee_id IS NULL AS archived,
+               COALESCE(b.emp_code, ba.emp_code) AS duplicate_emp_code,
+               COALESCE(b.first_name, ba.first_name) AS duplicate_first_name,
+               COALESCE(b.last_name, ba.last_name) AS duplicate_last_name,
+               b.employee_id IS NULL AS duplicate_archived
+        FROM DuplicateCandidate d
+        LEFT JOIN Employee a ON a.employee_id = d.employee_id
+        LEFT JOIN EmployeeArchive aa ON a.employee_id IS NULL AND aa.archive_id = (
+            SELECT MAX(archive_id) FROM EmployeeArchive WHERE employee_id = d.employee_id
+        )
+        LEFT JOIN Employee b ON b.employee_id = d.duplicate_id
+        LEFT JOIN EmployeeArchive ba ON b.employee_id IS NULL AND ba.archive_id = (
+            SELECT MAX(archive_id) FROM EmployeeArchive WHERE employee_id = d.duplicate_id
+        )
+        WHERE (a.employee_id IS NOT NULL OR b.employee_id IS NOT NULL)
+            AND COALESCE(a.employee_id, aa.employee_id) IS NOT NULL
+            AND COALESCE(b.employee_id, ba.employee_id) IS NOT NULL
+    """
+    values = {"limit": limit}
+    if employee_id is not None:
+        query += " AND (d.employee_id = :employee_id OR d.duplicate_id = :employee_id)"
+        values["employee_id"] = employee_id
+    query += " ORDER BY d.score DESC, d.duplicate_id DESC LIMIT :limit"
+    rows = await db.database.fetch_all(query, values)
+    return [
+        {
+            "score": row["score"],
+            "reasons": row["reasons"].split(",") if row["reasons"] else [],
+            "detected_at": row["detected_at"],
+            "employee": {
+                "employee_id": row["employee_id"], "emp_code": row["emp_code"],
+                "name": f"{row['first_name']} {row['last_name']}",
+                "archived": bool(row["archived"]),
+            },
+            "duplicate": {
+                "employee_id": row["duplicate_id"], "emp_code": row["duplicate_emp_code"],
+                "name": f"{row['duplicate_first_name']} {row['duplicate_last_name']}",
+                "archived": bool(row["duplicate_archived"]),
+            },
+        }
+        for row in rows
+    ]
+
+async def handle_change(event: dict):
+    """Keep the blocking index in step with employee writes.
+
+    Archived employees keep their keys and pairs; only deletes remove them.
+    """
+    if event["entity"] != "employee" or not event["ids"] or event["action"] == "archived":
+        return
+    if event["action"] == "deleted":
+        await remove_employees(event["ids"])
+    else:
+        await index_employees(event["ids"])
+
+hub.add_listener(handle_change)
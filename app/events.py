@@ -0,0 +1,132 @@
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from typing import Callable, Iterable, List, Optional
+import app.db as db
+
+logger = logging.getLogger(__name__)
+
+# Number of recent events kept so reconnecting clients can catch up
+EVENTS_HISTORY = int(os.getenv("EVENTS_HISTORY", "1000"))
+# How often a worker checks the shared data version for writes made by other workers
+EVENTS_POLL_SECONDS = float(os.getenv("EVENTS_POLL_SECONDS", "2"))
+
+class ChangeHub:
+    """In-process publish/subscribe hub for Employee/User change events.
+
+    Events are encoded to SSE text once at publish time and kept in a ring
+    buffer. Subscribers only hold a cursor (the last event id they sent), so
+    publishing costs the same whether one tab or hundreds are listening.
+    """
+
+    def __init__(self, history: int = EVENTS_HISTORY):
+        self._events = deque(maxlen=history)
+        self._seq = 0
+        self._condition = None
+        self._listeners: List[Callable] = []
+        self.subscribers = 0
+        self.published = 0
+        self.known_version = None
+
+    @property
+    def last_id(self) -> int:
+        return self._seq
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def reset(self):
+        """Drop loop-bound state (called on startup)"""
+        self._condition = None
+
+    def add_listener(self, listener: Callable):
+        """Register an in-process callback run for every published event"""
+        self._listeners.append(listener)
+
+    async def publish(self, entity: str, action: str, ids: Iterable[int] = ()) -> dict:
+        """Publish a compact change event to every subscriber"""
+        self._seq += 1
+        event = {"id": self._seq, "entity": entity, "action": action, "ids": list(ids)}
+        encoded = f"id: {self._seq}\nevent: change\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+        self._events.append((self._seq, entity, encoded))
+        self.published += 1
+
+        condition = self._get_condition()
+        async with condition:
+            condition.notify_all()
+
+        for listener in self._listeners:
+            try:
+                result = listener(event)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.exception("Change listener error: %s", e)
+        return event
+
+    def events_after(self, cursor: int, entities: Optional[set] = None):
+        """Return (encoded events newer than cursor, new cursor, missed)"""
+        if not self._events or cursor >= self._seq:
+            return [], self._seq, False
+        # Events older than the buffer were dropped; the client must reload
+        missed = cursor < self._events[0][0] - 1
+        encoded = [
+            text for seq, entity, text in self._events
+            if seq > cursor and (entities is None or entity in entities)
+        ]
+        return encoded, self._seq, missed
+
+    async def wait(self, cursor: int, timeout: float) -> bool:
+        """Wait until an event newer than cursor is published or timeout passes"""
+        condition = self._get_condition()
+        async with condition:
+            if self._seq > cursor:
+                return True
+            try:
+                await asyncio.wait_for(condition.wait(), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self.subscribers,
+            "published": self.published,
+            "last_event_id": self._seq,
+            "buffered": len(self._events),
+        }
+
+hub = ChangeHub()
+
+async def notify_change(entity: str, action: str, ids: Iterable[int] = (), version: Optional[int] = None):
+    """Publish a change event for a committed write.
+
+    version is what db.bump_data_version() returned inside the write's
+    transaction. Without it the version is bumped here, after the commit,
+    which leaves a moment where new data is served under the old ETag.
+    """
+    if version is None:
+        version = await db.bump_data_version()
+    hub.known_version = version
+    await hub.publish(entity, action, ids)
+
+async def relay_remote_changes():
+    """Turn writes made by other worker processes into refresh events"""
+    while True:
+        await asyncio.sleep(EVENTS_POLL_SECONDS)
+        if not hub.subscribers:
+            continue
+        try:
+            version, _ = await db.get_data_version()
+        except Exception as e:
+            logger.warning("Change relay error: %s", e)
+            continue
+        if hub.known_version is None:
+            hub.known_version = version
+        elif version != hub.known_version:
+            hub.known_version = version
+            await hub.publish("all", "refresh")
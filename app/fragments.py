@@ -0,0 +1,55 @@
+from fastapi import Request
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
+from fastapi.templating import Jinja2Templates
+from typing import Optional
+from urllib.parse import urlencode
+import json
+
+templates = Jinja2Templates(directory="app/templates")
+
+def wants_fragment(request: Request) -> bool:
+    """True when the page asked for a partial response (HX-Request header)"""
+    return request.headers.get("HX-Request", "").lower() == "true"
+
+def flash_headers(message: Optional[str] = None, error: Optional[str] = None, events: Optional[dict] = None) -> dict:
+    """HX-Trigger header carrying the flash message (and any extra events) for the page"""
+    events = dict(events or {})
+    if message or error:
+        events["showMessage"] = {"text": error or message, "level": "error" if error else "success"}
+    if not events:
+        return {}
+    return {"HX-Trigger": json.dumps(events)}
+
+def flash_redirect(
+    request: Request,
+    url: str,
+    message: Optional[str] = None,
+    error: Optional[str] = None
+) -> Response:
+    """Redirect with a flash message, or just send the message in fragment mode"""
+    if wants_fragment(request):
+        # 204 tells the page there is nothing to swap
+        return Response(status_code=204, headers=flash_headers(message, error))
+    params = {}
+    if message:
+        params["message"] = message
+    if error:
+        params["error"] = error
+    if params:
+        url = f"{url}?{urlencode(params)}"
+    return RedirectResponse(url=url, status_code=303)
+
+def render_fragment(
+    request: Request,
+    template_name: str,
+    context: dict,
+    message: Optional[str] = None,
+    events: Optional[dict] = None
+) -> HTMLResponse:
+    """Render a partial template with an optional flash message"""
+    context = {"request": request, **context}
+    return templates.TemplateResponse(template_name, context, headers=flash_headers(message, events=events))
+
+def empty_fragment(message: Optional[str] = None) -> HTMLResponse:
+    """Empty fragment used after deletes so the page drops the row"""
+    return HTMLResponse("", headers=flash_headers(message))
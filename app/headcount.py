@@ -0,0 +1,133 @@
+import csv
+import io
+from collections import OrderedDict
+from datetime import date
+from typing import Optional
+import numpy as np
+import app.db as db
+from app.payroll import to_day_array, EARLIEST, LATEST
+
+# Longest range a single request may ask for (about 50 years of days)
+HEADCOUNT_MAX_DAYS = 366 * 50
+HEADCOUNT_CACHE_SIZE = 32
+HEADCOUNT_INTERVALS = ("day", "month")
+HEADCOUNT_CSV_FIELDS = ("period", "headcount", "average_headcount", "hires", "leavers", "turnover_rate")
+
+def headcount_series(start_dates, leave_dates, first: date, last: date, interval: str = "month") -> list:
+    """Headcount, hires, leavers and turnover per day or month between first and last (inclusive).
+
+    Every employee contributes +1 on their start day and -1 on the day after
+    their leave_date; a single cumulative sum over that event array gives the
+    headcount for every day in the range.
+    """
+    d0 = np.datetime64(first, "D").astype(np.int64)
+    n_days = int(np.datetime64(last, "D").astype(np.int64) - d0) + 1
+
+    # Missing start means "employed since before the range", missing leave means "still employed"
+    starts = to_day_array(start_dates, EARLIEST).astype(np.int64) - d0
+    leaves = to_day_array(leave_dates, LATEST - np.timedelta64(1, "D")).astype(np.int64) - d0
+
+    # Index n_days is an overflow bucket for events after the range; events before
+    # the range land on day 0, where a start and its leave cancel out
+    def events(offsets):
+        return np.bincount(np.clip(offsets, 0, n_days), minlength=n_days + 1)
+
+    def in_range(offsets):
+        return np.bincount(offsets[(offsets >= 0) & (offsets < n_days)], minlength=n_days)
+
+    headcount = np.cumsum(events(starts) - events(leaves + 1))[:n_days]
+    hires = in_range(starts)
+    leavers = in_range(leaves)
+
+    days = np.datetime64(first, "D") + np.arange(n_days)
+    if interval == "month":
+        months = days.astype("datetime64[M]")
+        # First day index of each month in the range
+        bounds = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+        labels = [str(m) for m in months[bounds]]
+        lengths = np.diff(np.r_[bounds, n_days])
+        period_end = headcount[np.r_[bounds[1:], n_days] - 1]
+        average = np.add.reduceat(headcount, bounds) / lengths
+        hires = np.add.reduceat(hires, bounds)
+        leavers = np.add.reduceat(leavers, bounds)
+    else:
+        labels = [str(d) for d in days]
+        period_end = headcount
+        average = headcount.astype(np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        turnover = np.where(average > 0, leavers / average * 100, 0.0)
+
+    return [
+        {
+            "period": labels[i],
+            "headcount": int(period_end[i]),
+            "average_headcount": round(float(average[i]), 2),
+            "hires": int(hires[i]),
+            "leavers": int(leavers[i]),
+            "turnover_rate": round(float(turnover[i]), 2),
+        }
+        for i in range(len(labels))
+    ]
+
+def series_to_csv(series: list) -> str:
+    """Render a headcount series as CSV text"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=HEADCOUNT_CSV_FIELDS)
+    writer.writeheader()
+    writer.writerows(series)
+    return buffer.getvalue()
+
+# Results keyed by (data version, range, interval, filters)
+_series_cache = OrderedDict()
+
+async def get_headcount_series(
+    first: date,
+    last: date,
+    interval: str = "month",
+    employment: Optional[str] = None,
+    status: Optional[str] = None
+) -> dict:
+    """Headcount series for the range, optionally filtered by employment and status"""
+    version, _ = await db.get_data_version()
+    key = (version, first, last, interval, employment, status)
+    cached = _series_cache.get(key)
+    if cached is not None:
+        _series_cache.move_to_end(key)
+        return cached
+
+    conditions = []
+    values = {}
+    if employment:
+        conditions.append("LOWER(employment) = :employment")
+        values["employment"] = employment.lower()
+    if status:
+        conditions.append("LOWER(status) = :status")
+        values["status"] = status.lower()
+    # Archived leavers still count towards the periods they worked in
+    query = """
+    SELECT start_date, leave_date FROM (
+        SELECT start_date, leave_date, employment, status FROM Employee
+        UNION ALL SELECT start_date, leave_date, employment, status FROM EmployeeArchive
+    )
+    """
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    rows = await db.database.fetch_all(query, values)
+    start_dates = [row[0] for row in rows]
+    leave_dates = [row[1] for row in rows]
+
+    result = {
+        "start": first.isoformat(),
+        "end": last.isoformat(),
+        "interval": interval,
+        "filters": {"employment": employment, "status": status},
+        "employees": len(rows),
+        "data_version": version,
+        "series": headcount_series(start_dates, leave_dates, first, last, interval),
+    }
+    _series_cache[key] = result
+    while len(_series_cache) > HEADCOUNT_CACHE_SIZE:
+        _series_cache.popitem(last=False)
+    return result
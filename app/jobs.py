@@ -0,0 +1,436 @@
+import asyncio
+import csv
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import sqlalchemy
+from dotenv import load_dotenv
+import app.db as db
+from app.dedupe import rebuild_index
+from app.queries import EMPLOYEE_LIST_COLUMNS
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Jobs run at the same time in one worker process
+JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", "2"))
+# Result files are written under JOBS_DIR/<job_id>/
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join("data", "jobs"))
+# How often a worker looks for jobs queued by other workers
+JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "2"))
+# A running job whose worker stopped sending heartbeats this long ago is requeued
+JOBS_STALE_SECONDS = float(os.getenv("JOBS_STALE_SECONDS", "60"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOB_HEARTBEAT_SECONDS = 10
+# Minimum seconds between progress writes for one job
+JOB_PROGRESS_INTERVAL = 0.5
+JOB_EXPORT_BATCH_SIZE = 1000
+
+class JobCancelled(Exception):
+    """Raised inside a job when a cancel was requested"""
+
+class JobType:
+    def __init__(self, handler: Callable, roles: tuple):
+        self.handler = handler
+        self.roles = roles
+
+# kind -> JobType; filled by the @job_type decorator
+JOB_TYPES: Dict[str, JobType] = {}
+
+def job_type(kind: str, roles: tuple = ("admin",)):
+    """Register an async handler(ctx) for a job kind and the roles allowed to submit it"""
+    def register(handler: Callable):
+        JOB_TYPES[kind] = JobType(handler, roles)
+        return handler
+    return register
+
+class JobContext:
+    """What a running job handler sees: params, checkpoint, progress and output files"""
+
+    def __init__(self, job: dict):
+        self.job_id = job["job_id"]
+        self.claim = job["claim"]
+        self.params = json.loads(job["params"] or "{}")
+        # State saved by a previous attempt, so interrupted jobs can resume
+        self.checkpoint = json.loads(job["checkpoint"] or "{}")
+        self.result_file = None
+        self._last_write = 0.0
+
+    def output_path(self, filename: str) -> str:
+        """Path for a result file; the last one requested is offered for download"""
+        directory = os.path.join(JOBS_DIR, self.job_id)
+        os.makedirs(directory, exist_ok=True)
+        self.result_file = os.path.join(directory, os.path.basename(filename))
+        return self.result_file
+
+    async def progress(self, fraction: float, message: Optional[str] = None, checkpoint: Optional[dict] = None):
+        """Report progress (0..1); raises JobCancelled if a cancel was requested"""
+        now = time.monotonic()
+        if checkpoint is None and now - self._last_write < JOB_PROGRESS_INTERVAL and fraction < 1:
+            return
+        self._last_write = now
+        values = {
+            "job_id": self.job_id,
+            "claim": self.claim,
+            "progress": max(0.0, min(float(fraction), 1.0)),
+            "message": message,
+            "heartbeat_at": time.time(),
+        }
+        query = "UPDATE Job SET progress = :progress, message = COALESCE(:message, message), heartbeat_at = :heartbeat_at"
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+            query += ", checkpoint = :checkpoint"
+            values["checkpoint"] = json.dumps(checkpoint)
+        await db.database.execute(query + " WHERE job_id = :job_id AND claim = :claim", values)
+
+        cancel_requested = await db.database.fetch_val(
+            "SELECT cancel_requested FROM Job WHERE job_id = :job_id", {"job_id": self.job_id}
+        )
+        if cancel_requested:
+            raise JobCancelled()
+
+async def submit_job(
+    kind: str,
+    params: Optional[dict] = None,
+    user_id: Optional[int] = None,
+    job_id: Optional[str] = None,
+    retry_failed: bool = False
+) -> str:
+    """Queue a job and wake the local runner; returns the job id.
+
+    Passing a fixed job_id makes submission idempotent: if a job with that
+    id already exists, nothing new is queued. With retry_failed, an
+    existing job that failed or was cancelled is queued again from scratch.
+    """
+    job_id = job_id or uuid.uuid4().hex
+    conflict = "OR IGNORE"
+    retry = ""
+    if retry_failed:
+        conflict = ""
+        retry = """
+        ON CONFLICT (job_id) DO UPDATE SET status = 'queued', progress = 0, message = NULL, checkpoint = NULL,
+            result = NULL, result_file = NULL, error = NULL, attempts = 0, cancel_requested = 0, claim = NULL,
+            heartbeat_at = NULL, created_by = excluded.created_by, created_at = excluded.created_at,
+            started_at = NULL, finished_at = NULL
+        WHERE Job.status IN ('failed', 'cancelled')
+        """
+    await db.database.execute(
+        f"""
+        INSERT {conflict} INTO Job (job_id, kind, status, params, progress, attempts, cancel_requested, created_by, created_at)
+        VALUES (:job_id, :kind, 'queued', :params, 0, 0, 0, :created_by, :created_at){retry}
+        """,
+        {
+            "job_id": job_id,
+            "kind": kind,
+            "params": json.dumps(params or {}),
+            "created_by": user_id,
+            "created_at": datetime.utcnow(),
+        }
+    )
+    runner.wake()
+    return job_id
+
+def job_to_dict(row) -> dict:
+    """API view of a Job row"""
+    return {
+        "job_id": row["job_id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "params": json.loads(row["params"] or "{}"),
+        "progress": row["progress"] or 0,
+        "message": row["message"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "has_file": bool(row["result_file"]),
+        "error": row["error"],
+        "attempts": row["attempts"] or 0,
+        "cancel_requested": bool(row["cancel_requested"]),
+        "created_by": row["created_by"],
+        "created_at": row["created_at"],
+        "started_at": row["started_at"],
+        "finished_at": row["finished_at"],
+    }
+
+async def get_job(job_id: str):
+    return await db.database.fetch_one("SELECT * FROM Job WHERE job_id = :job_id", {"job_id": job_id})
+
+async def list_jobs(user_id: Optional[int] = None, limit: int = 50) -> List[dict]:
+    """Most recent jobs, optionally only those submitted by one user"""
+    query = "SELECT * FROM Job"
+    values = {"limit": limit}
+    if user_id is not None:
+        query += " WHERE created_by = :user_id"
+        values["user_id"] = user_id
+    rows = await db.database.fetch_all(query + " ORDER BY created_at DESC LIMIT :limit", values)
+    return [job_to_dict(row) for row in rows]
+
+async def cancel_job(job_id: str):
+    """Cancel a queued job now, or ask a running one to stop"""
+    await db.database.execute(
+        """
+        UPDATE Job SET status = 'cancelled', cancel_requested = 1, finished_at = :now
+        WHERE job_id = :job_id AND status = 'queued'
+        """,
+        {"job_id": job_id, "now": datetime.utcnow()}
+    )
+    await db.database.execute(
+        "UPDATE Job SET cancel_requested = 1 WHERE job_id = :job_id AND status = 'running'",
+        {"job_id": job_id}
+    )
+    # Jobs running in this worker stop right away; others notice on their next heartbeat
+    runner.cancel_local(job_id)
+
+class JobRunner:
+    """Claims queued jobs from the Job table and runs them with bounded concurrency"""
+
+    def __init__(self, concurrency: int = JOBS_CONCURRENCY):
+        self.concurrency = concurrency
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._wake = None
+        self._stopping = False
+        self.counts = {"succeeded": 0, "failed": 0, "cancelled": 0}
+
+    def reset(self):
+        """Drop loop-bound state (called on startup)"""
+        self._wake = None
+        self._stopping = False
+        self.tasks = {}
+
+    def _get_wake(self) -> asyncio.Event:
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        return self._wake
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    def cancel_local(self, job_id: str):
+        task = self.tasks.get(job_id)
+        if task:
+            task.cancel()
+
+    async def run_forever(self):
+        """Main loop: requeue stale jobs, claim free slots, sleep until woken"""
+        wake = self._get_wake()
+        while True:
+            try:
+                await self.recover_stale()
+                free = self.concurrency - len(self.tasks)
+                if free > 0:
+                    for job in await self.claim(free):
+                        task = asyncio.create_task(self.run(job))
+                        self.tasks[job["job_id"]] = task
+                        task.add_done_callback(lambda _, job_id=job["job_id"]: self._finished(job_id))
+            except Exception as e:
+                logger.exception("Job runner error: %s", e)
+            try:
+                await asyncio.wait_for(wake.wait(), JOBS_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+
+    def _finished(self, job_id: str):
+        self.tasks.pop(job_id, None)
+        self.wake()
+
+    async def claim(self, limit: int) -> List[dict]:
+        """Atomically move up to limit queued jobs to running for this worker"""
+        candidates = await db.database.fetch_all(
+            "SELECT job_id FROM Job WHERE status = 'queued' ORDER BY created_at LIMIT :limit",
+            {"limit": limit}
+        )
+        claimed = []
+        for candidate in candidates:
+            claim = uuid.uuid4().hex
+            # Only one worker's UPDATE can match status = 'queued'
+            await db.database.execute(
+                """
+                UPDATE Job SET status = 'running', claim = :claim, attempts = attempts + 1,
+                       heartbeat_at = :heartbeat_at, started_at = COALESCE(started_at, :now)
+                WHERE job_id = :job_id AND status = 'queued'
+                """,
+                {"job_id": candidate["job_id"], "claim": claim, "heartbeat_at": time.time(), "now": datetime.utcnow()}
+            )
+            job = await db.database.fetch_one(
+                "SELECT * FROM Job WHERE job_id = :job_id AND claim = :claim AND status = 'running'",
+                {"job_id": candidate["job_id"], "claim": claim}
+            )
+            if job:
+                claimed.append(dict(job._mapping))
+        return claimed
+
+    async def recover_stale(self):
+        """Requeue running jobs whose worker died; give up after JOBS_MAX_ATTEMPTS"""
+        cutoff = time.time() - JOBS_STALE_SECONDS
+        values = {"cutoff": cutoff, "max_attempts": JOBS_MAX_ATTEMPTS, "now": datetime.utcnow()}
+        await db.database.execute(
+            """
+            UPDATE Job SET status = 'failed', error = 'Interrupted too many times', claim = NULL, finished_at = :now
+            WHERE status = 'running' AND heartbeat_at < :cutoff AND attempts >= :max_attempts
+            """,
+            values
+        )
+        await db.database.execute(
+            """
+            UPDATE Job SET status = 'queued', claim = NULL, message = 'Resuming after interruption'
+            WHERE status = 'running' AND heartbeat_at < :cutoff
+            """,
+            {"cutoff": cutoff}
+        )
+
+    def _heartbeat(self, job_id: str, claim: str, loop: asyncio.AbstractEventLoop, stop: threading.Event):
+        """Keep the job marked alive and pick up cancels requested on other workers.
+
+        Runs in a thread on its own connection, so a handler that holds the
+        event loop with CPU work still heartbeats and is not requeued by
+        another worker's recover_stale while it is running.
+        """
+        while not stop.wait(JOB_HEARTBEAT_SECONDS):
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(
+                        sqlalchemy.text("UPDATE Job SET heartbeat_at = :now WHERE job_id = :job_id AND claim = :claim"),
+                        {"now": time.time(), "job_id": job_id, "claim": claim}
+                    )
+                    cancel_requested = connection.execute(
+                        sqlalchemy.text("SELECT cancel_requested FROM Job WHERE job_id = :job_id"), {"job_id": job_id}
+                    ).scalar()
+            except Exception as e:
+                logger.warning("Job %s heartbeat error: %s", job_id, e)
+                continue
+            if cancel_requested:
+                loop.call_soon_threadsafe(self.cancel_local, job_id)
+
+    async def _finish(self, ctx: JobContext, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+        await db.database.execute(
+            """
+            UPDATE Job SET status = :status, result = :result, result_file = :result_file, error = :error,
+                   progress = CASE WHEN :status = 'succeeded' THEN 1 ELSE progress END,
+                   claim = NULL, finished_at = :now
+            WHERE job_id = :job_id AND claim = :claim
+            """,
+            {
+                "status": status,
+                "result": json.dumps(result, default=str) if result is not None else None,
+                "result_file": ctx.result_file if status == "succeeded" else None,
+                "error": error,
+                "now": datetime.utcnow(),
+                "job_id": ctx.job_id,
+                "claim": ctx.claim,
+            }
+        )
+        self.counts[status] += 1
+
+    async def run(self, job: dict):
+        ctx = JobContext(job)
+        stop_heartbeat = threading.Event()
+        threading.Thread(
+            target=self._heartbeat, args=(ctx.job_id, ctx.claim, asyncio.get_running_loop(), stop_heartbeat),
+            name=f"job-heartbeat-{ctx.job_id}", daemon=True
+        ).start()
+        try:
+            job_kind = JOB_TYPES.get(job["kind"])
+            if job_kind is None:
+                await self._finish(ctx, "failed", error=f"Unknown job kind '{job['kind']}'")
+                return
+            result = await job_kind.handler(ctx)
+            await self._finish(ctx, "succeeded", result=result)
+        except (JobCancelled, asyncio.CancelledError):
+            if self._stopping:
+                # Shutting down: leave the job for shutdown() to requeue
+                raise
+            await self._finish(ctx, "cancelled")
+        except Exception as e:
+            logger.exception("Job %s (%s) failed: %s", ctx.job_id, job["kind"], e)
+            await self._finish(ctx, "failed", error=str(e))
+        finally:
+            stop_heartbeat.set()
+
+    async def shutdown(self):
+        """Stop local jobs and put them back in the queue so they resume on restart"""
+        self._stopping = True
+        job_ids = list(self.tasks)
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        for job_id in job_ids:
+            # The interrupted attempt does not count against JOBS_MAX_ATTEMPTS
+            await db.database.execute(
+                """
+                UPDATE Job SET status = 'queued', claim = NULL, attempts = MAX(attempts - 1, 0),
+                       message = 'Resuming after restart'
+                WHERE job_id = :job_id AND status = 'running'
+                """,
+                {"job_id": job_id}
+            )
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "running": sorted(self.tasks),
+            **self.counts,
+        }
+
+runner = JobRunner()
+
+# Built-in job types
+
+@job_type("employee_export", roles=("admin", "hr"))
+async def export_employees(ctx: JobContext) -> dict:
+    """Write employees to CSV in id order; resumes after the last saved batch"""
+    path = ctx.output_path("employees.csv")
+    values = {}
+    where = ""
+    if ctx.params.get("status"):
+        where = " AND LOWER(status) = :status"
+        values["status"] = str(ctx.params["status"]).lower()
+    total = await db.database.fetch_val(f"SELECT COUNT(*) FROM Employee WHERE 1 = 1{where}", values) or 0
+
+    last_id = ctx.checkpoint.get("last_id", 0)
+    written = ctx.checkpoint.get("written", 0)
+    offset = ctx.checkpoint.get("offset")
+    resuming = last_id and offset is not None and os.path.exists(path)
+
+    with open(path, "r+" if resuming else "w", newline="", encoding="utf-8") as output:
+        if resuming:
+            # Drop anything written after the last checkpoint
+            output.truncate(offset)
+            output.seek(offset)
+        else:
+            last_id, written = 0, 0
+        writer = csv.writer(output)
+        if not resuming:
+            writer.writerow(EMPLOYEE_LIST_COLUMNS)
+
+        while True:
+            rows = await db.database.fetch_all(
+                f"SELECT {', '.join(EMPLOYEE_LIST_COLUMNS)} FROM Employee "
+                f"WHERE employee_id > :last_id{where} ORDER BY employee_id LIMIT :limit",
+                {**values, "last_id": last_id, "limit": JOB_EXPORT_BATCH_SIZE}
+            )
+            if not rows:
+                break
+            writer.writerows([tuple(row[name] for name in EMPLOYEE_LIST_COLUMNS) for row in rows])
+            output.flush()
+            last_id = rows[-1]["employee_id"]
+            written += len(rows)
+            await ctx.progress(
+                written / total if total else 1,
+                message=f"Exported {written} of {total} employees",
+                checkpoint={"last_id": last_id, "written": written, "offset": output.tell()}
+            )
+
+    return {"rows": written}
+
+@job_type("duplicate_scan", roles=("admin",))
+async def scan_duplicates(ctx: JobContext) -> dict:
+    """Rebuild the duplicate-employee index over the whole table"""
+    await ctx.progress(0, message="Scanning employees for duplicates")
+    return await rebuild_index()
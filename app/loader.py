@@ -0,0 +1,131 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+from fastapi import Request
+import app.db as db
+from app.queries import EmployeeRow, fetch_employee_list
+
+async def _load_users(ids: List[int]) -> Dict[int, dict]:
+    """Full User rows (as dicts, like get_current_user returns) by user_id"""
+    placeholders, values = db.in_clause(ids)
+    records = await db.database.fetch_all(f"SELECT * FROM User WHERE user_id IN ({placeholders})", values)
+    return {record["user_id"]: dict(record) for record in records}
+
+async def _load_employees(ids: List[int]) -> Dict[int, EmployeeRow]:
+    """Employee list rows by employee_id"""
+    placeholders, values = db.in_clause(ids)
+    return {row.employee_id: row for row in await fetch_employee_list(f"employee_id IN ({placeholders})", values)}
+
+# Point lookups the loader can batch: kind -> loader taking a list of ids
+BATCH_LOADERS: Dict[str, Callable[[List[int]], Awaitable[dict]]] = {
+    "user": _load_users,
+    "employee": _load_employees,
+}
+
+class RequestLoader:
+    """Memoizes and batches reads for the lifetime of one request.
+
+    `load(kind, id)` calls made in the same event-loop tick (for example from
+    tasks started together with `asyncio.gather`) are fetched with one
+    `IN (...)` query. Every result, including "not found", is kept until the
+    request ends, so the same row is never read twice. `memo` does the same
+    for any other read, keyed by the caller.
+
+    The batch query runs in the task that made the first load of the tick,
+    on that task's connection, so a load awaited inside a transaction sees
+    its uncommitted writes. Loads from tasks spawned inside a transaction
+    (gather) and `memo` use their own connection and see committed data only.
+    """
+
+    def __init__(self):
+        self._results: Dict[Hashable, asyncio.Future] = {}
+        self._queued: Dict[str, Dict[int, asyncio.Future]] = defaultdict(dict)
+        self.stats = {"queries": 0, "hits": 0}
+
+    def _future(self, key: Hashable) -> Optional[asyncio.Future]:
+        future = self._results.get(key)
+        if future is not None:
+            self.stats["hits"] += 1
+        return future
+
+    async def load(self, kind: str, key: int) -> Any:
+        """One row by id, or None; batched with other loads of the same kind"""
+        future = self._future((kind, key))
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._results[(kind, key)] = future
+        queued = self._queued[kind]
+        queued[key] = future
+        if len(queued) > 1:
+            return await asyncio.shield(future)
+        # First load of this tick: this task runs the batch query
+        await self._dispatch(kind)
+        return future.result()
+
+    async def load_many(self, kind: str, keys: List[int]) -> List[Any]:
+        return await asyncio.gather(*(self.load(kind, key) for key in keys))
+
+    async def _dispatch(self, kind: str):
+        queued = self._queued[kind]
+        try:
+            # Let the other tasks of this tick queue their ids first
+            await asyncio.sleep(0)
+            self._queued.pop(kind, None)
+            await self._fetch(kind, queued)
+        except asyncio.CancelledError:
+            # The loading task went away; finish the batch for the other waiters
+            self._queued.pop(kind, None)
+            asyncio.ensure_future(self._fetch(kind, queued))
+            raise
+
+    async def _fetch(self, kind: str, queued: Dict[int, asyncio.Future]):
+        ids = [key for key, future in queued.items() if not future.done()]
+        try:
+            found = {}
+            for chunk in db.chunked(ids):
+                self.stats["queries"] += 1
+                found.update(await BATCH_LOADERS[kind](chunk))
+        except Exception as e:
+            for key, future in queued.items():
+                # Failures are not cached; a later load retries
+                self._results.pop((kind, key), None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in queued.items():
+            if not future.done():
+                future.set_result(found.get(key))
+
+    async def memo(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Await fn(*args) once per key; concurrent callers share the result"""
+        future = self._future(("memo", key))
+        if future is None:
+            future = asyncio.ensure_future(self._run(fn, *args))
+            self._results[("memo", key)] = future
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            self._results.pop(("memo", key), None)
+            raise
+
+    async def _run(self, fn, *args):
+        self.stats["queries"] += 1
+        return await fn(*args)
+
+    def prime(self, kind: str, key: int, value: Any):
+        """Store a row the caller already has (for example after an update)"""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(value)
+        self._results[(kind, key)] = future
+
+    def forget(self, kind: str, key: Hashable):
+        self._results.pop((kind, key), None)
+
+def get_loader(request: Request) -> RequestLoader:
+    """The loader for this request, created on first use"""
+    loader = getattr(request.state, "loader", None)
+    if loader is None:
+        loader = RequestLoader()
+        request.state.loader = loader
+    return loader
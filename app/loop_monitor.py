@@ -0,0 +1,125 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Set LOOP_MONITOR_ENABLED=0 to turn the monitor off
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "1") != "0"
+# Seconds between lag samples
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))
+# Lag (milliseconds) counted as a stall; the watchdog captures a stack trace past it
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100"))
+# Recent samples kept for percentiles (600 x 0.1s = the last minute)
+LOOP_MONITOR_WINDOW = 600
+LOOP_MONITOR_STALLS_KEPT = 20
+LOOP_MONITOR_STACK_DEPTH = 25
+
+class LoopMonitor:
+    """Samples event-loop lag and captures what the loop was running when it stalled.
+
+    A coroutine sleeps for a fixed interval and measures how late it wakes
+    up. While the loop is blocked that coroutine cannot run at all, so a
+    watchdog thread watches its heartbeat and, once it is more than the
+    threshold behind, grabs the loop thread's current stack.
+    """
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, threshold_ms: float = LOOP_LAG_THRESHOLD_MS):
+        self.interval = interval
+        self.threshold = threshold_ms / 1000
+        self.samples = deque(maxlen=LOOP_MONITOR_WINDOW)
+        self.stalls = deque(maxlen=LOOP_MONITOR_STALLS_KEPT)
+        self.counts = {"samples": 0, "over_threshold": 0, "stacks_captured": 0}
+        self.max_lag = 0.0
+        self._beat: Optional[float] = None
+        self._loop_thread_id: Optional[int] = None
+        self._open_stall: Optional[dict] = None
+        self._stop = threading.Event()
+
+    async def run_forever(self):
+        """Sample until cancelled (started on startup, cancelled on shutdown)"""
+        if not LOOP_MONITOR_ENABLED:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop = threading.Event()
+        watchdog = threading.Thread(target=self._watch, args=(self._stop,), name="loop-monitor", daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                self._beat = now
+                self._record(max(0.0, now - expected))
+        finally:
+            self._stop.set()
+            self._beat = None
+
+    def _record(self, lag: float):
+        self.samples.append(lag)
+        self.counts["samples"] += 1
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.threshold:
+            self.counts["over_threshold"] += 1
+        stall = self._open_stall
+        if stall is not None:
+            # The loop is back; the stall lasted as long as this sample was late
+            stall["lag_ms"] = round(lag * 1000, 1)
+            self._open_stall = None
+
+    def _watch(self, stop: threading.Event):
+        while not stop.wait(self.interval / 2):
+            beat = self._beat
+            if beat is None or self._open_stall is not None:
+                continue
+            behind = time.monotonic() - beat - self.interval
+            if behind < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = traceback.format_stack(frame, limit=LOOP_MONITOR_STACK_DEPTH) if frame else []
+            stall = {
+                "detected_at": time.time(),
+                "behind_ms": round(behind * 1000, 1),
+                # Filled in when the loop recovers; None while it is still blocked
+                "lag_ms": None,
+                "stack": [line.rstrip() for entry in stack for line in entry.splitlines()],
+            }
+            self.counts["stacks_captured"] += 1
+            self.stalls.append(stall)
+            self._open_stall = stall
+
+    def _percentile(self, ordered: list, fraction: float) -> float:
+        if not ordered:
+            return 0.0
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self) -> dict:
+        """Lag figures over the recent window, without stack traces"""
+        ordered = sorted(self.samples)
+        return {
+            "enabled": LOOP_MONITOR_ENABLED,
+            "running": self._beat is not None,
+            "threshold_ms": self.threshold * 1000,
+            "window_samples": len(ordered),
+            "lag_ms": {
+                "p50": round(self._percentile(ordered, 0.5) * 1000, 1),
+                "p99": round(self._percentile(ordered, 0.99) * 1000, 1),
+                "max_window": round((ordered[-1] if ordered else 0.0) * 1000, 1),
+                "max_ever": round(self.max_lag * 1000, 1),
+            },
+            **self.counts,
+        }
+
+    def report(self) -> dict:
+        """Summary plus the most recent stalls with their stack traces, newest first"""
+        return {**self.summary(), "stalls": list(reversed(self.stalls))}
+
+monitor = LoopMonitor()
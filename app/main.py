@@ -1,13 +1,25 @@
+import asyncio
+import logging
+import os
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 from fastapi.exceptions import HTTPException
-from starlette.status import HTTP_404_NOT_FOUND
-from fastapi.templating import Jinja2Templates
+from fastapi.exception_handlers import http_exception_handler
 import app.db as db
+from app import events, dedupe, read_model, jobs, admission, maintenance, transitions, analytics, audit, archive, typeahead, photos
+from app.loop_monitor import monitor as loop_monitor
+from app.prerender import pages
 from app.routes import router
 
+# Background tasks (jobs, schedulers, change listeners) report through logging;
+# uvicorn only configures its own loggers
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
 # Create FastAPI app
 app = FastAPI(
     title="Employee Management System",
@@ -15,6 +27,11 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Shed load on expensive routes before it piles up (added first so CORS wraps the 503s)
+app.add_middleware(admission.AdmissionMiddleware)
+# Refuse oversized photo uploads while they stream in, before Starlette spools them
+app.add_middleware(photos.PhotoUploadLimitMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -34,26 +51,44 @@ app.include_router(router)
 @app.on_event("startup")
 async def startup_event():
     await db.connect_db()
+    events.hub.reset()
+    admission.reset()
+    pages.build()
+    read_model.reset()
+    await read_model.load()
+    typeahead.reset()
+    await typeahead.build()
+    jobs.runner.reset()
+    transitions.reset()
+    # Long-running background tasks, cancelled on shutdown
+    app.state.background_tasks = [
+        asyncio.create_task(loop_monitor.run_forever()),
+        asyncio.create_task(events.relay_remote_changes()),
+        asyncio.create_task(dedupe.ensure_index()),
+        asyncio.create_task(audit.ensure_migrated()),
+        asyncio.create_task(jobs.runner.run_forever()),
+        asyncio.create_task(maintenance.schedule_maintenance()),
+        asyncio.create_task(transitions.run_transitions_forever()),
+        asyncio.create_task(analytics.schedule_analytics()),
+        asyncio.create_task(archive.schedule_archive()),
+    ]
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    # Requeue running jobs while the database is still connected
+    await jobs.runner.shutdown()
+    tasks = getattr(app.state, "background_tasks", [])
+    for task in tasks:
+        task.cancel()
+    # Let cancelled tasks roll back any open transaction before disconnecting
+    await asyncio.gather(*tasks, return_exceptions=True)
     await db.disconnect_db()
 
-# Health check
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy", "message": "Employee Management System is running"}
-
-templates = Jinja2Templates(directory="app/templates")
-
 @app.exception_handler(HTTPException)
 async def custom_auth_exception_handler(request: Request, exc: HTTPException):
     # If the error is due to authentication, show 404 page
     if exc.detail == "Could not validate credentials":
-        return templates.TemplateResponse(
-            "error.html",  # Make sure you have this template
-            {"request": request},
-            status_code=HTTP_404_NOT_FOUND
-        )
+        # Pre-rendered error.html (404), same bytes for every request
+        return pages.response(request, "auth_error")
     # Otherwise, use the default handler
-    return await app.default_exception_handler(request, exc)
\ No newline at end of file
+    return await http_exception_handler(request, exc)
\ No newline at end of file
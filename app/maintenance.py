@@ -0,0 +1,262 @@
+"""SQLite maintenance: online backups, ANALYZE/optimize, incremental vacuum, integrity checks.
+
+Run from the project root:
+
+    python -m app.maintenance backup             # online backup into MAINTENANCE_BACKUP_DIR
+    python -m app.maintenance optimize vacuum    # several tasks in one go
+    python -m app.maintenance all
+    python -m app.maintenance enable-incremental-vacuum   # one-off, blocks writers while it runs
+"""
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+from typing import List, Optional
+from dotenv import load_dotenv
+import app.db as db
+from app.jobs import job_type, submit_job, JobContext
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_BACKUP_DIR = os.getenv("MAINTENANCE_BACKUP_DIR", os.path.join("data", "backups"))
+# Number of backup files kept; older ones are deleted after a successful backup
+MAINTENANCE_BACKUP_KEEP = int(os.getenv("MAINTENANCE_BACKUP_KEEP", "7"))
+# Pages copied per backup step, and the pause between steps so writers get the file
+MAINTENANCE_BACKUP_PAGES = int(os.getenv("MAINTENANCE_BACKUP_PAGES", "256"))
+MAINTENANCE_BACKUP_PAUSE = float(os.getenv("MAINTENANCE_BACKUP_PAUSE", "0.01"))
+# A write from another connection restarts a stepped copy; after this many
+# restarts the rest is copied in one step from a single read snapshot
+MAINTENANCE_BACKUP_MAX_RESTARTS = int(os.getenv("MAINTENANCE_BACKUP_MAX_RESTARTS", "3"))
+# Free pages released per incremental vacuum run
+MAINTENANCE_VACUUM_PAGES = int(os.getenv("MAINTENANCE_VACUUM_PAGES", "2000"))
+# Hours between scheduled maintenance runs (0 turns the schedule off)
+MAINTENANCE_INTERVAL_HOURS = float(os.getenv("MAINTENANCE_INTERVAL_HOURS", "24"))
+MAINTENANCE_SCHEDULED_TASKS = ["optimize", "vacuum", "backup"]
+MAINTENANCE_CHECK_SECONDS = 300
+MAINTENANCE_STATS_PREFIX = "maintenance:"
+
+def sqlite_path() -> str:
+    """Filesystem path of the SQLite database"""
+    if not db.DATABASE_URL.startswith("sqlite:///"):
+        raise RuntimeError("Database maintenance is only available for SQLite databases")
+    return db.DATABASE_URL[len("sqlite:///"):]
+
+def _connect() -> sqlite3.Connection:
+    # A separate connection with a generous busy timeout; never the app's pool
+    return sqlite3.connect(sqlite_path(), timeout=30)
+
+class _BackupRestarting(Exception):
+    """Raised from the progress callback to abandon a stepped copy that keeps restarting"""
+
+def backup(target: Optional[str] = None) -> dict:
+    """Copy the live database a few pages at a time with the SQLite backup API.
+
+    Each step holds the read lock only briefly, so writers are not blocked
+    for the length of the copy. A write from another connection restarts the
+    copy; after MAINTENANCE_BACKUP_MAX_RESTARTS restarts the copy is finished
+    in one step, which in WAL mode reads a single snapshot without blocking
+    writers. The copy is checked before it replaces the target, and old
+    backups beyond MAINTENANCE_BACKUP_KEEP are pruned.
+    """
+    if target is None:
+        os.makedirs(MAINTENANCE_BACKUP_DIR, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        target = os.path.join(MAINTENANCE_BACKUP_DIR, f"employee_management-{stamp}.db")
+    partial = target + ".part"
+    steps = 0
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal steps, restarts, last_remaining
+        steps += 1
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts >= MAINTENANCE_BACKUP_MAX_RESTARTS:
+                raise _BackupRestarting()
+        last_remaining = remaining
+        if remaining:
+            time.sleep(MAINTENANCE_BACKUP_PAUSE)
+
+    with closing(_connect()) as source, closing(sqlite3.connect(partial)) as destination:
+        try:
+            source.backup(destination, pages=MAINTENANCE_BACKUP_PAGES, progress=progress)
+            single_step = False
+        except _BackupRestarting:
+            source.backup(destination, pages=-1)
+            single_step = True
+        check = destination.execute("PRAGMA quick_check").fetchone()[0]
+    if check != "ok":
+        os.remove(partial)
+        raise RuntimeError(f"Backup failed its integrity check: {check}")
+    os.replace(partial, target)
+
+    pruned = []
+    if target.startswith(MAINTENANCE_BACKUP_DIR):
+        backups = sorted(glob.glob(os.path.join(MAINTENANCE_BACKUP_DIR, "employee_management-*.db")))
+        for old in backups[:-MAINTENANCE_BACKUP_KEEP] if MAINTENANCE_BACKUP_KEEP > 0 else []:
+            os.remove(old)
+            pruned.append(os.path.basename(old))
+    return {
+        "file": target, "bytes": os.path.getsize(target), "steps": steps,
+        "restarts": restarts, "single_step": single_step, "pruned": pruned,
+    }
+
+def optimize(full_analyze: bool = False) -> dict:
+    """Refresh planner statistics: full ANALYZE the first time, PRAGMA optimize after"""
+    with closing(_connect()) as connection:
+        has_stats = connection.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'"
+        ).fetchone()[0]
+        analyzed = full_analyze or not has_stats
+        if analyzed:
+            connection.execute("ANALYZE")
+        # Bounded sampling keeps optimize cheap on large tables
+        connection.execute("PRAGMA analysis_limit = 1000")
+        connection.execute("PRAGMA optimize")
+        connection.commit()
+    return {"analyzed": analyzed}
+
+def incremental_vacuum(pages: int = MAINTENANCE_VACUUM_PAGES) -> dict:
+    """Return up to `pages` free pages to the filesystem without rewriting the file"""
+    with closing(_connect()) as connection:
+        mode = connection.execute("PRAGMA auto_vacuum").fetchone()[0]
+        free_before = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        if mode != 2:
+            return {
+                "skipped": "auto_vacuum is not INCREMENTAL; run `python -m app.maintenance enable-incremental-vacuum` once",
+                "free_pages": free_before,
+            }
+        # executescript steps the pragma to completion; execute() would free a single page
+        connection.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        free_after = connection.execute("PRAGMA freelist_count").fetchone()[0]
+    return {"released_pages": free_before - free_after, "free_pages": free_after}
+
+def enable_incremental_vacuum() -> dict:
+    """Switch an existing database to auto_vacuum=INCREMENTAL (needs one full VACUUM)"""
+    with closing(_connect()) as connection:
+        connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.execute("VACUUM")
+        mode = connection.execute("PRAGMA auto_vacuum").fetchone()[0]
+    return {"auto_vacuum": mode}
+
+def integrity_check(full: bool = False) -> dict:
+    """PRAGMA quick_check (or the slower integrity_check) on the live database"""
+    pragma = "integrity_check" if full else "quick_check"
+    with closing(_connect()) as connection:
+        messages = [row[0] for row in connection.execute(f"PRAGMA {pragma}(20)").fetchall()]
+    return {"ok": messages == ["ok"], "messages": messages}
+
+MAINTENANCE_TASKS = {
+    "backup": backup,
+    "optimize": optimize,
+    "vacuum": incremental_vacuum,
+    "integrity": integrity_check,
+}
+
+def run_task(name: str) -> dict:
+    """Run one task, timing it and recording the outcome in SharedState"""
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        result = MAINTENANCE_TASKS[name]()
+        status = "ok"
+    except Exception as e:
+        logger.exception("Maintenance task %s failed: %s", name, e)
+        result = {"error": str(e)}
+        status = "failed"
+    record = {
+        "task": name,
+        "status": status,
+        "started_at": started_at,
+        "seconds": round(time.perf_counter() - start, 3),
+        "result": result,
+    }
+    with closing(_connect()) as connection:
+        connection.execute(
+            """
+            INSERT INTO SharedState (key, value, expires_at) VALUES (?, ?, NULL)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = NULL
+            """,
+            (MAINTENANCE_STATS_PREFIX + name, json.dumps(record))
+        )
+        connection.commit()
+    return record
+
+async def get_maintenance_stats() -> dict:
+    """Last run of each task plus current file statistics"""
+    rows = await db.database.fetch_all(
+        "SELECT key, value FROM SharedState WHERE key LIKE :prefix",
+        {"prefix": MAINTENANCE_STATS_PREFIX + "%"}
+    )
+    backups = sorted(glob.glob(os.path.join(MAINTENANCE_BACKUP_DIR, "employee_management-*.db")))
+    return {
+        "last_runs": {row["key"][len(MAINTENANCE_STATS_PREFIX):]: json.loads(row["value"]) for row in rows},
+        "page_count": await db.database.fetch_val("PRAGMA page_count"),
+        "free_pages": await db.database.fetch_val("PRAGMA freelist_count"),
+        "auto_vacuum": await db.database.fetch_val("PRAGMA auto_vacuum"),
+        "backups": [
+            {"file": os.path.basename(path), "bytes": os.path.getsize(path)}
+            for path in backups
+        ],
+    }
+
+@job_type("maintenance", roles=("admin",))
+async def run_maintenance(ctx: JobContext) -> dict:
+    """Run maintenance tasks in a thread so the event loop keeps serving requests"""
+    tasks = ctx.params.get("tasks") or MAINTENANCE_SCHEDULED_TASKS
+    unknown = [task for task in tasks if task not in MAINTENANCE_TASKS]
+    if unknown:
+        raise ValueError(f"Unknown maintenance tasks: {', '.join(unknown)}")
+    results = {}
+    for i, task in enumerate(tasks):
+        await ctx.progress(i / len(tasks), message=f"Running {task}")
+        results[task] = await asyncio.to_thread(run_task, task)
+    return results
+
+async def schedule_maintenance():
+    """Queue one maintenance job per interval; the fixed job id stops workers doubling up"""
+    if MAINTENANCE_INTERVAL_HOURS <= 0 or not db.DATABASE_URL.startswith("sqlite"):
+        return
+    interval = MAINTENANCE_INTERVAL_HOURS * 3600
+    while True:
+        # Wait first so short-lived processes and restarts stay quick
+        await asyncio.sleep(MAINTENANCE_CHECK_SECONDS)
+        try:
+            period = int(time.time() // interval)
+            await submit_job("maintenance", {"tasks": MAINTENANCE_SCHEDULED_TASKS}, job_id=f"maintenance-{period}")
+        except Exception as e:
+            logger.exception("Maintenance scheduler error: %s", e)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="SQLite maintenance for the employee database")
+    parser.add_argument(
+        "tasks", nargs="+",
+        choices=sorted(MAINTENANCE_TASKS) + ["all", "enable-incremental-vacuum"],
+        help="tasks to run, in order"
+    )
+    args = parser.parse_args(argv)
+    if not os.path.exists(sqlite_path()):
+        parser.error(f"No database at {sqlite_path()}; start the app once to create it")
+    # Run outcomes are recorded in SharedState, which an older database may not have yet
+    db.shared_state_table.create(db.engine, checkfirst=True)
+
+    for name in args.tasks:
+        if name == "enable-incremental-vacuum":
+            print(json.dumps({"task": name, "result": enable_incremental_vacuum()}))
+            continue
+        for task in (["integrity", "optimize", "vacuum", "backup"] if name == "all" else [name]):
+            record = run_task(task)
+            print(json.dumps(record))
+
+if __name__ == "__main__":
+    main()
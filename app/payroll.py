@@ -0,0 +1,152 @@
+import os
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Optional
+import numpy as np
+from dotenv import load_dotenv
+import app.db as db
+
+# Load environment variables
+load_dotenv()
+
+# Salary column is stored per month by default; set to "annual" if it holds yearly pay
+PAYROLL_SALARY_PERIOD = os.getenv("PAYROLL_SALARY_PERIOD", "monthly").lower()
+PAYROLL_MAX_MONTHS = 60
+PAYROLL_CACHE_SIZE = 32
+
+# Open-ended employment is represented with sentinel dates so the math needs no NaT checks
+EARLIEST = np.datetime64("1900-01-01", "D")
+LATEST = np.datetime64("9999-12-31", "D")
+
+def to_day_array(values, missing: np.datetime64) -> np.ndarray:
+    """Parse ISO dates (or date objects) into datetime64[D], filling blanks with missing"""
+    days = np.array([str(d)[:10] if d else "NaT" for d in values], dtype="datetime64[D]")
+    days[np.isnat(days)] = missing
+    return days
+
+def _encode(values):
+    """Category-code a column: (int codes array, labels in first-seen order)"""
+    # A dict lookup per value is several times faster than np.unique on strings
+    labels = {}
+    codes = np.fromiter((labels.setdefault(v, len(labels)) for v in values), dtype=np.int64)
+    return codes, list(labels)
+
+class PayrollFrame:
+    """Columnar view of the Employee columns needed for payroll math.
+
+    Pay depends on start_date and leave_date alone: a status only describes
+    the present, so using it would rewrite months when the employee was paid.
+    """
+
+    def __init__(self, salary, start, leave_end, employment_codes, employment_labels):
+        self.salary = salary                        # float64, monthly pay
+        self.start = start                          # datetime64[D], first paid day
+        self.leave_end = leave_end                  # datetime64[D], first unpaid day
+        self.employment_codes = employment_codes    # int index into employment_labels
+        self.employment_labels = employment_labels
+
+    def __len__(self):
+        return len(self.salary)
+
+    @classmethod
+    def from_columns(cls, salary, start_date, leave_date, employment):
+        """Build a frame from plain column lists (strings/None as returned by SQLite)"""
+        salary = np.asarray([s or 0.0 for s in salary], dtype=np.float64)
+        if PAYROLL_SALARY_PERIOD == "annual":
+            salary = salary / 12.0
+
+        start = to_day_array(start_date, EARLIEST)
+        # leave_date is the last working day, so pay stops the day after
+        leave_end = to_day_array(leave_date, LATEST - np.timedelta64(1, "D")) + np.timedelta64(1, "D")
+
+        employment_codes, employment_labels = _encode((e or "unspecified").lower() for e in employment)
+        return cls(salary, start, leave_end, employment_codes, employment_labels)
+
+def month_bounds(start_month: np.datetime64, months: int) -> np.ndarray:
+    """First day of each month, plus the first day after the last month"""
+    return (start_month + np.arange(months + 1)).astype("datetime64[D]")
+
+def project(frame: PayrollFrame, start_month: date, months: int = 12) -> dict:
+    """Prorated monthly payroll cost and headcount, broken down by employment type"""
+    first = np.datetime64(start_month.strftime("%Y-%m"), "M")
+    bounds = month_bounds(first, months)
+    n_types = len(frame.employment_labels)
+    salary = frame.salary
+    # Plain day numbers are cheaper to compare than datetime64 values
+    starts = frame.start.astype(np.int64)
+    ends = frame.leave_end.astype(np.int64)
+    day_bounds = bounds.astype(np.int64)
+
+    result_months = []
+    for i in range(months):
+        month_start, month_end = day_bounds[i], day_bounds[i + 1]
+        days_in_month = month_end - month_start
+
+        # Overlap of [start, leave_end) with [month_start, month_end) in days
+        days = np.minimum(ends, month_end) - np.maximum(starts, month_start)
+        np.clip(days, 0, None, out=days)
+
+        cost = salary * (days / days_in_month)
+        active = days > 0
+
+        by_cost = np.bincount(frame.employment_codes, weights=cost, minlength=n_types) if n_types else []
+        by_count = np.bincount(frame.employment_codes, weights=active, minlength=n_types) if n_types else []
+        result_months.append({
+            "month": str(first + i),
+            "total_cost": round(float(cost.sum()), 2),
+            "headcount": int(active.sum()),
+            "prorated_headcount": int((active & (days < days_in_month)).sum()),
+            "by_employment": {
+                label: {"cost": round(float(by_cost[k]), 2), "headcount": int(by_count[k])}
+                for k, label in enumerate(frame.employment_labels)
+            },
+        })
+
+    return {
+        "start_month": str(first),
+        "months": result_months,
+        "total_cost": round(sum(m["total_cost"] for m in result_months), 2),
+        "employees": len(frame),
+    }
+
+async def load_payroll_frame() -> PayrollFrame:
+    """Load the payroll columns once from the Employee and EmployeeArchive tables"""
+    # Archived leavers matter for projections that start in the past
+    rows = await db.database.fetch_all(
+        """
+        SELECT salary, start_date, leave_date, employment FROM Employee
+        UNION ALL SELECT salary, start_date, leave_date, employment FROM EmployeeArchive
+        """
+    )
+    columns = list(zip(*[tuple(row[i] for i in range(4)) for row in rows])) or [[], [], [], []]
+    return PayrollFrame.from_columns(*columns)
+
+# Results keyed by (data version, start month, months)
+_projection_cache = OrderedDict()
+payroll_cache_stats = {"hits": 0, "misses": 0}
+
+async def get_payroll_projection(start_month: Optional[date] = None, months: int = 12) -> dict:
+    """Payroll projection served from cache until Employee data changes"""
+    start_month = (start_month or date.today()).replace(day=1)
+    months = max(1, min(months, PAYROLL_MAX_MONTHS))
+    version, _ = await db.get_data_version()
+    key = (version, start_month, months)
+
+    cached = _projection_cache.get(key)
+    if cached is not None:
+        payroll_cache_stats["hits"] += 1
+        _projection_cache.move_to_end(key)
+        return cached
+
+    payroll_cache_stats["misses"] += 1
+    started = time.perf_counter()
+    frame = await load_payroll_frame()
+    result = project(frame, start_month, months)
+    result["data_version"] = version
+    result["compute_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    _projection_cache[key] = result
+    while len(_projection_cache) > PAYROLL_CACHE_SIZE:
+        _projection_cache.popitem(last=False)
+    return result
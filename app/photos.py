@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import uuid
+from typing import Optional
+from fastapi import HTTPException, UploadFile
+from dotenv import load_dotenv
+from app.jobs import job_type, submit_job, JobContext
+
+# Load environment variables
+load_dotenv()
+
+# Originals live under PHOTOS_DIR/originals/<hash[:2]>/<hash>, thumbnails under
+# PHOTOS_DIR/thumbs/<hash[:2]>/<hash>-<size>.<format>
+PHOTOS_DIR = os.getenv("PHOTOS_DIR", os.path.join("data", "photos"))
+PHOTO_MAX_BYTES = int(os.getenv("PHOTO_MAX_BYTES", str(10 * 1024 * 1024)))
+# Square thumbnail sizes in pixels: 80 for the list avatar (40px at 2x), 256 for larger views
+PHOTO_THUMB_SIZES = (80, 256)
+PHOTO_THUMB_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+PHOTO_THUMB_QUALITY = int(os.getenv("PHOTO_THUMB_QUALITY", "80"))
+PHOTO_CHUNK_SIZE = 64 * 1024
+# Multipart framing and headers allowed on top of the photo itself
+PHOTO_FORM_OVERHEAD = 64 * 1024
+PHOTO_ACCEPTED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF"}
+
+class PhotoError(ValueError):
+    """Rejected upload (too large, not an image)"""
+
+def _format_size(size: int) -> str:
+    """Bytes as MB from 1 MiB up, else KB"""
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f}".removesuffix(".0") + " MB"
+    return f"{size / 1024:.0f} KB" if size >= 1024 else f"{size} bytes"
+
+def _too_large_message() -> str:
+    return f"Photo is larger than {_format_size(PHOTO_MAX_BYTES)}"
+
+def is_photo_hash(value: str) -> bool:
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+def original_path(photo_hash: str) -> str:
+    return os.path.join(PHOTOS_DIR, "originals", photo_hash[:2], photo_hash)
+
+def thumbnail_path(photo_hash: str, size: int, extension: str) -> str:
+    return os.path.join(PHOTOS_DIR, "thumbs", photo_hash[:2], f"{photo_hash}-{size}.{extension}")
+
+def _check_image(path: str):
+    from PIL import Image
+    try:
+        with Image.open(path) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        raise PhotoError("File is not a readable image")
+    if image_format not in PHOTO_ACCEPTED_FORMATS:
+        raise PhotoError(f"Unsupported image format {image_format}")
+
+async def save_upload(upload: UploadFile) -> str:
+    """Stream an upload to disk, hashing as it goes; returns the SHA-256 content hash.
+
+    Identical photos share one file, so re-uploading is free and the
+    hash-based URLs never change meaning.
+    """
+    temp_dir = os.path.join(PHOTOS_DIR, "tmp")
+    os.makedirs(temp_dir, exist_ok=True)
+    temp_path = os.path.join(temp_dir, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as out:
+            while True:
+                chunk = await upload.read(PHOTO_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > PHOTO_MAX_BYTES:
+                    raise PhotoError(_too_large_message())
+                digest.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise PhotoError("No photo uploaded")
+        await asyncio.to_thread(_check_image, temp_path)
+        photo_hash = digest.hexdigest()
+        target = original_path(photo_hash)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(temp_path, target)
+        return photo_hash
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def make_thumbnails(photo_hash: str) -> list:
+    """Write every missing thumbnail for a photo (center-cropped squares); returns the files written"""
+    from PIL import Image, ImageOps
+    written = []
+    with Image.open(original_path(photo_hash)) as image:
+        # Respect camera rotation, then drop alpha for JPEG
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for size in PHOTO_THUMB_SIZES:
+            thumbnail = None
+            for extension, image_format in PHOTO_THUMB_FORMATS.items():
+                path = thumbnail_path(photo_hash, size, extension)
+                if os.path.exists(path):
+                    continue
+                if thumbnail is None:
+                    thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                partial = f"{path}.{uuid.uuid4().hex}.part"
+                thumbnail.save(partial, image_format, quality=PHOTO_THUMB_QUALITY, optimize=True)
+                os.replace(partial, path)
+                written.append(os.path.basename(path))
+    return written
+
+async def queue_thumbnails(photo_hash: str, user_id: Optional[int] = None) -> str:
+    """Queue the thumbnail job; one job per photo, queued again if an earlier attempt failed"""
+    return await submit_job(
+        "photo_thumbnails", {"photo_hash": photo_hash}, user_id, job_id=f"photo-{photo_hash[:26]}", retry_failed=True
+    )
+
+@job_type("photo_thumbnails", roles=("admin", "hr"))
+async def run_photo_thumbnails(ctx: JobContext) -> dict:
+    """Generate thumbnails off the request path"""
+    photo_hash = ctx.params["photo_hash"]
+    if not is_photo_hash(photo_hash) or not os.path.exists(original_path(photo_hash)):
+        raise ValueError(f"Unknown photo {photo_hash}")
+    written = await asyncio.to_thread(make_thumbnails, photo_hash)
+    return {"photo_hash": photo_hash, "written": written}
+
+_UPLOAD_PATH = re.compile(r"^/employees/\d+/photo$")
+
+async def _send_too_large(send):
+    body = json.dumps({"detail": _too_large_message()}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class PhotoUploadLimitMiddleware:
+    """ASGI middleware that stops oversized photo uploads while they arrive.
+
+    Starlette spools the whole multipart body before the route runs, so the
+    size check in save_upload alone would not limit what the server takes
+    in. A Content-Length over the limit is refused before reading anything;
+    otherwise the body is counted as it streams and the request fails with
+    413 as soon as it passes the limit.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not _UPLOAD_PATH.match(scope["path"]):
+            return await self.app(scope, receive, send)
+        limit = PHOTO_MAX_BYTES + PHOTO_FORM_OVERHEAD
+        declared = dict(scope.get("headers", [])).get(b"content-length", b"")
+        if declared.isdigit() and int(declared) > limit:
+            return await _send_too_large(send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI passes HTTPExceptions raised while parsing the form through
+                    raise HTTPException(status_code=413, detail=_too_large_message())
+            return message
+
+        await self.app(scope, limited_receive, send)
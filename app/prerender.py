@@ -0,0 +1,86 @@
+import gzip
+import hashlib
+import time
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.templating import Jinja2Templates
+from app.conditional import Validators, templates_mtime, is_not_modified, not_modified_response
+
+templates = Jinja2Templates(directory="app/templates")
+
+# Seconds between checks of template modification times
+PRERENDER_CHECK_INTERVAL = 2.0
+
+# Pages whose output only varies by flash message: name -> (template, context, status code)
+PRERENDERED_PAGES = {
+    "index": ("index.html", {"current_user": None}, 200),
+    "login": ("login.html", {}, 200),
+    "register": ("register.html", {}, 200),
+    "not_found": ("error.html", {"error_code": 404, "error_message": "Page Not Found"}, 404),
+    "auth_error": ("error.html", {}, 404),
+}
+
+class RenderedPage:
+    """One page rendered ahead of time: raw and gzipped bytes plus a weak ETag"""
+
+    def __init__(self, body: bytes, status_code: int):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=9)
+        self.status_code = status_code
+        self.etag = f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+class PrerenderCache:
+    """Renders the PRERENDERED_PAGES once and again whenever a template changes"""
+
+    def __init__(self):
+        self._pages = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self.stats = {"hits": 0, "live_renders": 0, "builds": 0}
+
+    def build(self):
+        """Render every page now"""
+        self._mtime = templates_mtime()
+        self._checked_at = time.monotonic()
+        self._pages = {
+            name: RenderedPage(templates.get_template(template).render(**context).encode("utf-8"), status_code)
+            for name, (template, context, status_code) in PRERENDERED_PAGES.items()
+        }
+        self.stats["builds"] += 1
+
+    def _refresh_if_changed(self):
+        now = time.monotonic()
+        if self._pages and now - self._checked_at < PRERENDER_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        if not self._pages or templates_mtime() != self._mtime:
+            self.build()
+
+    def response(self, request: Request, name: str) -> Response:
+        """Serve a pre-rendered page, answering revalidation with 304"""
+        self._refresh_if_changed()
+        page = self._pages[name]
+        self.stats["hits"] += 1
+
+        validators = Validators(page.etag, None)
+        headers = validators.headers
+        headers["Vary"] = "Cookie, Accept-Encoding"
+        if page.status_code == 200 and is_not_modified(request, validators):
+            response = not_modified_response(validators)
+            response.headers["Vary"] = headers["Vary"]
+            return response
+
+        body = page.body
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            body = page.gzipped
+            headers["Content-Encoding"] = "gzip"
+        return Response(body, status_code=page.status_code, media_type="text/html", headers=headers)
+
+    def has_flash(self, request: Request) -> bool:
+        """Requests carrying a flash message must be rendered live"""
+        if "message" in request.query_params or "error" in request.query_params:
+            self.stats["live_renders"] += 1
+            return True
+        return False
+
+pages = PrerenderCache()
@@ -0,0 +1,101 @@
+from typing import List, Optional
+import app.db as db
+
+# Columns each list view actually renders. Keeping these explicit means list
+# pages never pull password hashes or audit timestamps they do not show.
+EMPLOYEE_LIST_COLUMNS = (
+    "employee_id", "emp_code", "prefix", "first_name", "last_name", "email", "phone",
+    "thai_id_or_passport", "employment", "status", "salary", "address",
+    "start_date", "leave_date", "employment_status", "photo_hash",
+)
+USER_LIST_COLUMNS = ("user_id", "username", "email", "role", "created_at", "updated_at")
+
+class Row:
+    """Base for compact, read-only list rows built from a projection"""
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(*(record[name] for name in cls.__slots__))
+
+    def __getitem__(self, name):
+        # Lets templates and older code keep using row["field"]
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def get(self, name, default=None):
+        return getattr(self, name, default)
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class EmployeeRow(Row):
+    """Employee list row; display fields are derived on access"""
+    __slots__ = EMPLOYEE_LIST_COLUMNS
+
+    @property
+    def initials(self) -> str:
+        first_initial = self.first_name[0].upper() if self.first_name else ""
+        last_initial = self.last_name[0].upper() if self.last_name else ""
+        return f"{first_initial}{last_initial}"
+
+    @property
+    def full_name(self) -> str:
+        prefix = f"{self.prefix} " if self.prefix else ""
+        return f"{prefix}{self.first_name} {self.last_name}"
+
+    @property
+    def employment_normalized(self) -> str:
+        # Normalized for CSS classes
+        return self.employment.lower().replace("-", "_") if self.employment else ""
+
+    @property
+    def status_normalized(self) -> str:
+        # Normalized for CSS classes
+        return self.status.lower().replace(" ", "_") if self.status else ""
+
+class UserRow(Row):
+    """User list row (never includes the password hash)"""
+    __slots__ = USER_LIST_COLUMNS
+
+def _select(table: str, columns) -> str:
+    return f"SELECT {', '.join(columns)} FROM {table}"
+
+async def fetch_employee_list(where: str = "", values: Optional[dict] = None) -> List[EmployeeRow]:
+    """Employees for list views, newest first"""
+    query = _select("Employee", EMPLOYEE_LIST_COLUMNS)
+    if where:
+        query += f" WHERE {where}"
+    query += " ORDER BY created_at DESC"
+    records = await db.database.fetch_all(query, values or {})
+    return [EmployeeRow.from_record(record) for record in records]
+
+async def fetch_employee_row(employee_id: int) -> Optional[EmployeeRow]:
+    """One employee as a list row"""
+    record = await db.database.fetch_one(
+        _select("Employee", EMPLOYEE_LIST_COLUMNS) + " WHERE employee_id = :employee_id",
+        {"employee_id": employee_id}
+    )
+    return EmployeeRow.from_record(record) if record else None
+
+async def fetch_user_list() -> List[UserRow]:
+    """Users for list views, newest first"""
+    records = await db.database.fetch_all(_select("User", USER_LIST_COLUMNS) + " ORDER BY created_at DESC")
+    return [UserRow.from_record(record) for record in records]
+
+async def fetch_user_row(user_id: int) -> Optional[UserRow]:
+    """One user as a list row"""
+    record = await db.database.fetch_one(
+        _select("User", USER_LIST_COLUMNS) + " WHERE user_id = :user_id",
+        {"user_id": user_id}
+    )
+    return UserRow.from_record(record) if record else None
@@ -0,0 +1,185 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+import app.db as db
+from app.events import hub
+from app.queries import EmployeeRow, fetch_employee_list
+
+def _key(value) -> str:
+    return (value or "").lower()
+
+class EmployeeSnapshot:
+    """Immutable view of every employee, indexed for list, filter and count views.
+
+    A snapshot is never modified after it is built. Writes produce a new
+    snapshot (copy-on-write) and swap the module-level reference, so a reader
+    that grabbed a snapshot keeps a consistent view for its whole request.
+    """
+
+    def __init__(self, rows: Iterable[EmployeeRow], version: int):
+        self.version = version
+        self.built_at = time.time()
+        # Newest first, matching ORDER BY created_at DESC
+        self.rows = tuple(rows)
+        self.by_id: Dict[int, EmployeeRow] = {row.employee_id: row for row in self.rows}
+        self.by_code: Dict[str, EmployeeRow] = {row.emp_code: row for row in self.rows}
+        by_status = defaultdict(list)
+        by_employment = defaultdict(list)
+        for row in self.rows:
+            by_status[_key(row.status)].append(row)
+            by_employment[_key(row.employment)].append(row)
+        self.by_status = {key: tuple(rows) for key, rows in by_status.items()}
+        self.by_employment = {key: tuple(rows) for key, rows in by_employment.items()}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def filter(self, status: Optional[str] = None, employment: Optional[str] = None) -> tuple:
+        """Rows matching the given status and/or employment, in list order"""
+        if status is not None and employment is not None:
+            rows = self.by_status.get(_key(status), ())
+            return tuple(row for row in rows if _key(row.employment) == _key(employment))
+        if status is not None:
+            return self.by_status.get(_key(status), ())
+        if employment is not None:
+            return self.by_employment.get(_key(employment), ())
+        return self.rows
+
+    def counts(self) -> dict:
+        return {
+            "total": len(self.rows),
+            "by_status": {key: len(rows) for key, rows in self.by_status.items()},
+            "by_employment": {key: len(rows) for key, rows in self.by_employment.items()},
+        }
+
+    def replace(self, changed: List[EmployeeRow], removed: Iterable[int], version: int) -> "EmployeeSnapshot":
+        """New snapshot with changed rows upserted and removed ids dropped"""
+        removed = set(removed)
+        changed_by_id = {row.employee_id: row for row in changed}
+        # New employees go to the top, like the newest-first query
+        created = [row for row in changed if row.employee_id not in self.by_id]
+        created.sort(key=lambda row: row.employee_id, reverse=True)
+        kept = [
+            changed_by_id.get(row.employee_id, row)
+            for row in self.rows
+            if row.employee_id not in removed
+        ]
+        return EmployeeSnapshot(created + kept, version)
+
+    def with_version(self, version: int) -> "EmployeeSnapshot":
+        """Same rows, tagged with a newer data version (non-employee writes)"""
+        snapshot = object.__new__(EmployeeSnapshot)
+        snapshot.__dict__.update(self.__dict__)
+        snapshot.version = version
+        return snapshot
+
+# Current snapshot; replaced, never mutated
+_snapshot: Optional[EmployeeSnapshot] = None
+_lock = None
+read_model_stats = {"reloads": 0, "incremental_updates": 0}
+
+def _get_lock() -> asyncio.Lock:
+    global _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    return _lock
+
+def reset():
+    """Drop loop-bound state (called on startup)"""
+    global _lock, _snapshot
+    _lock = None
+    _snapshot = None
+
+async def _fetch_rows(ids: List[int]) -> List[EmployeeRow]:
+    rows = []
+    for chunk in db.chunked(ids):
+        placeholders, values = db.in_clause(chunk)
+        rows.extend(await fetch_employee_list(f"employee_id IN ({placeholders})", values))
+    return rows
+
+async def load() -> EmployeeSnapshot:
+    """Rebuild the snapshot from the Employee table"""
+    global _snapshot
+    async with _get_lock():
+        version, _ = await db.get_data_version()
+        rows = await fetch_employee_list()
+        _snapshot = EmployeeSnapshot(rows, version)
+        read_model_stats["reloads"] += 1
+        return _snapshot
+
+async def get_employee_snapshot() -> EmployeeSnapshot:
+    """Current snapshot, reloaded first if another worker changed the data"""
+    # One primary-key read on SharedState instead of a full Employee scan
+    version, _ = await db.get_data_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        snapshot = await load()
+    return snapshot
+
+async def apply_change(event: dict):
+    """Copy-on-write update of the snapshot after a local write"""
+    global _snapshot
+    if _snapshot is None:
+        return
+    version = hub.known_version
+    async with _get_lock():
+        if _snapshot is None:
+            return
+        # Every write bumps the version by one. Any other gap means writes this
+        # snapshot has not seen (another worker, interleaved requests), so
+        # mark it stale and let the next read reload it.
+        if event["entity"] == "all" or version is None or _snapshot.version is None or version != _snapshot.version + 1:
+            _snapshot = _snapshot.with_version(None)
+            return
+        if event["entity"] == "employee" and event["ids"]:
+            ids = list(event["ids"])
+            if event["action"] in ("deleted", "archived"):
+                changed, removed = [], ids
+            else:
+                changed = await _fetch_rows(ids)
+                found = {row.employee_id for row in changed}
+                removed = [employee_id for employee_id in ids if employee_id not in found]
+            _snapshot = _snapshot.replace(changed, removed, version)
+            read_model_stats["incremental_updates"] += 1
+        else:
+            _snapshot = _snapshot.with_version(version)
+
+async def check_consistency() -> dict:
+    """Compare the current snapshot with the Employee table"""
+    snapshot = _snapshot
+    version, _ = await db.get_data_version()
+    rows = {row.employee_id: row.as_dict() for row in await fetch_employee_list()}
+    if snapshot is None:
+        return {"consistent": False, "loaded": False, "database_version": version}
+
+    cached = {employee_id: row.as_dict() for employee_id, row in snapshot.by_id.items()}
+    missing = sorted(set(rows) - set(cached))
+    extra = sorted(set(cached) - set(rows))
+    mismatched = sorted(
+        employee_id for employee_id in set(rows) & set(cached)
+        if rows[employee_id] != cached[employee_id]
+    )
+    return {
+        "consistent": not (missing or extra or mismatched),
+        "loaded": True,
+        "snapshot_version": snapshot.version,
+        "database_version": version,
+        "snapshot_employees": len(cached),
+        "database_employees": len(rows),
+        "missing": missing,
+        "extra": extra,
+        "mismatched": mismatched,
+    }
+
+def get_read_model_stats() -> dict:
+    snapshot = _snapshot
+    return {
+        **read_model_stats,
+        "loaded": snapshot is not None,
+        "version": snapshot.version if snapshot else None,
+        "employees": len(snapshot) if snapshot else 0,
+        "age_seconds": round(time.time() - snapshot.built_at, 1) if snapshot else None,
+    }
+
+hub.add_listener(apply_change)
@@ -1,16 +1,30 @@
 from fastapi import APIRouter
+from app.routes.health import router as health_router
 from app.routes.auth import router as auth_router
 from app.routes.profile import router as profile_router
 from app.routes.employees import router as employees_router
 from app.routes.users import router as users_router  # Make sure this is included
+from app.routes.admin import router as admin_router
+from app.routes.events import router as events_router
+from app.routes.reports import router as reports_router
+from app.routes.jobs import router as jobs_router
+from app.routes.photos import router as photos_router
+from app.routes.archive import router as archive_router
 from app.routes.error_handlers import router as error_router
 
 # Create main router that includes all sub-routers
 router = APIRouter()
 
 # Include all route modules
+router.include_router(health_router)
 router.include_router(auth_router)
 router.include_router(profile_router)
 router.include_router(employees_router)
 router.include_router(users_router)  # Make sure this is included
+router.include_router(admin_router)
+router.include_router(events_router)
+router.include_router(reports_router)
+router.include_router(jobs_router)
+router.include_router(photos_router)
+router.include_router(archive_router)
 router.include_router(error_router)
\ No newline at end of file
@@ -0,0 +1,112 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+import os
+from app.auth import get_current_user, get_token_cache_stats
+from app.events import hub
+from app.payroll import payroll_cache_stats
+from app.read_model import check_consistency, get_read_model_stats
+from app.jobs import runner, submit_job, get_job, job_to_dict
+from app.maintenance import MAINTENANCE_TASKS, MAINTENANCE_SCHEDULED_TASKS, get_maintenance_stats
+from app.schemas import MaintenanceRequest
+from app.admission import get_admission_stats
+from app.analytics import ANALYTICS_DATASETS, get_analytics_status, get_state as get_analytics_state, dataset_dir
+from app.loop_monitor import monitor as loop_monitor
+from app.transitions import apply_due_transitions, next_due_transition, get_transition_stats
+from app.archive import get_archive_stats
+from app.typeahead import get_typeahead_stats
+
+router = APIRouter()
+
+def require_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    """Allow only admin users through"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
+@router.get("/api/admin/stats")
+async def admin_stats(current_user: dict = Depends(require_admin)):
+    """Runtime statistics for this worker process"""
+    return {
+        "token_cache": get_token_cache_stats(),
+        "change_events": hub.stats(),
+        "payroll_cache": payroll_cache_stats,
+        "read_model": get_read_model_stats(),
+        "jobs": runner.stats(),
+        "admission": get_admission_stats(),
+        "transitions": get_transition_stats(),
+        "event_loop": loop_monitor.summary(),
+        "typeahead": get_typeahead_stats(),
+    }
+
+@router.get("/api/admin/event-loop")
+async def event_loop_report(current_user: dict = Depends(require_admin)):
+    """Event-loop lag for this worker and stack traces of recent stalls"""
+    return loop_monitor.report()
+
+@router.get("/api/admin/read-model/check")
+async def read_model_check(current_user: dict = Depends(require_admin)):
+    """Compare this worker's in-memory employee snapshot with the database"""
+    return await check_consistency()
+
+
+@router.get("/api/admin/maintenance")
+async def maintenance_status(current_user: dict = Depends(require_admin)):
+    """Last backup/optimize/vacuum/integrity runs with timings, and file statistics"""
+    return await get_maintenance_stats()
+
+@router.post("/api/admin/maintenance", status_code=status.HTTP_202_ACCEPTED)
+async def run_maintenance_now(payload: MaintenanceRequest, current_user: dict = Depends(require_admin)):
+    """Queue a maintenance job (defaults to the scheduled tasks)"""
+    tasks = payload.tasks or MAINTENANCE_SCHEDULED_TASKS
+    unknown = [task for task in tasks if task not in MAINTENANCE_TASKS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown tasks: {', '.join(unknown)}")
+    job_id = await submit_job("maintenance", {"tasks": tasks}, current_user["user_id"])
+    return job_to_dict(await get_job(job_id))
+
+@router.get("/api/admin/transitions")
+async def transitions_status(current_user: dict = Depends(require_admin)):
+    """Next due leave_date status transition and this worker's scheduler counters"""
+    next_due = await next_due_transition()
+    return {**get_transition_stats(), "next_due": next_due.isoformat() if next_due else None}
+
+@router.post("/api/admin/transitions/run")
+async def run_transitions_now(current_user: dict = Depends(require_admin)):
+    """Apply due status transitions now instead of waiting for the scheduler"""
+    ids = await apply_due_transitions()
+    return {"transitioned": len(ids), "employee_ids": ids}
+
+@router.get("/api/admin/archive")
+async def archive_status(current_user: dict = Depends(require_admin)):
+    """Hot and archived employee counts and how many are due for archiving"""
+    return await get_archive_stats()
+
+@router.post("/api/admin/archive", status_code=status.HTTP_202_ACCEPTED)
+async def run_archive_now(current_user: dict = Depends(require_admin)):
+    """Queue an archive run now instead of waiting for the scheduler"""
+    job_id = await submit_job("employee_archive", {}, current_user["user_id"])
+    return job_to_dict(await get_job(job_id))
+
+@router.get("/api/admin/analytics")
+async def analytics_status(current_user: dict = Depends(require_admin)):
+    """Watermarks and file lists of the incremental analytics exports"""
+    return await get_analytics_status()
+
+@router.post("/api/admin/analytics", status_code=status.HTTP_202_ACCEPTED)
+async def run_analytics_now(compact: bool = False, current_user: dict = Depends(require_admin)):
+    """Queue an analytics export now (optionally compacting every dataset)"""
+    job_id = await submit_job("analytics_export", {"compact": compact}, current_user["user_id"])
+    return job_to_dict(await get_job(job_id))
+
+@router.get("/api/admin/analytics/{dataset}/{filename}")
+async def analytics_file(dataset: str, filename: str, current_user: dict = Depends(require_admin)):
+    """Download a manifest or a Parquet file listed in it"""
+    if dataset not in ANALYTICS_DATASETS:
+        raise HTTPException(status_code=404, detail="Unknown dataset")
+    state = await get_analytics_state(dataset)
+    if filename != "manifest.json" and filename not in state["files"]:
+        raise HTTPException(status_code=404, detail="File not found")
+    path = os.path.join(dataset_dir(dataset), filename)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(path, filename=filename)
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import date
+from typing import Optional
+from app.archive import ARCHIVE_SEARCH_LIMIT, restore_employee, search_archive
+from app.auth import get_current_user
+
+router = APIRouter()
+
+@router.get("/api/employees/archive")
+async def archived_employees(
+    q: Optional[str] = None,
+    limit: int = ARCHIVE_SEARCH_LIMIT,
+    current_user: dict = Depends(get_current_user)
+):
+    """Search archived (long-departed) employees by code, name or email"""
+    if current_user["role"] not in ["admin", "hr"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin or HR access required")
+    
+    employees = await search_archive(q, limit=max(1, min(limit, 500)))
+    return {"count": len(employees), "employees": employees}
+
+@router.post("/api/employees/archive/{employee_id}/restore")
+async def restore_archived_employee(
+    employee_id: int,
+    start_date: Optional[date] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Re-hire an archived employee as a new employment period (from today by default)"""
+    if current_user["role"] not in ["admin", "hr"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin or HR access required")
+    
+    try:
+        restored = await restore_employee(employee_id, current_user["user_id"], start_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not restored:
+        raise HTTPException(status_code=404, detail="Archived employee not found")
+    return {"employee_id": employee_id, "restored": True, "start_date": (start_date or date.today()).isoformat()}
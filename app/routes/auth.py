@@ -2,13 +2,23 @@ from fastapi import APIRouter, Depends, HTTPException, Request, Form, status
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
+import asyncio
 from databases import Database
 from typing import Optional
 import re
 import app.db as db
+from app.audit import log_event
+from app.conditional import get_validators, is_not_modified, not_modified_response
+from app.events import notify_change
+from app.loader import get_loader
+from app.prerender import pages
+from app.queries import fetch_user_list
+from app.read_model import get_employee_snapshot
+from app.streaming import AsyncRows, stream_template
 from app.schemas import User, TokenData, Token, UserCreate
 from app.auth import (
     get_current_user_optional, 
@@ -16,7 +26,7 @@ from app.auth import (
     create_token_response, 
     get_password_hash,
     check_rate_limit,
-    login_attempts,
+    record_login_attempt,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     is_valid_email,
     is_strong_password
@@ -31,6 +41,9 @@ templates = Jinja2Templates(directory="app/templates")
 @router.get("/", response_class=HTMLResponse)
 async def index(request: Request, current_user: Optional[dict] = Depends(get_current_user_optional)):
     """Home page"""
+    # Anonymous visitors all get the same bytes
+    if not current_user and not pages.has_flash(request):
+        return pages.response(request, "index")
     return templates.TemplateResponse("index.html", {
         "request": request,
         "current_user": current_user
@@ -45,6 +58,8 @@ async def login_page(
     """Display login page"""
     if current_user:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
+    if not pages.has_flash(request):
+        return pages.response(request, "login")
     return templates.TemplateResponse("login.html", {
         "request": request,
         "message": message  # Pass the message to the template
@@ -54,7 +69,7 @@ async def login_page(
 async def login(request: Request, username: str = Form(...), password: str = Form(...)):
     """Handle login form submission"""
     # Check rate limit
-    can_login, wait_time = check_rate_limit(username.strip())
+    can_login, wait_time = await check_rate_limit(username.strip())
     if not can_login:
         return templates.TemplateResponse("login.html", {
             "request": request,
@@ -65,7 +80,7 @@ async def login(request: Request, username: str = Form(...), password: str = For
     user = await authenticate_user(db.database, username.strip(), password)
     if not user:
         # Record failed login attempt
-        login_attempts.setdefault(username.strip(), []).append(datetime.utcnow())
+        await record_login_attempt(username.strip())
         
         return templates.TemplateResponse("login.html", {
             "request": request,
@@ -101,6 +116,8 @@ async def register_page(request: Request, current_user: Optional[dict] = Depends
     """Display registration page"""
     if current_user:
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
+    if not pages.has_flash(request):
+        return pages.response(request, "register")
     return templates.TemplateResponse("register.html", {"request": request})
 
 @router.post("/register", response_class=HTMLResponse)
@@ -168,7 +185,7 @@ async def register(
         })
     
     # Create user
-    hashed_password = get_password_hash(password)
+    hashed_password = await run_in_threadpool(get_password_hash, password)
     user_data = UserCreate(
         username=username.strip(),
         email=email.strip(),
@@ -186,23 +203,20 @@ async def register(
     values = user_data.dict()
     values.update({"created_at": now, "updated_at": now})
     
-    await db.database.execute(query=query, values=values)
+    async with db.database.transaction():
+        await db.database.execute(query=query, values=values)
+        version = await db.bump_data_version()
     
     # Get the user_id of the newly created user
     new_user = await db.database.fetch_one(
         query="SELECT user_id FROM User WHERE username = :username",
         values={"username": username.strip()}
     )
+    await notify_change("user", "created", [new_user["user_id"]], version)
     
-# Replace it with this updated version:
-    await db.database.execute(
-        query="INSERT INTO Log (user_id, action, details, timestamp) VALUES (:user_id, :action, :details, :timestamp)",
-        values={
-            "user_id": new_user["user_id"],
-            "action": "USER_REGISTERED",
-            "details": f"New user {username} registered successfully",
-            "timestamp": datetime.utcnow()  # Add the current timestamp
-        }
+    await log_event(
+        "USER_REGISTERED", new_user["user_id"],
+        entity_id=new_user["user_id"], username=username.strip()
     )
     
     return templates.TemplateResponse("login.html", {
@@ -216,57 +230,37 @@ async def home_page(
     request: Request,
     current_user: Optional[dict] = Depends(get_current_user_optional)
 ):
-    # Get employees
-    employees = await db.database.fetch_all("SELECT * FROM Employee ORDER BY created_at DESC")
-    
-    # Process employees for display
-    processed_employees = []
-    for emp in employees:
-        employee_dict = dict(emp)
-        
-        # Calculate initials for avatar
-        first_initial = emp["first_name"][0].upper() if emp["first_name"] else ""
-        last_initial = emp["last_name"][0].upper() if emp["last_name"] else ""
-        employee_dict["initials"] = f"{first_initial}{last_initial}"
-        
-        # Full name with prefix
-        prefix = f"{emp['prefix']} " if emp["prefix"] else ""
-        employee_dict["full_name"] = f"{prefix}{emp['first_name']} {emp['last_name']}"
-        
-        # Normalize employment type for CSS classes
-        if emp["employment"]:
-            employee_dict["employment_normalized"] = emp["employment"].lower().replace("-", "_")
-        else:
-            employee_dict["employment_normalized"] = ""
-            
-        # Normalize status for CSS classes
-        if emp["status"]:
-            employee_dict["status_normalized"] = emp["status"].lower().replace(" ", "_")
-        else:
-            employee_dict["status_normalized"] = ""
-        
-        processed_employees.append(employee_dict)
+    # Answer revalidation requests before touching the tables or templates
+    validators = await get_validators(request, current_user)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
     
-    # Get users if current user is admin
-    users = []
-    if current_user and current_user.get("role") == "admin":
-        users = await db.database.fetch_all("SELECT * FROM User ORDER BY created_at DESC")
-    
-    # Generate auto employee code (optional)
     from app.routes.employees import generate_employee_code
-    auto_gen_employee_code = await generate_employee_code()
+    loader = get_loader(request)
+    is_admin = bool(current_user and current_user.get("role") == "admin")
+    
+    # Independent reads run concurrently: the employee snapshot (display fields
+    # are derived lazily by EmployeeRow), users for admins, and the next employee code
+    snapshot, users, auto_gen_employee_code = await asyncio.gather(
+        get_employee_snapshot(),
+        loader.memo("user_list", fetch_user_list) if is_admin else asyncio.sleep(0, result=[]),
+        loader.memo("next_employee_code", generate_employee_code),
+    )
+    employees = snapshot.rows
     
     # Current date
     current_date = datetime.now().strftime("%B %d, %Y")
     
-    return templates.TemplateResponse(
+    # Streamed so the page shell reaches the browser before the employee rows are rendered
+    response = stream_template(
+        request,
         "home.html",
         {
-            "request": request,
             "current_user": current_user,
-            "employees": processed_employees,
+            "employees": AsyncRows(employees),
             "users": users,
             "auto_gen_employee_code": auto_gen_employee_code,
             "current_date": current_date
         }
-    )
\ No newline at end of file
+    )
+    return validators.apply(response)
\ No newline at end of file
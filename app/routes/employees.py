@@ -1,20 +1,39 @@
 from fastapi import APIRouter, Depends, Request, Form, HTTPException, status  # Properly import status here
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from typing import Optional, List, Dict, Any
 import app.db as db
+from app.analytics import record_deletions
+from app.archive import find_archived, restore_employee
+from app.audit import AUDIT_HISTORY_LIMIT, changed_fields, fetch_history, log_event
 from app.auth import get_current_user
-from app.schemas import Employee, EmployeeCreate, EmployeeUpdate
+from app.dedupe import fetch_duplicates, rebuild_index
+from app.conditional import get_validators, is_not_modified, not_modified_response
+from app.events import notify_change
+from app.loader import get_loader
+from app.fragments import wants_fragment, flash_redirect, render_fragment, empty_fragment
+from app.queries import fetch_employee_row, fetch_user_list
+from app.read_model import get_employee_snapshot
+from app.streaming import AsyncRows, stream_template
+from app.transitions import RESET_EMPLOYMENT_STATUS
+from app.typeahead import TYPEAHEAD_DEFAULT_LIMIT, lookup
+from app.schemas import Employee, EmployeeCreate, EmployeeUpdate, EmployeeBulkUpdate, EmployeeBulkDelete, BulkResult
 from datetime import datetime, date
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Get configuration from .env
 EMPLOYEE_CODE_PREFIX = os.getenv("EMPLOYEE_CODE_PREFIX", "EMP")
 EMPLOYEE_CODE_DIGITS = int(os.getenv("EMPLOYEE_CODE_DIGITS", "6"))
+# Maximum number of employees a single bulk request may touch
+BULK_MAX_IDS = int(os.getenv("BULK_MAX_IDS", "5000"))
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -27,8 +46,12 @@ async def generate_employee_code():
         prefix_length = len(EMPLOYEE_CODE_PREFIX)
         
         # Get all existing employee codes with the correct format, sorted by number
+        # Archived employees keep their codes, so they are never handed out again
         existing_codes_query = """
-        SELECT emp_code FROM Employee 
+        SELECT emp_code FROM (
+            SELECT emp_code FROM Employee
+            UNION ALL SELECT emp_code FROM EmployeeArchive
+        )
         WHERE emp_code LIKE :prefix_pattern 
         AND LENGTH(emp_code) = :expected_length
         ORDER BY CAST(SUBSTR(emp_code, :prefix_length + 1) AS INTEGER) ASC
@@ -70,26 +93,41 @@ async def generate_employee_code():
         return f"{EMPLOYEE_CODE_PREFIX}{timestamp:0{EMPLOYEE_CODE_DIGITS}d}"
         
     except Exception as e:
-        print(f"Error generating employee code: {e}")
+        logger.exception("Error generating employee code: %s", e)
         # Emergency fallback
         import time
         timestamp = int(time.time()) % (10 ** EMPLOYEE_CODE_DIGITS)
         return f"{EMPLOYEE_CODE_PREFIX}{timestamp:0{EMPLOYEE_CODE_DIGITS}d}"
 
 
-_employee_code_cache = {"code": None, "expires": 0}
+async def render_employee_fragment(
+    request: Request,
+    employee_id: int,
+    current_user: dict,
+    message: Optional[str] = None,
+    events: Optional[dict] = None
+):
+    """Render one employee's row and modals as a partial response"""
+    employee = await fetch_employee_row(employee_id)
+    if not employee:
+        return empty_fragment(message)
+    return render_fragment(request, "partials/employee_fragment.html", {
+        "current_user": current_user,
+        "employee": employee
+    }, message=message, events=events)
+
+EMPLOYEE_CODE_CACHE_KEY = "employee_code_cache"
 
 async def get_cached_employee_code():
     """Get a cached employee code or generate a new one"""
-    import time
-    
-    current_time = time.time()
-    if _employee_code_cache["code"] is None or current_time > _employee_code_cache["expires"]:
+    # Cached in the shared state table so all workers hand out the same code
+    code = await db.get_shared_value(EMPLOYEE_CODE_CACHE_KEY)
+    if code is None:
         # Cache expired or doesn't exist, generate new code
-        _employee_code_cache["code"] = await generate_employee_code()
-        _employee_code_cache["expires"] = current_time + 300  # Cache for 5 minutes
+        code = await generate_employee_code()
+        await db.set_shared_value(EMPLOYEE_CODE_CACHE_KEY, code, ttl_seconds=300)  # Cache for 5 minutes
     
-    return _employee_code_cache["code"]
+    return code
 # Employee routes (employee.html)
 @router.get("/employees", response_class=HTMLResponse)
 async def employees_page(
@@ -99,29 +137,80 @@ async def employees_page(
     current_user: dict = Depends(get_current_user)
 ):
     """Display employees page"""
-    # Get employees
-    query = "SELECT * FROM Employee ORDER BY created_at DESC"
-    employees = await db.database.fetch_all(query=query)
-    
-    # Get users if current user is admin
-    users = []
-    if current_user["role"] == "admin":
-        users_query = "SELECT * FROM User ORDER BY created_at DESC"
-        users = await db.database.fetch_all(query=users_query)
+    # Answer revalidation requests before touching the tables or templates
+    validators = await get_validators(request, current_user)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
     
-    # Generate auto employee code
-    auto_gen_employee_code = await generate_employee_code()
+    # Independent reads run concurrently: the in-memory employee snapshot,
+    # users for admins, and the next employee code
+    loader = get_loader(request)
+    snapshot, users, auto_gen_employee_code = await asyncio.gather(
+        get_employee_snapshot(),
+        loader.memo("user_list", fetch_user_list) if current_user["role"] == "admin" else asyncio.sleep(0, result=[]),
+        loader.memo("next_employee_code", generate_employee_code),
+    )
+    employees = snapshot.rows
     
-    # Change "employee.html" to "home.html" here
-    return templates.TemplateResponse("home.html", {
-        "request": request,
+    # Change "employee.html" to "home.html" here (streamed, see app/streaming.py)
+    response = stream_template(request, "home.html", {
         "current_user": current_user,
-        "employees": employees,
+        "employees": AsyncRows(employees),
         "users": users,
         "auto_gen_employee_code": auto_gen_employee_code,
         "message": message,
         "error": error
     })
+    return validators.apply(response)
+
+@router.get("/api/employees")
+async def employees_json(
+    request: Request,
+    status: Optional[str] = None,
+    employment: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """List employees as JSON, optionally filtered by status and employment"""
+    validators = await get_validators(request, current_user)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+    
+    snapshot = await get_employee_snapshot()
+    employees = snapshot.filter(status=status, employment=employment)
+    response = JSONResponse([emp.as_dict() for emp in employees])
+    return validators.apply(response)
+
+@router.get("/api/employees/lookup")
+async def employees_lookup(
+    q: str = "",
+    limit: int = TYPEAHEAD_DEFAULT_LIMIT,
+    current_user: dict = Depends(get_current_user)
+):
+    """Typeahead: best employees whose code, name or email starts with q"""
+    matches = await lookup(q, limit)
+    return {"q": q, "count": len(matches), "employees": matches}
+
+@router.get("/api/employees/count")
+async def employees_count(request: Request, current_user: dict = Depends(get_current_user)):
+    """Employee counts in total and by status and employment"""
+    validators = await get_validators(request, current_user)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+    
+    snapshot = await get_employee_snapshot()
+    response = JSONResponse(snapshot.counts())
+    return validators.apply(response)
+
+@router.get("/employees/{employee_id}/row", response_class=HTMLResponse)
+async def employee_row(request: Request, employee_id: int, current_user: dict = Depends(get_current_user)):
+    """Render a single employee row (used to patch the list in place)"""
+    employee = await db.database.fetch_one(
+        query="SELECT employee_id FROM Employee WHERE employee_id = :employee_id",
+        values={"employee_id": employee_id}
+    )
+    if not employee:
+        raise HTTPException(status_code=404, detail="Employee not found")
+    return await render_employee_fragment(request, employee_id, current_user)
 
 # Add the rest of your employee routes (create, update, delete) here
 @router.post("/employees")
@@ -154,18 +243,18 @@ async def create_employee(
         
         # Check if start_date is provided
         if not start_date or not start_date.strip():
-            return RedirectResponse(
-                url="/employees?error=Start+date+is+required",
-                status_code=303
+            return flash_redirect(
+                request, "/employees",
+                error="Start date is required"
             )
         
         # Convert start_date string to date object
         try:
             start_date_value = datetime.strptime(start_date, "%Y-%m-%d").date()
         except ValueError:
-            return RedirectResponse(
-                url="/employees?error=Invalid+start+date+format",
-                status_code=303
+            return flash_redirect(
+                request, "/employees",
+                error="Invalid start date format"
             )
         
         # Convert leave_date string to date object if not empty
@@ -173,30 +262,30 @@ async def create_employee(
             try:
                 leave_date_value = datetime.strptime(leave_date, "%Y-%m-%d").date()
             except ValueError:
-                return RedirectResponse(
-                    url="/employees?error=Invalid+leave+date+format",
-                    status_code=303
+                return flash_redirect(
+                    request, "/employees",
+                    error="Invalid leave date format"
                 )
         
         # Check date logic if both are provided
         if start_date_value and leave_date_value and start_date_value > leave_date_value:
-            return RedirectResponse(
-                url="/employees?error=Leave+date+cannot+be+earlier+than+start+date",
-                status_code=303  # Use numeric code
+            return flash_redirect(
+                request, "/employees",
+                error="Leave date cannot be earlier than start date"
             )
             
         # Validate required fields
         if not first_name.strip():
-            return RedirectResponse(
-                url="/employees?error=First+name+is+required",
-                status_code=status.HTTP_303_SEE_OTHER
+            return flash_redirect(
+                request, "/employees",
+                error="First name is required"
             )
             
         # Validate email format if provided
         if email and "@" not in email:
-            return RedirectResponse(
-                url="/employees?error=Invalid+email+format",
-                status_code=status.HTTP_303_SEE_OTHER
+            return flash_redirect(
+                request, "/employees",
+                error="Invalid email format"
             )
         
         # Check if employee code exists
@@ -207,9 +296,24 @@ async def create_employee(
         
         if existing_employee:
             # Return to employee page with error
-            return RedirectResponse(
-                url=f"/employees?error=Employee+code+'{emp_code}'+already+exists",
-                status_code=status.HTTP_303_SEE_OTHER
+            return flash_redirect(
+                request, "/employees",
+                error=f"Employee code '{emp_code}' already exists"
+            )
+        
+        # Re-hire of an archived employee: a new employment period under the
+        # same id starting on the form's start date, then the form as an update
+        archived = await find_archived(emp_code=emp_code.strip())
+        if archived:
+            rehire_date = start_date_value or date.today()
+            try:
+                await restore_employee(archived["employee_id"], current_user["user_id"], rehire_date)
+            except ValueError as e:
+                return flash_redirect(request, "/employees", error=str(e))
+            return await update_employee(
+                request, archived["employee_id"], emp_code, prefix, first_name, last_name, email, phone,
+                thai_id_or_passport, employment, status, salary, address, rehire_date.isoformat(), leave_date,
+                current_user=current_user
             )
         
         # Create employee record
@@ -237,6 +341,16 @@ async def create_employee(
             ":start_date", ":leave_date", ":created_at", ":updated_at"
         ]
         
+        # SQLite would hand out MAX(employee_id) + 1, which may belong to an
+        # archived employee; take the next id across both tables instead
+        insert_columns.insert(0, "employee_id")
+        insert_values.insert(0, """(
+            SELECT COALESCE(MAX(employee_id), 0) + 1 FROM (
+                SELECT MAX(employee_id) AS employee_id FROM Employee
+                UNION ALL SELECT MAX(employee_id) FROM EmployeeArchive
+            )
+        )""")
+        
         # Only include created_by and updated_by if they exist in the table
         if "created_by" in columns:
             insert_columns.append("created_by")
@@ -280,29 +394,53 @@ async def create_employee(
         if "updated_by" in columns:
             values["updated_by"] = current_user["user_id"]
         
-        await db.database.execute(query=query, values=values)
-        
-        # Log employee creation
-        await db.database.execute(
-            query="INSERT INTO Log (user_id, action, details) VALUES (:user_id, :action, :details)",
-            values={
-                "user_id": current_user["user_id"],
-                "action": "EMPLOYEE_CREATED",
-                "details": f"Employee {emp_code} ({first_name} {last_name}) created"
-            }
-        )
+        # The row and its audit entry commit together, so no other writer's
+        # entry about this employee can land between them
+        async with db.database.transaction():
+            new_employee_id = await db.database.execute(query=query, values=values)
+            
+            # Log employee creation
+            await log_event(
+                "EMPLOYEE_CREATED", current_user["user_id"],
+                entity_id=new_employee_id, emp_code=values["emp_code"],
+                name=f"{values['first_name']} {values['last_name']}"
+            )
+            version = await db.bump_data_version()
+        await notify_change("employee", "created", [new_employee_id], version)
+        
+        # Warn about likely duplicates (re-hires, double entry)
+        message = "Employee created successfully"
+        duplicates = await fetch_duplicates(new_employee_id, limit=3)
+        if duplicates:
+            others = [
+                pair["employee"] if pair["duplicate"]["employee_id"] == new_employee_id else pair["duplicate"]
+                for pair in duplicates
+            ]
+            codes = ", ".join(
+                f"{other['emp_code']} (archived)" if other["archived"] else other["emp_code"] for other in others
+            )
+            message += f". Possible duplicate of {codes}"
+        
+        # In fragment mode send back only the new row
+        if wants_fragment(request):
+            next_code = await generate_employee_code()
+            return await render_employee_fragment(
+                request, new_employee_id, current_user,
+                message=message,
+                events={"nextEmployeeCode": next_code}
+            )
         
         # Redirect back to employee page with success message
-        return RedirectResponse(
-            url="/employees?message=Employee+created+successfully", 
-            status_code=303
+        return flash_redirect(
+            request, "/employees",
+            message=message
         )
         
     except Exception as e:
-        print(f"Create employee error: {e}")
-        return RedirectResponse(
-            url=f"/employees?error=Failed+to+create+employee:+{str(e)}",
-            status_code=303  # Use numeric code
+        logger.exception("Create employee error: %s", e)
+        return flash_redirect(
+            request, "/employees",
+            error=f"Failed to create employee: {str(e)}"
         )
 
 @router.post("/employees/{employee_id}/update")
@@ -339,9 +477,9 @@ async def update_employee(
             try:
                 start_date_value = datetime.strptime(start_date, "%Y-%m-%d").date()
             except ValueError:
-                return RedirectResponse(
-                    url="/employees?error=Invalid+start+date+format",
-                    status_code=303  # Use numeric code
+                return flash_redirect(
+                    request, "/employees",
+                    error="Invalid start date format"
                 )
         
         # Convert leave_date string to date object if not empty
@@ -349,30 +487,30 @@ async def update_employee(
             try:
                 leave_date_value = datetime.strptime(leave_date, "%Y-%m-%d").date()
             except ValueError:
-                return RedirectResponse(
-                    url="/employees?error=Invalid+leave+date+format",
-                    status_code=303  # Use numeric code
+                return flash_redirect(
+                    request, "/employees",
+                    error="Invalid leave date format"
                 )
         
         # Check date logic if both are provided
         if start_date_value and leave_date_value and start_date_value > leave_date_value:
-            return RedirectResponse(
-                url="/employees?error=Leave+date+cannot+be+earlier+than+start+date",
-                status_code=303  # Use numeric code
+            return flash_redirect(
+                request, "/employees",
+                error="Leave date cannot be earlier than start date"
             )
             
         # Validate required fields
         if not first_name.strip():
-            return RedirectResponse(
-                url="/employees?error=First+name+is+required",
-                status_code=status.HTTP_303_SEE_OTHER
+            return flash_redirect(
+                request, "/employees",
+                error="First name is required"
             )
             
         # Validate email format if provided
         if email and "@" not in email:
-            return RedirectResponse(
-                url="/employees?error=Invalid+email+format",
-                status_code=status.HTTP_303_SEE_OTHER
+            return flash_redirect(
+                request, "/employees",
+                error="Invalid email format"
             )
             
         # Check if employee exists
@@ -381,20 +519,37 @@ async def update_employee(
             values={"employee_id": employee_id}
         )
         
+        # Editing an archived employee re-hires them from the form's start date
+        if not employee:
+            try:
+                restored = await restore_employee(employee_id, current_user["user_id"], start_date_value)
+            except ValueError as e:
+                return flash_redirect(request, "/employees", error=str(e))
+            if restored:
+                start_date_value = start_date_value or date.today()
+                employee = await db.database.fetch_one(
+                    query="SELECT * FROM Employee WHERE employee_id = :employee_id",
+                    values={"employee_id": employee_id}
+                )
+        
         if not employee:
             raise HTTPException(status_code=404, detail="Employee not found")
         
         # Check if employee code is unique (if changed)
         if emp_code != employee["emp_code"]:
             existing_employee = await db.database.fetch_one(
-                query="SELECT employee_id FROM Employee WHERE emp_code = :emp_code AND employee_id != :employee_id",
+                query="""
+                SELECT employee_id FROM Employee WHERE emp_code = :emp_code AND employee_id != :employee_id
+                UNION ALL
+                SELECT employee_id FROM EmployeeArchive WHERE emp_code = :emp_code AND employee_id != :employee_id
+                """,
                 values={"emp_code": emp_code.strip(), "employee_id": employee_id}
             )
             
             if existing_employee:
-                return RedirectResponse(
-                    url=f"/employees?error=Employee+code+'{emp_code}'+already+exists",
-                    status_code=status.HTTP_303_SEE_OTHER
+                return flash_redirect(
+                    request, "/employees",
+                    error=f"Employee code '{emp_code}' already exists"
                 )
         
         # Check table structure to handle missing columns
@@ -418,6 +573,7 @@ async def update_employee(
             "address = :address",
             "start_date = :start_date",
             "leave_date = :leave_date",
+            RESET_EMPLOYMENT_STATUS,
             "updated_at = :updated_at"
         ]
         
@@ -455,29 +611,40 @@ async def update_employee(
         if "updated_by" in columns:
             values["updated_by"] = current_user["user_id"]
         
-        await db.database.execute(query=query, values=values)
-        
-        # Log employee update
-        await db.database.execute(
-            query="INSERT INTO Log (user_id, action, details) VALUES (:user_id, :action, :details)",
-            values={
-                "user_id": current_user["user_id"],
-                "action": "EMPLOYEE_UPDATED",
-                "details": f"Employee {emp_code} ({first_name} {last_name}) updated"
-            }
-        )
+        async with db.database.transaction():
+            await db.database.execute(query=query, values={**values, "today": date.today().isoformat()})
+            
+            # Log employee update
+            await log_event(
+                "EMPLOYEE_UPDATED", current_user["user_id"],
+                entity_id=employee_id, emp_code=values["emp_code"],
+                changed_fields=changed_fields(employee, {
+                    field: value for field, value in values.items()
+                    if field not in ("employee_id", "updated_at", "updated_by")
+                }),
+                name=f"{values['first_name']} {values['last_name']}"
+            )
+            version = await db.bump_data_version()
+        await notify_change("employee", "updated", [employee_id], version)
+        
+        # In fragment mode send back only the changed row
+        if wants_fragment(request):
+            return await render_employee_fragment(
+                request, employee_id, current_user,
+                message="Employee updated successfully"
+            )
         
         # Redirect back to employee page with success message
-        return RedirectResponse(
-            url="/employees?message=Employee+updated+successfully",
-            status_code=303  # Use numeric code
+        return flash_redirect(
+            request, "/employees",
+            message="Employee updated successfully"
         )
         
     except Exception as e:
-        print(f"Update employee error: {e}")
-        return RedirectResponse(
-            url=f"/employees?error=Failed+to+update+employee:+{str(e)}",
-            status_code=303  # Use numeric code
+        logger.exception("Update employee error: %s", e)
+        return flash_redirect(
+            request, "/employees",
+            error=f"Failed to update employee: {str(e)}"
         )
 
 @router.post("/employees/{employee_id}/delete")
@@ -502,33 +669,236 @@ async def delete_employee(
             raise HTTPException(status_code=404, detail="Employee not found")
         
         # Delete employee record
-        await db.database.execute(
-            query="DELETE FROM Employee WHERE employee_id = :employee_id",
-            values={"employee_id": employee_id}
-        )
+        async with db.database.transaction():
+            await db.database.execute(
+                query="DELETE FROM Employee WHERE employee_id = :employee_id",
+                values={"employee_id": employee_id}
+            )
+            await record_deletions([employee_id])
+            
+            # Log employee deletion
+            await log_event(
+                "EMPLOYEE_DELETED", current_user["user_id"],
+                entity_id=employee_id, emp_code=employee["emp_code"],
+                name=f"{employee['first_name']} {employee['last_name']}"
+            )
+            version = await db.bump_data_version()
+        await notify_change("employee", "deleted", [employee_id], version)
         
-        # Log employee deletion
-        await db.database.execute(
-            query="INSERT INTO Log (user_id, action, details) VALUES (:user_id, :action, :details)",
-            values={
-                "user_id": current_user["user_id"],
-                "action": "EMPLOYEE_DELETED",
-                "details": f"Employee {employee['emp_code']} ({employee['first_name']} {employee['last_name']}) deleted"
-            }
-        )
+        # In fragment mode the page just drops the row
+        if wants_fragment(request):
+            return empty_fragment("Employee deleted successfully")
         
         # Redirect back to employee page with success message
-        return RedirectResponse(
-            url="/employees?message=Employee+deleted+successfully",
-            status_code=status.HTTP_303_SEE_OTHER
+        return flash_redirect(
+            request, "/employees",
+            message="Employee deleted successfully"
         )
         
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"Delete employee error: {e}")
-        return RedirectResponse(
-            url=f"/employees?error=Failed+to+delete+employee:+{str(e)}",
-            status_code=status.HTTP_303_SEE_OTHER
+        logger.exception("Delete employee error: %s", e)
+        return flash_redirect(
+            request, "/employees",
+            error=f"Failed to delete employee: {str(e)}"
+        )
+
+
+
+def _validate_bulk_ids(ids: List[int]) -> List[int]:
+    """De-duplicate ids (keeping order) and enforce the size limit"""
+    unique_ids = list(dict.fromkeys(ids))
+    if not unique_ids:
+        raise HTTPException(status_code=400, detail="No employee ids given")
+    if len(unique_ids) > BULK_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_IDS} employees per request")
+    return unique_ids
+
+@router.post("/api/employees/bulk-update", response_model=BulkResult)
+async def bulk_update_employees(
+    payload: EmployeeBulkUpdate,
+    current_user: dict = Depends(get_current_user)
+):
+    """Apply the same partial update to many employees in one transaction"""
+    if current_user["role"] not in ["admin", "hr"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin or HR access required")
+    
+    ids = _validate_bulk_ids(payload.ids)
+    patch = payload.patch.model_dump(exclude_unset=True)
+    if not patch:
+        raise HTTPException(status_code=400, detail="Patch has no fields to update")
+    if "emp_code" in patch:
+        raise HTTPException(status_code=400, detail="Employee code cannot be changed in bulk")
+    # NOT NULL columns: a blank value would fail the UPDATE with an IntegrityError
+    for field, label in (("first_name", "First name"), ("last_name", "Last name")):
+        if field in patch and not (patch[field] or "").strip():
+            raise HTTPException(status_code=400, detail=f"{label} is required")
+    if patch.get("email") and "@" not in patch["email"]:
+        raise HTTPException(status_code=400, detail="Invalid email format")
+    if patch.get("start_date") and patch.get("leave_date") and patch["start_date"] > patch["leave_date"]:
+        raise HTTPException(status_code=400, detail="Leave date cannot be earlier than start date")
+    
+    # Same normalization as the single-employee form
+    for field, value in patch.items():
+        if isinstance(value, str):
+            value = value.strip() or None
+            if field in ("employment", "status") and value:
+                value = value.lower()
+            patch[field] = value
+    
+    set_clause = ", ".join(f"{field} = :{field}" for field in patch)
+    extra_values = {}
+    if "leave_date" in patch:
+        set_clause += f", {RESET_EMPLOYMENT_STATUS}"
+        extra_values["today"] = date.today().isoformat()
+    # Only one of the dates patched: check it against each row's stored other date
+    date_guard = ""
+    if patch.get("leave_date") and "start_date" not in patch:
+        date_guard = " AND (start_date IS NULL OR start_date <= :leave_date)"
+    elif patch.get("start_date") and "leave_date" not in patch:
+        date_guard = " AND (leave_date IS NULL OR leave_date >= :start_date)"
+    found_ids = set()
+    invalid_ids = set()
+    
+    async with db.database.transaction():
+        for chunk in db.chunked(ids):
+            placeholders, id_values = db.in_clause(chunk)
+            # RETURNING reports the ids that exist without a read before the write
+            rows = await db.database.fetch_all(
+                f"""
+                UPDATE Employee SET {set_clause}, updated_at = :updated_at
+                WHERE employee_id IN ({placeholders}){date_guard} RETURNING employee_id
+                """,
+                {**patch, **id_values, **extra_values, "updated_at": datetime.utcnow()}
+            )
+            updated = {row["employee_id"] for row in rows}
+            found_ids.update(updated)
+            if date_guard and len(updated) < len(chunk):
+                # Rows the guard skipped exist but would end up with leave_date before start_date
+                skipped = [employee_id for employee_id in chunk if employee_id not in updated]
+                placeholders, id_values = db.in_clause(skipped)
+                rows = await db.database.fetch_all(
+                    f"SELECT employee_id FROM Employee WHERE employee_id IN ({placeholders})", id_values
+                )
+                invalid_ids.update(row["employee_id"] for row in rows)
+        
+        # One summary audit entry for the whole batch
+        await log_event(
+            "EMPLOYEE_BULK_UPDATED", current_user["user_id"],
+            changed_fields=list(patch), subject_ids=found_ids, count=len(found_ids)
         )
+        version = await db.bump_data_version() if found_ids else None
+    
+    if found_ids:
+        await notify_change("employee", "updated", sorted(found_ids), version)
+    
+    return BulkResult(
+        affected=len(found_ids),
+        results=[
+            {
+                "employee_id": employee_id,
+                "status": "updated" if employee_id in found_ids
+                else "invalid_dates" if employee_id in invalid_ids else "not_found",
+            }
+            for employee_id in ids
+        ]
+    )
 
+@router.post("/api/employees/bulk-delete", response_model=BulkResult)
+async def bulk_delete_employees(
+    payload: EmployeeBulkDelete,
+    current_user: dict = Depends(get_current_user)
+):
+    """Delete many employees in one transaction (admin only)"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    
+    ids = _validate_bulk_ids(payload.ids)
+    found_ids = set()
+    deleted_codes = []
+    
+    async with db.database.transaction():
+        for chunk in db.chunked(ids):
+            placeholders, id_values = db.in_clause(chunk)
+            rows = await db.database.fetch_all(
+                f"DELETE FROM Employee WHERE employee_id IN ({placeholders}) RETURNING employee_id, emp_code",
+                id_values
+            )
+            found_ids.update(row["employee_id"] for row in rows)
+            deleted_codes.extend(row["emp_code"] for row in rows)
+        
+        await record_deletions(found_ids)
+        
+        # One summary audit entry for the whole batch
+        await log_event(
+            "EMPLOYEE_BULK_DELETED", current_user["user_id"],
+            subject_ids=found_ids, count=len(found_ids), codes=deleted_codes
+        )
+        version = await db.bump_data_version() if found_ids else None
+    
+    if found_ids:
+        await notify_change("employee", "deleted", sorted(found_ids), version)
+    
+    return BulkResult(
+        affected=len(found_ids),
+        results=[
+            {"employee_id": employee_id, "status": "deleted" if employee_id in found_ids else "not_found"}
+            for employee_id in ids
+        ]
+    )
+
+
+@router.get("/api/employees/duplicates")
+async def list_duplicate_employees(
+    employee_id: Optional[int] = None,
+    limit: int = 100,
+    current_user: dict = Depends(get_current_user)
+):
+    """Likely duplicate employee pairs, highest score first"""
+    if current_user["role"] not in ["admin", "hr"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin or HR access required")
+    
+    duplicates = await fetch_duplicates(employee_id, limit=max(1, min(limit, 1000)))
+    return {"count": len(duplicates), "duplicates": duplicates}
+
+@router.post("/api/employees/duplicates/scan")
+async def scan_duplicate_employees(current_user: dict = Depends(get_current_user)):
+    """Rebuild the duplicate index over the whole table (admin only)"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    
+    stats = await rebuild_index()
+    await log_event(
+        "EMPLOYEE_DUPLICATE_SCAN", current_user["user_id"],
+        employees=stats["employees"], duplicates=stats["duplicates"]
+    )
+    return stats
+
+@router.get("/api/employees/history")
+async def employee_history_by_code(
+    emp_code: str,
+    before: Optional[int] = None,
+    limit: int = AUDIT_HISTORY_LIMIT,
+    current_user: dict = Depends(get_current_user)
+):
+    """Audit events recorded under an employee code (also works for deleted employees)"""
+    if current_user["role"] not in ["admin", "hr"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin or HR access required")
+    
+    events = await fetch_history("employee", emp_code=emp_code.strip(), before=before, limit=max(1, min(limit, 1000)))
+    return {"emp_code": emp_code.strip(), "count": len(events), "events": events}
+
+@router.get("/api/employees/{employee_id}/history")
+async def employee_history(
+    employee_id: int,
+    before: Optional[int] = None,
+    limit: int = AUDIT_HISTORY_LIMIT,
+    current_user: dict = Depends(get_current_user)
+):
+    """Audit events about one employee, newest first; page back with ?before=<log_id>"""
+    if current_user["role"] not in ["admin", "hr"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin or HR access required")
+    
+    events = await fetch_history("employee", employee_id, before=before, limit=max(1, min(limit, 1000)))
+    return {"employee_id": employee_id, "count": len(events), "events": events}
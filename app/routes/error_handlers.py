@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
+from app.prerender import pages
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
@@ -15,6 +16,9 @@ async def api_not_found(path: str):
 @router.get("/{path:path}", include_in_schema=False)
 async def catch_all(request: Request, path: str):
     """Catch-all route to handle 404 errors"""
+    # Scanners hit this constantly; the page never changes, so serve the pre-rendered bytes
+    if not pages.has_flash(request):
+        return pages.response(request, "not_found")
     return templates.TemplateResponse(
         "error.html", 
         {
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from app.auth import get_current_user
+from app.events import hub
+
+router = APIRouter()
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE_SECONDS = 15
+
+@router.get("/events")
+async def change_events(request: Request, current_user: dict = Depends(get_current_user)):
+    """Server-Sent Events stream of Employee/User changes"""
+    # Only admins see user management changes
+    if current_user["role"] == "admin":
+        entities = {"employee", "user", "all"}
+    else:
+        entities = {"employee", "all"}
+    
+    # Resume after the last event the browser saw, if it reconnected
+    last_event_id = request.headers.get("last-event-id")
+    try:
+        cursor = int(last_event_id) if last_event_id else hub.last_id
+    except ValueError:
+        cursor = hub.last_id
+    
+    async def stream():
+        nonlocal cursor
+        hub.subscribers += 1
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                events, cursor, missed = hub.events_after(cursor, entities)
+                if missed:
+                    yield 'event: change\ndata: {"entity":"all","action":"refresh","ids":[]}\n\n'
+                for event in events:
+                    yield event
+                if not events and not missed:
+                    if not await hub.wait(cursor, KEEPALIVE_SECONDS):
+                        yield ": keep-alive\n\n"
+        finally:
+            hub.subscribers -= 1
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
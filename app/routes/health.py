@@ -0,0 +1,54 @@
+import asyncio
+import os
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from dotenv import load_dotenv
+import app.db as db
+from app.admission import get_admission_stats
+from app.auth import get_current_user_optional
+from app.loop_monitor import monitor as loop_monitor
+
+# Load environment variables
+load_dotenv()
+
+# Seconds the database gets to answer before the check reports it unhealthy
+HEALTH_DB_TIMEOUT_SECONDS = float(os.getenv("HEALTH_DB_TIMEOUT_SECONDS", "2"))
+# Set HEALTH_VERBOSE_PUBLIC=1 to show verbose details without an admin login
+# (e.g. for a monitoring system on a private network)
+HEALTH_VERBOSE_PUBLIC = os.getenv("HEALTH_VERBOSE_PUBLIC", "0") == "1"
+
+router = APIRouter()
+
+async def _is_admin(request: Request) -> bool:
+    try:
+        user = await asyncio.wait_for(get_current_user_optional(request), HEALTH_DB_TIMEOUT_SECONDS)
+    except Exception:
+        return False
+    return user is not None and user["role"] == "admin"
+
+# Registered ahead of the catch-all 404 routes, which used to shadow it
+@router.get("/health")
+async def health_check(request: Request, verbose: bool = False):
+    """Liveness check; `?verbose=1` also checks the database and event-loop lag.
+
+    Everyone gets the resulting status; the details (database errors,
+    connection counts, admission queues) are only shown to admins.
+    """
+    body = {"status": "healthy", "message": "Employee Management System is running"}
+    if not verbose:
+        return body
+
+    show_details = HEALTH_VERBOSE_PUBLIC or await _is_admin(request)
+    database = await db.ping_database(timeout=HEALTH_DB_TIMEOUT_SECONDS)
+    loop = loop_monitor.summary()
+    if not database["ok"]:
+        body["status"] = "unhealthy"
+    elif loop["lag_ms"]["p99"] >= loop["threshold_ms"]:
+        body["status"] = "degraded"
+    if show_details:
+        body.update({
+            "database": database,
+            "event_loop": loop,
+            "admission": get_admission_stats(),
+        })
+    return JSONResponse(body, status_code=503 if body["status"] == "unhealthy" else 200)
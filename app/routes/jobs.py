@@ -0,0 +1,54 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from app.auth import get_current_user
+from app.jobs import JOB_TYPES, submit_job, get_job, list_jobs, cancel_job, job_to_dict
+from app.schemas import Job, JobCreate
+
+router = APIRouter()
+
+async def get_visible_job(job_id: str, current_user: dict):
+    """Load a job the current user may see (their own, or any for admins)"""
+    job = await get_job(job_id)
+    if not job or (current_user["role"] != "admin" and job["created_by"] != current_user["user_id"]):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/api/jobs", response_model=Job, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(payload: JobCreate, current_user: dict = Depends(get_current_user)):
+    """Queue a background job"""
+    job_kind = JOB_TYPES.get(payload.kind)
+    if job_kind is None:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind. Available: {', '.join(sorted(JOB_TYPES))}")
+    if current_user["role"] not in job_kind.roles:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to run this job")
+    
+    job_id = await submit_job(payload.kind, payload.params, current_user["user_id"])
+    return job_to_dict(await get_job(job_id))
+
+@router.get("/api/jobs")
+async def jobs_list(limit: int = 50, current_user: dict = Depends(get_current_user)):
+    """Recent jobs (all jobs for admins, otherwise the user's own)"""
+    user_id = None if current_user["role"] == "admin" else current_user["user_id"]
+    return await list_jobs(user_id, limit=max(1, min(limit, 200)))
+
+@router.get("/api/jobs/{job_id}", response_model=Job)
+async def job_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Status, progress and result of a job"""
+    return job_to_dict(await get_visible_job(job_id, current_user))
+
+@router.post("/api/jobs/{job_id}/cancel", response_model=Job)
+async def job_cancel(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Cancel a queued or running job"""
+    job = await get_visible_job(job_id, current_user)
+    if job["status"] in ("queued", "running"):
+        await cancel_job(job_id)
+    return job_to_dict(await get_job(job_id))
+
+@router.get("/api/jobs/{job_id}/result")
+async def job_result(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Download the file a finished job produced"""
+    job = await get_visible_job(job_id, current_user)
+    if job["status"] != "succeeded" or not job["result_file"] or not os.path.exists(job["result_file"]):
+        raise HTTPException(status_code=404, detail="Job has no result file")
+    return FileResponse(job["result_file"], filename=os.path.basename(job["result_file"]))
@@ -0,0 +1,116 @@
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
+from fastapi.responses import FileResponse, RedirectResponse, Response
+import os
+from datetime import datetime
+import app.db as db
+from app.audit import log_event
+from app.auth import get_current_user
+from app.events import notify_change
+from app.fragments import flash_redirect
+from app.photos import (
+    PHOTO_THUMB_FORMATS,
+    PHOTO_THUMB_SIZES,
+    PhotoError,
+    is_photo_hash,
+    queue_thumbnails,
+    save_upload,
+    thumbnail_path,
+)
+
+router = APIRouter()
+
+# Thumbnail URLs contain the content hash, so a URL always means the same bytes.
+# Private because photos are personal data served to signed-in users only.
+PHOTO_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+@router.post("/employees/{employee_id}/photo")
+async def upload_employee_photo(
+    request: Request,
+    employee_id: int,
+    photo: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """Store an employee photo and queue its thumbnails"""
+    if current_user["role"] not in ["admin", "hr"]:
+        return RedirectResponse(url="/", status_code=303)
+
+    employee = await db.database.fetch_one(
+        "SELECT employee_id, emp_code, photo_hash FROM Employee WHERE employee_id = :employee_id",
+        {"employee_id": employee_id}
+    )
+    if not employee:
+        raise HTTPException(status_code=404, detail="Employee not found")
+
+    try:
+        photo_hash = await save_upload(photo)
+    except PhotoError as e:
+        return flash_redirect(request, "/employees", error=str(e))
+    finally:
+        await photo.close()
+
+    await queue_thumbnails(photo_hash, current_user["user_id"])
+    async with db.database.transaction():
+        await db.database.execute(
+            "UPDATE Employee SET photo_hash = :photo_hash, updated_at = :updated_at WHERE employee_id = :employee_id",
+            {"photo_hash": photo_hash, "updated_at": datetime.utcnow(), "employee_id": employee_id}
+        )
+        await log_event(
+            "EMPLOYEE_PHOTO_UPDATED", current_user["user_id"],
+            entity_id=employee_id, emp_code=employee["emp_code"], changed_fields=["photo_hash"],
+            photo_hash=photo_hash, previous={"photo_hash": employee["photo_hash"]}
+        )
+        version = await db.bump_data_version()
+    await notify_change("employee", "updated", [employee_id], version)
+    return flash_redirect(request, "/employees", message=f"Photo updated for {employee['emp_code']}")
+
+@router.post("/employees/{employee_id}/photo/delete")
+async def delete_employee_photo(
+    request: Request,
+    employee_id: int,
+    current_user: dict = Depends(get_current_user)
+):
+    """Go back to the initials avatar (the file stays; other employees may share it)"""
+    if current_user["role"] not in ["admin", "hr"]:
+        return RedirectResponse(url="/", status_code=303)
+
+    employee = await db.database.fetch_one(
+        "SELECT employee_id, emp_code, photo_hash FROM Employee WHERE employee_id = :employee_id",
+        {"employee_id": employee_id}
+    )
+    if not employee:
+        raise HTTPException(status_code=404, detail="Employee not found")
+
+    async with db.database.transaction():
+        await db.database.execute(
+            "UPDATE Employee SET photo_hash = NULL, updated_at = :updated_at WHERE employee_id = :employee_id",
+            {"updated_at": datetime.utcnow(), "employee_id": employee_id}
+        )
+        await log_event(
+            "EMPLOYEE_PHOTO_REMOVED", current_user["user_id"],
+            entity_id=employee_id, emp_code=employee["emp_code"], changed_fields=["photo_hash"],
+            previous={"photo_hash": employee["photo_hash"]}
+        )
+        version = await db.bump_data_version()
+    await notify_change("employee", "updated", [employee_id], version)
+    return flash_redirect(request, "/employees", message="Photo removed")
+
+@router.get("/photos/{photo_hash}/{size}.{extension}")
+async def photo_thumbnail(
+    photo_hash: str,
+    size: int,
+    extension: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Serve a generated thumbnail with immutable caching"""
+    if not is_photo_hash(photo_hash) or size not in PHOTO_THUMB_SIZES or extension not in PHOTO_THUMB_FORMATS:
+        raise HTTPException(status_code=404, detail="Photo not found")
+    path = thumbnail_path(photo_hash, size, extension)
+    if not os.path.exists(path):
+        # Thumbnail job still queued: the page falls back to initials, and
+        # nothing may cache the miss
+        return Response(status_code=404, headers={"Cache-Control": "no-store"})
+    return FileResponse(
+        path,
+        media_type="image/webp" if extension == "webp" else "image/jpeg",
+        headers={"Cache-Control": PHOTO_CACHE_CONTROL},
+    )
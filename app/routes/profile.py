@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, Request, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 import app.db as db
+from app.events import notify_change
+from app.loader import get_loader
 from app.auth import  get_current_user, get_password_hash, is_strong_password, verify_password
 from datetime import datetime
 
@@ -29,22 +32,25 @@ async def update_profile(
 ):
     """Handle profile update"""
     try:
-        await db.database.execute(
-            query="UPDATE User SET username = :username, email = :email, updated_at = :updated_at WHERE user_id = :user_id",
-            values={
-                "username": username,
-                "email": email,
-                "updated_at": datetime.utcnow(),
-                "user_id": current_user["user_id"]
-            }
-        )
-        updated_user = await db.database.fetch_one(
-            query="SELECT * FROM User WHERE user_id = :user_id",
-            values={"user_id": current_user["user_id"]}
-        )
+        values = {
+            "username": username,
+            "email": email,
+            "updated_at": datetime.utcnow(),
+            "user_id": current_user["user_id"]
+        }
+        async with db.database.transaction():
+            await db.database.execute(
+                query="UPDATE User SET username = :username, email = :email, updated_at = :updated_at WHERE user_id = :user_id",
+                values=values
+            )
+            version = await db.bump_data_version()
+        await notify_change("user", "updated", [current_user["user_id"]], version)
+        # The row is known after the update, no need to select it again
+        updated_user = {**current_user, **values}
+        get_loader(request).prime("user", current_user["user_id"], updated_user)
         return templates.TemplateResponse("profile.html", {
             "request": request,
-            "user": dict(updated_user),
+            "user": updated_user,
             "message": "Profile updated successfully"
         })
     except Exception as e:
@@ -70,12 +76,11 @@ async def change_password(
             "error": "New password is not strong enough. It must be at least 8 characters, contain uppercase, lowercase, a digit, and a special character."
         })
 
-    # Fetch user from DB
-    user = await db.database.fetch_one(
-        query="SELECT * FROM User WHERE user_id = :user_id",
-        values={"user_id": current_user["user_id"]}
-    )
-    if not user or not verify_password(current_password, user["password_hash"]):
+    # Same row get_current_user loaded for this request
+    loader = get_loader(request)
+    user = await loader.load("user", current_user["user_id"])
+    # bcrypt is deliberately slow; keep it off the event loop
+    if not user or not await run_in_threadpool(verify_password, current_password, user["password_hash"]):
         return templates.TemplateResponse("profile.html", {
             "request": request,
             "user": current_user,
@@ -83,21 +88,23 @@ async def change_password(
         })
 
     # Update password
-    hashed_password = get_password_hash(new_password)
-    await db.database.execute(
-        query="UPDATE User SET password_hash = :password_hash, updated_at = :updated_at WHERE user_id = :user_id",
-        values={
-            "password_hash": hashed_password,
-            "updated_at": datetime.utcnow(),
-            "user_id": current_user["user_id"]
-        }
-    )
-    updated_user = await db.database.fetch_one(
-        query="SELECT * FROM User WHERE user_id = :user_id",
-        values={"user_id": current_user["user_id"]}
-    )
+    hashed_password = await run_in_threadpool(get_password_hash, new_password)
+    values = {
+        "password_hash": hashed_password,
+        "updated_at": datetime.utcnow(),
+        "user_id": current_user["user_id"]
+    }
+    async with db.database.transaction():
+        await db.database.execute(
+            query="UPDATE User SET password_hash = :password_hash, updated_at = :updated_at WHERE user_id = :user_id",
+            values=values
+        )
+        version = await db.bump_data_version()
+    await notify_change("user", "updated", [current_user["user_id"]], version)
+    updated_user = {**user, **values}
+    loader.prime("user", current_user["user_id"], updated_user)
     return templates.TemplateResponse("profile.html", {
         "request": request,
-        "user": dict(updated_user),
+        "user": updated_user,
         "message": "Password changed successfully"
     })
\ No newline at end of file
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import Response
+from typing import Optional
+from datetime import datetime, date, timedelta
+from app.auth import get_current_user
+from app.payroll import get_payroll_projection, PAYROLL_MAX_MONTHS
+from app.headcount import get_headcount_series, series_to_csv, HEADCOUNT_INTERVALS, HEADCOUNT_MAX_DAYS
+
+router = APIRouter()
+
+def require_finance(current_user: dict = Depends(get_current_user)) -> dict:
+    """Allow only admin and HR users through"""
+    if current_user["role"] not in ["admin", "hr"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin or HR access required")
+    return current_user
+
+def parse_report_date(value: Optional[str], name: str) -> Optional[date]:
+    """Parse a YYYY-MM-DD query parameter"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be formatted as YYYY-MM-DD")
+
+@router.get("/api/reports/payroll")
+async def payroll_report(
+    start: Optional[str] = Query(None, description="First month as YYYY-MM (defaults to this month)"),
+    months: int = Query(12, ge=1, le=PAYROLL_MAX_MONTHS),
+    current_user: dict = Depends(require_finance)
+):
+    """Prorated monthly payroll cost projection by employment type"""
+    start_month = None
+    if start:
+        try:
+            start_month = datetime.strptime(start, "%Y-%m").date()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="start must be formatted as YYYY-MM")
+    return await get_payroll_projection(start_month, months)
+
+@router.get("/api/reports/headcount")
+async def headcount_report(
+    start: Optional[str] = Query(None, description="First day as YYYY-MM-DD (defaults to one year before end)"),
+    end: Optional[str] = Query(None, description="Last day as YYYY-MM-DD (defaults to today)"),
+    interval: str = Query("month"),
+    employment: Optional[str] = None,
+    status: Optional[str] = None,
+    format: str = Query("json"),
+    current_user: dict = Depends(require_finance)
+):
+    """Headcount, hires, leavers and turnover rate per day or month"""
+    if interval not in HEADCOUNT_INTERVALS:
+        raise HTTPException(status_code=400, detail=f"interval must be one of: {', '.join(HEADCOUNT_INTERVALS)}")
+    if format not in ("json", "csv"):
+        raise HTTPException(status_code=400, detail="format must be json or csv")
+
+    last = parse_report_date(end, "end") or date.today()
+    first = parse_report_date(start, "start") or last - timedelta(days=365)
+    if first > last:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (last - first).days + 1 > HEADCOUNT_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range may cover at most {HEADCOUNT_MAX_DAYS} days")
+
+    report = await get_headcount_series(first, last, interval, employment, status)
+    if format == "csv":
+        filename = f"headcount_{interval}_{first.isoformat()}_{last.isoformat()}.csv"
+        return Response(
+            content=series_to_csv(report["series"]),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    return report
@@ -1,14 +1,32 @@
+import logging
 from fastapi import APIRouter, Depends, Request, Form, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
 from typing import Optional, List
 from datetime import datetime
 import app.db as db
+from app.audit import log_event
 from app.auth import get_current_user, get_password_hash
+from app.conditional import get_validators, is_not_modified, not_modified_response
+from app.events import notify_change
+from app.fragments import wants_fragment, flash_redirect, render_fragment, empty_fragment
+from app.queries import fetch_user_list, fetch_user_row
 from app.schemas import User, UserCreate, UserUpdate
 from fastapi.templating import Jinja2Templates
 
 router = APIRouter()
 templates = Jinja2Templates(directory="app/templates")
+logger = logging.getLogger(__name__)
+
+async def render_user_fragment(request: Request, user_id: int, current_user: dict, message: Optional[str] = None):
+    """Render one user's row and modals as a partial response"""
+    user = await fetch_user_row(user_id)
+    if not user:
+        return empty_fragment(message)
+    return render_fragment(request, "partials/user_fragment.html", {
+        "current_user": current_user,
+        "user": user
+    }, message=message)
 
 # User Management Routes
 @router.get("/users", response_class=HTMLResponse)
@@ -18,9 +36,13 @@ async def users_page(request: Request, current_user: dict = Depends(get_current_
     if current_user["role"] != "admin":
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
+    # Answer revalidation requests before touching the tables or templates
+    validators = await get_validators(request, current_user)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+    
     # Get all users
-    query = "SELECT * FROM User ORDER BY created_at DESC"
-    users = await db.database.fetch_all(query=query)
+    users = await fetch_user_list()
     
     # Extract message and error from URL parameters (like employees.py does)
     message = request.query_params.get('message')
@@ -33,13 +55,28 @@ async def users_page(request: Request, current_user: dict = Depends(get_current_
         error = error.replace('+', ' ')
     
     # Return the users page with message/error parameters
-    return templates.TemplateResponse("home.html", {
+    response = templates.TemplateResponse("home.html", {
         "request": request,
         "current_user": current_user,
         "users": users,
         "message": message,  # ← Add this
         "error": error       # ← Add this
     })
+    return validators.apply(response)
+
+@router.get("/api/users")
+async def users_json(request: Request, current_user: dict = Depends(get_current_user)):
+    """List users as JSON (admin only)"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    
+    validators = await get_validators(request, current_user)
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+    
+    users = await fetch_user_list()
+    response = JSONResponse([user.as_dict() for user in users])
+    return validators.apply(response)
 
 
 @router.post("/users")
@@ -64,9 +101,11 @@ async def create_user(
             values={"username": username.strip()}
         )
         if existing_user:
+            if wants_fragment(request):
+                return flash_redirect(request, redirect_to, error=f"Username '{username}' is already taken")
+            
             # Get all users for redisplay
-            query = "SELECT * FROM User ORDER BY created_at DESC"
-            users = await db.database.fetch_all(query=query)
+            users = await fetch_user_list()
             
             return templates.TemplateResponse("home.html", {
                 "request": request,
@@ -81,9 +120,11 @@ async def create_user(
             values={"email": email.strip()}
         )
         if existing_email:
+            if wants_fragment(request):
+                return flash_redirect(request, redirect_to, error="Email address is already registered")
+            
             # Get all users for redisplay
-            query = "SELECT * FROM User ORDER BY created_at DESC"
-            users = await db.database.fetch_all(query=query)
+            users = await fetch_user_list()
             
             return templates.TemplateResponse("home.html", {
                 "request": request,
@@ -93,7 +134,7 @@ async def create_user(
             })
         
         # Create user
-        hashed_password = get_password_hash(password)
+        hashed_password = await run_in_threadpool(get_password_hash, password)
         now = datetime.utcnow()
         
         # Modified query - removed full_name field
@@ -102,45 +143,52 @@ async def create_user(
         VALUES (:username, :email, :password_hash, :role, :created_at, :updated_at)
         """
         
-        await db.database.execute(
-            query=query,
-            values={
-                "username": username.strip(),
-                "email": email.strip(),
-                "password_hash": hashed_password,
-                "role": role.strip(),
-                "created_at": now,
-                "updated_at": now
-            }
-        )
+        async with db.database.transaction():
+            await db.database.execute(
+                query=query,
+                values={
+                    "username": username.strip(),
+                    "email": email.strip(),
+                    "password_hash": hashed_password,
+                    "role": role.strip(),
+                    "created_at": now,
+                    "updated_at": now
+                }
+            )
+            version = await db.bump_data_version()
         
         # Get the user_id of the newly created user
         new_user = await db.database.fetch_one(
             query="SELECT user_id FROM User WHERE username = :username",
             values={"username": username.strip()}
         )
+        await notify_change("user", "created", [new_user["user_id"]], version)
         
         # Log user creation
-        await db.database.execute(
-            query="INSERT INTO Log (user_id, action, details) VALUES (:user_id, :action, :details)",
-            values={
-                "user_id": current_user["user_id"],
-                "action": "USER_CREATED",
-                "details": f"Admin {current_user['username']} created new user {username}"
-            }
+        await log_event(
+            "USER_CREATED", current_user["user_id"],
+            entity_id=new_user["user_id"], username=username.strip(), role=role.strip()
         )
         
+        # In fragment mode send back only the new row
+        if wants_fragment(request):
+            return await render_user_fragment(
+                request, new_user["user_id"], current_user,
+                message=f"User {username} created successfully"
+            )
+        
         # Return redirect with success message
-        return RedirectResponse(
-            url=f"{redirect_to}?message=User+{username}+created+successfully",
-            status_code=status.HTTP_303_SEE_OTHER
+        return flash_redirect(
+            request, redirect_to,
+            message=f"User {username} created successfully"
         )
         
     except Exception as e:
-        print(f"Create user error: {e}")
+        logger.exception("Create user error: %s", e)
+        if wants_fragment(request):
+            return flash_redirect(request, redirect_to, error=f"Failed to create user: {str(e)}")
         # Get all users for redisplay
-        query = "SELECT * FROM User ORDER BY created_at DESC"
-        users = await db.database.fetch_all(query=query)
+        users = await fetch_user_list()
         
         return templates.TemplateResponse("home.html", {
             "request": request,
@@ -150,6 +198,13 @@ async def create_user(
         })
 
 
+@router.get("/users/{user_id}/row", response_class=HTMLResponse)
+async def user_row(request: Request, user_id: int, current_user: dict = Depends(get_current_user)):
+    """Render a single user row (admin only, used to patch the list in place)"""
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return await render_user_fragment(request, user_id, current_user)
+
 @router.get("/users/{user_id}", response_class=HTMLResponse)
 async def get_user(request: Request, user_id: int, current_user: dict = Depends(get_current_user)):
     """Get user details (admin only)"""
@@ -204,9 +259,9 @@ async def update_user(
                 values={"username": username.strip(), "user_id": user_id}
             )
             if existing_username:
-                return RedirectResponse(
-                    url=f"{redirect_to}?error=Username+'{username}'+is+already+taken",
-                    status_code=status.HTTP_303_SEE_OTHER
+                return flash_redirect(
+                    request, redirect_to,
+                    error=f"Username '{username}' is already taken"
                 )
         
         # Check if email is taken by another user
@@ -216,9 +271,9 @@ async def update_user(
                 values={"email": email.strip(), "user_id": user_id}
             )
             if existing_email:
-                return RedirectResponse(
-                    url=f"{redirect_to}?error=Email+address+is+already+registered",
-                    status_code=status.HTTP_303_SEE_OTHER
+                return flash_redirect(
+                    request, redirect_to,
+                    error="Email address is already registered"
                 )
         
         # Update user - now includes username
@@ -228,28 +283,38 @@ async def update_user(
         WHERE user_id = :user_id
         """
         
-        await db.database.execute(
-            query=query,
-            values={
-                "username": username.strip(),
-                "email": email.strip(),
-                "role": role.strip(),
-                "updated_at": datetime.utcnow(),
-                "user_id": user_id
-            }
-        )
+        async with db.database.transaction():
+            await db.database.execute(
+                query=query,
+                values={
+                    "username": username.strip(),
+                    "email": email.strip(),
+                    "role": role.strip(),
+                    "updated_at": datetime.utcnow(),
+                    "user_id": user_id
+                }
+            )
+            version = await db.bump_data_version()
+        await notify_change("user", "updated", [user_id], version)
+        
+        # In fragment mode send back only the changed row
+        if wants_fragment(request):
+            return await render_user_fragment(
+                request, user_id, current_user,
+                message=f"User {username} updated successfully"
+            )
         
         # Return with success message
-        return RedirectResponse(
-            url=f"{redirect_to}?message=User+{username}+updated+successfully",
-            status_code=status.HTTP_303_SEE_OTHER
+        return flash_redirect(
+            request, redirect_to,
+            message=f"User {username} updated successfully"
         )
         
     except Exception as e:
-        print(f"Update user error: {e}")
-        return RedirectResponse(
-            url=f"{redirect_to}?error=Failed+to+update+user:+{str(e)}",
-            status_code=status.HTTP_303_SEE_OTHER
+        logger.exception("Update user error: %s", e)
+        return flash_redirect(
+            request, redirect_to,
+            error=f"Failed to update user: {str(e)}"
         )
 
 @router.post("/users/{user_id}/reset-password")
@@ -275,16 +340,19 @@ async def reset_user_password(
             raise HTTPException(status_code=404, detail="User not found")
         
         # Update password
-        hashed_password = get_password_hash(new_password)
-        
-        await db.database.execute(
-            query="UPDATE User SET password_hash = :password_hash, updated_at = :updated_at WHERE user_id = :user_id",
-            values={
-                "password_hash": hashed_password,
-                "updated_at": datetime.utcnow(),
-                "user_id": user_id
-            }
-        )
+        hashed_password = await run_in_threadpool(get_password_hash, new_password)
+        
+        async with db.database.transaction():
+            await db.database.execute(
+                query="UPDATE User SET password_hash = :password_hash, updated_at = :updated_at WHERE user_id = :user_id",
+                values={
+                    "password_hash": hashed_password,
+                    "updated_at": datetime.utcnow(),
+                    "user_id": user_id
+                }
+            )
+            version = await db.bump_data_version()
+        await notify_change("user", "updated", [user_id], version)
         
         # Get updated user
         updated_user = await db.database.fetch_one(
@@ -293,13 +361,15 @@ async def reset_user_password(
         )
         
         # Return user details with success message
-        return RedirectResponse(
-            url=f"{redirect_to}?message=Password+for+user+{user_to_update['username']}+reset+successfully",
-            status_code=status.HTTP_303_SEE_OTHER
+        return flash_redirect(
+            request, redirect_to,
+            message=f"Password for user {user_to_update['username']} reset successfully"
         )
         
     except Exception as e:
-        print(f"Reset password error: {e}")
+        logger.exception("Reset password error: %s", e)
+        if wants_fragment(request):
+            return flash_redirect(request, redirect_to, error="Failed to reset password. Please try again.")
         user = await db.database.fetch_one(
             query="SELECT * FROM User WHERE user_id = :user_id",
             values={"user_id": user_id}
@@ -320,18 +390,18 @@ async def delete_user(
     current_user: dict = Depends(get_current_user)
 ):
     """Delete user (admin only)"""
-    print(f"DELETE USER REQUEST: user_id={user_id}, admin={current_user['role']}")
+    logger.info("Delete user request: user_id=%s, role=%s", user_id, current_user["role"])
     
     if current_user["role"] != "admin":
-        print("ERROR: Not admin")
+        logger.warning("Delete user refused: user %s is not an admin", current_user["user_id"])
         return RedirectResponse(url="/", status_code=status.HTTP_303_SEE_OTHER)
     
     try:
         # Cannot delete yourself
         if user_id == current_user["user_id"]:
-            return RedirectResponse(
-                url=f"{redirect_to}?error=You+cannot+delete+your+own+account",
-                status_code=status.HTTP_303_SEE_OTHER
+            return flash_redirect(
+                request, redirect_to,
+                error="You cannot delete your own account"
             )
         
         # Get the user to delete
@@ -344,14 +414,17 @@ async def delete_user(
             raise HTTPException(status_code=404, detail="User not found")
         
         # Delete user
-        await db.database.execute(
-            query="DELETE FROM User WHERE user_id = :user_id",
-            values={"user_id": user_id}
-        )
+        async with db.database.transaction():
+            await db.database.execute(
+                query="DELETE FROM User WHERE user_id = :user_id",
+                values={"user_id": user_id}
+            )
+            version = await db.bump_data_version()
+        await notify_change("user", "deleted", [user_id], version)
         
-        # Get all users
-        query = "SELECT * FROM User ORDER BY created_at DESC"
-        users = await db.database.fetch_all(query=query)
+        # In fragment mode the page just drops the row
+        if wants_fragment(request):
+            return empty_fragment(f"User {user_to_delete['username']} deleted successfully")
         
         # Return the users page with success message
         return RedirectResponse(
@@ -360,9 +433,10 @@ async def delete_user(
         )
         
     except Exception as e:
-        print(f"Delete user error: {e}")
-        query = "SELECT * FROM User ORDER BY created_at DESC"
-        users = await db.database.fetch_all(query=query)
+        logger.exception("Delete user error: %s", e)
+        if wants_fragment(request):
+            return flash_redirect(request, redirect_to, error="Failed to delete user. Please try again.")
+        users = await fetch_user_list()
         
         return templates.TemplateResponse("home.html", {
             "request": request,
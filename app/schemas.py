@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Optional, List, Dict, Any
 from datetime import datetime, date
 
 class Token(BaseModel):
@@ -66,10 +66,50 @@ class EmployeeUpdate(BaseModel):
     salary: Optional[float] = None
     address: Optional[str] = None
 
+class EmployeeBulkUpdate(BaseModel):
+    ids: List[int]
+    patch: EmployeeUpdate
+
+class EmployeeBulkDelete(BaseModel):
+    ids: List[int]
+
+class BulkItemResult(BaseModel):
+    employee_id: int
+    status: str  # "updated", "deleted", "not_found" or "invalid_dates"
+
+class BulkResult(BaseModel):
+    affected: int
+    results: List[BulkItemResult]
+
+class JobCreate(BaseModel):
+    kind: str
+    params: Dict[str, Any] = {}
+
+class Job(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    params: Dict[str, Any] = {}
+    progress: float = 0
+    message: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    has_file: bool = False
+    error: Optional[str] = None
+    attempts: int = 0
+    cancel_requested: bool = False
+    created_by: Optional[int] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class MaintenanceRequest(BaseModel):
+    tasks: List[str] = []
+
 class Employee(EmployeeBase):
     employee_id: int
     start_date: Optional[date] = None
     leave_date: Optional[date] = None
+    employment_status: Optional[str] = None
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
@@ -0,0 +1,85 @@
+import asyncio
+import os
+from typing import Optional, Sequence
+import jinja2
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Rendered text buffered before a chunk is sent to the client
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "16384"))
+# The first chunk (doctype, <head>, page shell) goes out as soon as this much is ready
+STREAM_FIRST_CHUNK_SIZE = 1024
+# Rows rendered between yields to the event loop
+STREAM_ROWS_PER_YIELD = int(os.getenv("STREAM_ROWS_PER_YIELD", "200"))
+
+# Same templates as everywhere else, compiled for async rendering
+stream_templates = Jinja2Templates(env=jinja2.Environment(
+    loader=jinja2.FileSystemLoader("app/templates"),
+    autoescape=True,
+    enable_async=True,
+))
+
+class AsyncRows:
+    """Async, re-iterable view over a row sequence for streamed templates.
+
+    Templates loop over the employees several times (table, edit and delete
+    modals), so every `{% for %}` gets a fresh pass. Rows are never copied,
+    and each pass hands control back to the event loop every
+    STREAM_ROWS_PER_YIELD rows so other requests keep being served.
+    """
+
+    def __init__(self, rows: Sequence):
+        self._rows = rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for i, row in enumerate(self._rows):
+            if i and i % STREAM_ROWS_PER_YIELD == 0:
+                await asyncio.sleep(0)
+            yield row
+
+async def _render_chunks(template: jinja2.Template, context: dict):
+    buffer = []
+    size = 0
+    limit = STREAM_FIRST_CHUNK_SIZE
+    async for text in template.generate_async(context):
+        buffer.append(text)
+        size += len(text)
+        if size >= limit:
+            yield "".join(buffer).encode("utf-8")
+            buffer.clear()
+            size = 0
+            limit = STREAM_CHUNK_SIZE
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+def stream_template(
+    request: Request,
+    template_name: str,
+    context: dict,
+    status_code: int = 200,
+    headers: Optional[dict] = None
+) -> StreamingResponse:
+    """Render a template chunk by chunk instead of into one string.
+
+    Everything the template needs must be loaded before calling this: once
+    the first chunk is sent the status code can no longer change.
+    """
+    template = stream_templates.get_template(template_name)
+    context = {"request": request, **context}
+    return StreamingResponse(
+        _render_chunks(template, context),
+        status_code=status_code,
+        headers=headers,
+        media_type="text/html",
+    )
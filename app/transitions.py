@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+from dotenv import load_dotenv
+import app.db as db
+from app.audit import log_event
+from app.events import hub, notify_change
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# employment_status given to employees once their leave_date has passed
+# (Employee.status is marital status and is never touched here)
+LEAVER_STATUS = os.getenv("LEAVER_STATUS", "resigned").strip().lower()
+# Set TRANSITIONS_ENABLED=0 to turn the scheduler off
+TRANSITIONS_ENABLED = os.getenv("TRANSITIONS_ENABLED", "1") != "0"
+# Longest sleep between runs, so edits made by other workers are picked up
+TRANSITIONS_MAX_SLEEP_SECONDS = float(os.getenv("TRANSITIONS_MAX_SLEEP_SECONDS", "3600"))
+TRANSITIONS_RETRY_SECONDS = 60
+# Employee codes listed in the audit entry; the rest are summarized as a count
+TRANSITIONS_LOG_CODES = 50
+
+# SET clause for writes that change leave_date: a leave_date that is missing or
+# not yet past clears the leaver state, and the scheduler sets it again when due
+RESET_EMPLOYMENT_STATUS = "employment_status = CASE WHEN :leave_date < :today THEN employment_status END"
+
+transition_stats = {"runs": 0, "transitioned": 0, "last_run_at": None, "last_transitioned": 0, "next_due": None}
+_wake = None
+
+def _get_wake() -> asyncio.Event:
+    global _wake
+    if _wake is None:
+        _wake = asyncio.Event()
+    return _wake
+
+def reset():
+    """Drop loop-bound state (called on startup)"""
+    global _wake
+    _wake = None
+
+async def repair_leaver_statuses() -> int:
+    """Move leaver states written into status by older versions to employment_status"""
+    repaired, version = {}, None
+    for table in ("Employee", "EmployeeArchive"):
+        async with db.database.transaction():
+            rows = await db.database.fetch_all(
+                f"""
+                UPDATE {table} SET employment_status = LOWER(status), status = NULL, updated_at = :now
+                WHERE LOWER(status) = :leaver RETURNING employee_id, emp_code
+                """,
+                {"leaver": LEAVER_STATUS, "now": datetime.utcnow()}
+            )
+            if rows:
+                await log_event(
+                    "EMPLOYEE_STATUS_REPAIRED",
+                    changed_fields=["status", "employment_status"], subject_ids=[row["employee_id"] for row in rows],
+                    count=len(rows), table=table,
+                    previous={row["emp_code"]: {"status": LEAVER_STATUS, "employment_status": None} for row in rows}
+                )
+                version = await db.bump_data_version()
+        repaired[table] = [row["employee_id"] for row in rows]
+    if repaired["Employee"]:
+        await notify_change("employee", "updated", repaired["Employee"], version)
+    count = sum(len(ids) for ids in repaired.values())
+    if count:
+        logger.info("Status transitions: moved %d leaver status(es) to employment_status", count)
+    return count
+
+async def apply_due_transitions(today: Optional[date] = None) -> list:
+    """Set employment_status to LEAVER_STATUS for everyone whose leave_date is before today.
+
+    One range query on the leave_date index finds and updates them all;
+    RETURNING reports exactly the rows this call changed, so concurrent
+    workers never log or announce the same transition twice.
+    """
+    today = today or date.today()
+    # The UPDATE and its audit entries commit together, so the log never
+    # shows a transition without the change or out of order with other writes
+    async with db.database.transaction():
+        rows = await db.database.fetch_all(
+            """
+            UPDATE Employee SET employment_status = :leaver, updated_at = :now
+            WHERE leave_date < :today AND employment_status IS NULL
+            RETURNING employee_id, emp_code
+            """,
+            {"leaver": LEAVER_STATUS, "now": datetime.utcnow(), "today": today.isoformat()}
+        )
+        if rows:
+            codes = sorted(row["emp_code"] for row in rows)
+            # One audit entry per run, however many employees moved; each one is a
+            # LogSubject row so it still shows up in that employee's history. Only
+            # rows with no employment_status match, so that is every previous value.
+            await log_event(
+                "EMPLOYEE_STATUS_TRANSITION",
+                changed_fields=["employment_status"], subject_ids=[row["employee_id"] for row in rows],
+                count=len(rows), employment_status=LEAVER_STATUS, codes=codes[:TRANSITIONS_LOG_CODES],
+                previous={row["emp_code"]: {"employment_status": None} for row in rows}
+            )
+            version = await db.bump_data_version()
+    transition_stats["runs"] += 1
+    transition_stats["last_run_at"] = time.time()
+    transition_stats["last_transitioned"] = len(rows)
+    if not rows:
+        return []
+
+    transition_stats["transitioned"] += len(rows)
+    ids = [row["employee_id"] for row in rows]
+    await notify_change("employee", "updated", ids, version)
+    logger.info("Status transitions: %d employee(s) set to '%s'", len(rows), LEAVER_STATUS)
+    return ids
+
+async def next_due_transition(today: Optional[date] = None) -> Optional[date]:
+    """Day the next pending transition becomes due (the day after its leave_date)"""
+    today = today or date.today()
+    leave_date = await db.database.fetch_val(
+        "SELECT MIN(leave_date) FROM Employee WHERE leave_date >= :today AND employment_status IS NULL",
+        {"today": today.isoformat()}
+    )
+    if leave_date is None:
+        return None
+    if isinstance(leave_date, str):
+        leave_date = date.fromisoformat(leave_date[:10])
+    return leave_date + timedelta(days=1)
+
+def _seconds_until(day: Optional[date]) -> float:
+    if day is None:
+        return TRANSITIONS_MAX_SLEEP_SECONDS
+    # A second past local midnight, so date.today() has already moved on
+    due = datetime.combine(day, datetime.min.time()) + timedelta(seconds=1)
+    return min(max((due - datetime.now()).total_seconds(), 0), TRANSITIONS_MAX_SLEEP_SECONDS)
+
+async def handle_change(event: dict):
+    """Re-plan when employees change; a new leave_date may be due sooner"""
+    if event["entity"] in ("employee", "all") and _wake is not None:
+        _wake.set()
+
+async def _uncancelled(coro):
+    """Run coro to the end even if the caller is cancelled.
+
+    Shutdown cancels the scheduler, and a `databases` transaction cancelled
+    while it starts keeps its connection open, so the process cannot exit.
+    A pass is short, so shutdown waits for it instead.
+    """
+    run = asyncio.ensure_future(coro)
+    try:
+        return await asyncio.shield(run)
+    except asyncio.CancelledError:
+        await run
+        raise
+
+async def run_transitions_forever():
+    """Apply due transitions, then sleep until the next one is due (or an employee changes)"""
+    if not TRANSITIONS_ENABLED:
+        return
+    wake = _get_wake()
+    try:
+        await _uncancelled(repair_leaver_statuses())
+    except Exception as e:
+        logger.exception("Status transition repair error: %s", e)
+    while True:
+        try:
+            await _uncancelled(apply_due_transitions())
+            next_due = await next_due_transition()
+            transition_stats["next_due"] = next_due.isoformat() if next_due else None
+            delay = _seconds_until(next_due)
+        except Exception as e:
+            logger.exception("Status transition error: %s", e)
+            delay = TRANSITIONS_RETRY_SECONDS
+        # Cleared after our own writes so their change events do not wake us again
+        wake.clear()
+        try:
+            await asyncio.wait_for(wake.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+def get_transition_stats() -> dict:
+    return {"enabled": TRANSITIONS_ENABLED, "leaver_status": LEAVER_STATUS, **transition_stats}
+
+hub.add_listener(handle_change)
@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+import app.db as db
+from app.events import hub
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Most memory the index may use (estimated); past it lookups fall back to SQL
+TYPEAHEAD_MAX_BYTES = int(os.getenv("TYPEAHEAD_MAX_BYTES", str(64 * 1024 * 1024)))
+TYPEAHEAD_DEFAULT_LIMIT = 10
+TYPEAHEAD_MAX_LIMIT = 50
+# Entries examined per field rank and lookup, so one-letter prefixes stay as
+# fast as long ones. Exact terms sort first and every rank is scanned, so
+# exact and code matches are kept; this is lossy only for names and emails,
+# where a short match late in the alphabet can be missed.
+TYPEAHEAD_SCAN_LIMIT = 2000
+
+TYPEAHEAD_COLUMNS = ("employee_id", "emp_code", "first_name", "last_name", "email", "status")
+# Lower ranks sort first when scores tie
+_FIELD_RANKS = {"code": 0, "name": 1, "email": 2}
+
+def normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
+
+def _terms(record: tuple) -> Dict[str, int]:
+    """Searchable terms of one employee and the rank of the field each came from"""
+    _, emp_code, first_name, last_name, email, _ = record
+    first, last = normalize(first_name), normalize(last_name)
+    terms = {}
+    for term, field in (
+        (normalize(email), "email"),
+        (f"{last} {first}".strip(), "name"),
+        (f"{first} {last}".strip(), "name"),
+        (last, "name"),
+        (first, "name"),
+        (normalize(emp_code), "code"),
+    ):
+        if term:
+            terms[term] = min(terms.get(term, 9), _FIELD_RANKS[field])
+    return terms
+
+# A (term, employee_id) tuple plus its slot in the entry list
+_ENTRY_BYTES = sys.getsizeof(("", 0)) + 8
+
+def _record_bytes(record: tuple, terms: Dict[str, int]) -> int:
+    """Estimated memory one employee adds to the index: its record and entries"""
+    size = sys.getsizeof(record) + sum(sys.getsizeof(value) for value in record[1:])
+    return size + sum(_ENTRY_BYTES + sys.getsizeof(term) for term in terms)
+
+def _estimated_bytes(records: List[tuple]) -> int:
+    return sum(_record_bytes(record, _terms(record)) for record in records)
+
+class PrefixIndex:
+    """Sorted (term, employee_id) entries per field rank, searched with bisect.
+
+    Every employee contributes its code, first name, last name, both name
+    orders and email, lowercased. A prefix query is one binary search per
+    rank to the first matching term followed by a short forward scan.
+    """
+
+    def __init__(self, records: Iterable[tuple] = ()):
+        self.records: Dict[int, tuple] = {}
+        self.entries: Dict[int, List[Tuple[str, int]]] = {rank: [] for rank in sorted(set(_FIELD_RANKS.values()))}
+        # Estimated bytes of records and entries, kept up to date by upsert/remove
+        self.size = 0
+        for record in records:
+            terms = _terms(record)
+            self.records[record[0]] = record
+            self.size += _record_bytes(record, terms)
+            for term, rank in terms.items():
+                self.entries[rank].append((term, record[0]))
+        for entries in self.entries.values():
+            entries.sort()
+        self.built_at = time.time()
+        # Shared data version the index reflects; None once it has missed a write
+        self.version: Optional[int] = None
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.entries.values())
+
+    def remove(self, employee_id: int):
+        record = self.records.pop(employee_id, None)
+        if record is None:
+            return
+        terms = _terms(record)
+        self.size -= _record_bytes(record, terms)
+        for term, rank in terms.items():
+            entries = self.entries[rank]
+            i = bisect_left(entries, (term, employee_id))
+            if i < len(entries) and entries[i] == (term, employee_id):
+                del entries[i]
+
+    def upsert(self, record: tuple):
+        self.remove(record[0])
+        terms = _terms(record)
+        self.records[record[0]] = record
+        self.size += _record_bytes(record, terms)
+        for term, rank in terms.items():
+            insort(self.entries[rank], (term, record[0]))
+
+    def search(self, query: str, limit: int = TYPEAHEAD_DEFAULT_LIMIT) -> List[dict]:
+        """Best matches for a prefix: exact terms, then codes, names, emails, shorter terms first"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        best: Dict[int, tuple] = {}
+        for rank, entries in self.entries.items():
+            i = bisect_left(entries, (prefix,))
+            end = min(len(entries), i + TYPEAHEAD_SCAN_LIMIT)
+            while i < end:
+                term, employee_id = entries[i]
+                if not term.startswith(prefix):
+                    break
+                score = (term != prefix, rank, len(term), term)
+                if employee_id not in best or score < best[employee_id]:
+                    best[employee_id] = score
+                i += 1
+        ordered = sorted(best, key=lambda employee_id: best[employee_id])[:limit]
+        return [_as_dict(self.records[employee_id]) for employee_id in ordered]
+
+    def memory_bytes(self) -> int:
+        """Estimated size of the index: containers, entries, term strings and records"""
+        return self.size + sys.getsizeof(self.records) + sum(sys.getsizeof(entries) for entries in self.entries.values())
+
+def _as_dict(record: tuple) -> dict:
+    return dict(zip(TYPEAHEAD_COLUMNS, record))
+
+# Current index; None until built or while over TYPEAHEAD_MAX_BYTES
+_index: Optional[PrefixIndex] = None
+_lock = None
+# Serializes incremental updates so they apply in version order
+_apply_lock = None
+_rebuild_pending = False
+# Background rebuild started by a lookup that found the index stale
+_rebuild_task: Optional[asyncio.Task] = None
+typeahead_stats = {
+    "rebuilds": 0, "stale_rebuilds": 0, "incremental_updates": 0, "lookups": 0, "fallback_lookups": 0,
+    "over_capacity": False,
+}
+
+def _get_lock() -> asyncio.Lock:
+    global _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    return _lock
+
+def _get_apply_lock() -> asyncio.Lock:
+    global _apply_lock
+    if _apply_lock is None:
+        _apply_lock = asyncio.Lock()
+    return _apply_lock
+
+def reset():
+    """Drop loop-bound state (called on startup)"""
+    global _index, _lock, _apply_lock, _rebuild_pending, _rebuild_task
+    _index = None
+    _lock = None
+    _apply_lock = None
+    _rebuild_pending = False
+    _rebuild_task = None
+
+async def _fetch_records(where: str = "", values: Optional[dict] = None) -> List[tuple]:
+    rows = await db.database.fetch_all(
+        f"SELECT {', '.join(TYPEAHEAD_COLUMNS)} FROM Employee{where}", values or {}
+    )
+    return [tuple(row[name] for name in TYPEAHEAD_COLUMNS) for row in rows]
+
+async def build():
+    """Rebuild the index from the Employee table (startup and remote changes).
+
+    Sorting runs in a thread and the finished index replaces the old one in
+    a single assignment, so lookups keep answering during a rebuild. Writes
+    that land meanwhile trigger one more pass.
+    """
+    global _index, _rebuild_pending
+    lock = _get_lock()
+    if lock.locked():
+        _rebuild_pending = True
+        return
+    async with lock:
+        while True:
+            _rebuild_pending = False
+            # Read before the rows, so writes landing in between show up as a version gap
+            version, _ = await db.get_data_version()
+            records = await _fetch_records()
+            if await asyncio.to_thread(_estimated_bytes, records) > TYPEAHEAD_MAX_BYTES:
+                if not typeahead_stats["over_capacity"]:
+                    logger.warning("Typeahead index disabled: more than %d bytes, using SQL lookups", TYPEAHEAD_MAX_BYTES)
+                typeahead_stats["over_capacity"] = True
+                _index = None
+            else:
+                typeahead_stats["over_capacity"] = False
+                index = await asyncio.to_thread(PrefixIndex, records)
+                if _rebuild_pending:
+                    continue
+                index.version = version
+                _index = index
+            typeahead_stats["rebuilds"] += 1
+            if not _rebuild_pending:
+                return
+
+async def apply_change(event: dict):
+    """Keep the index in step with local writes.
+
+    Every write bumps the shared data version by one, so an event that is
+    not the next version means the index missed writes (another worker,
+    or a change that landed during a rebuild). It is then marked stale and
+    the next lookup starts a rebuild, like the read model snapshot.
+    """
+    global _rebuild_pending
+    if event["entity"] == "all":
+        await build()
+        return
+    if _get_lock().locked():
+        # A rebuild is running and may have read the table before this write
+        _rebuild_pending = True
+        return
+    async with _get_apply_lock():
+        index = _index
+        if index is None:
+            # Over capacity; deletions may have brought the table back under the cap
+            rebuild = typeahead_stats["over_capacity"] and event["entity"] == "employee" and event["action"] in ("deleted", "archived")
+        else:
+            rebuild = await _apply_to(index, event)
+    if rebuild:
+        await build()
+
+async def _apply_to(index: PrefixIndex, event: dict) -> bool:
+    """Apply one change event to index; True when it has grown past the cap"""
+    version = hub.known_version
+    if version is None or index.version is None or version != index.version + 1:
+        index.version = None
+        return False
+    if event["entity"] == "employee" and event["ids"]:
+        ids = list(event["ids"])
+        records = []
+        if event["action"] not in ("deleted", "archived"):
+            for chunk in db.chunked(ids):
+                placeholders, values = db.in_clause(chunk)
+                records.extend(await _fetch_records(f" WHERE employee_id IN ({placeholders})", values))
+        if _index is not index:
+            # Replaced by a rebuild while fetching; the new index has its own version
+            return False
+        found = {record[0] for record in records}
+        for employee_id in ids:
+            if employee_id not in found:
+                index.remove(employee_id)
+        for record in records:
+            index.upsert(record)
+        typeahead_stats["incremental_updates"] += 1
+    index.version = version
+    return index.memory_bytes() > TYPEAHEAD_MAX_BYTES
+
+def _like_prefix(text: str) -> str:
+    """LIKE pattern matching text literally at the start (used with ESCAPE '\\')"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+async def _sql_lookup(query: str, limit: int) -> List[dict]:
+    """Fallback when the index is not available (not built yet, stale or over the memory cap)"""
+    rows = await db.database.fetch_all(
+        f"""
+        SELECT {', '.join(TYPEAHEAD_COLUMNS)} FROM Employee
+        WHERE emp_code LIKE :prefix ESCAPE '\\' OR first_name LIKE :prefix ESCAPE '\\'
+            OR last_name LIKE :prefix ESCAPE '\\' OR email LIKE :prefix ESCAPE '\\'
+            OR (first_name || ' ' || last_name) LIKE :prefix ESCAPE '\\'
+        ORDER BY emp_code LIMIT :limit
+        """,
+        {"prefix": _like_prefix(query), "limit": limit}
+    )
+    return [dict(row) for row in rows]
+
+async def _background_build():
+    try:
+        await build()
+    except Exception as e:
+        logger.exception("Typeahead rebuild error: %s", e)
+
+def _start_rebuild():
+    """Rebuild in the background unless a rebuild is already under way"""
+    global _rebuild_task
+    if _rebuild_task is None or _rebuild_task.done():
+        typeahead_stats["stale_rebuilds"] += 1
+        _rebuild_task = asyncio.create_task(_background_build())
+
+async def lookup(query: str, limit: int = TYPEAHEAD_DEFAULT_LIMIT) -> List[dict]:
+    """Top matches for what the user has typed so far"""
+    limit = max(1, min(limit, TYPEAHEAD_MAX_LIMIT))
+    index = _index
+    if index is not None:
+        # One primary-key read on SharedState catches writes this worker never
+        # heard about (other workers publish no event here without SSE clients)
+        version, _ = await db.get_data_version()
+        if index.version is not None and index.version >= version:
+            typeahead_stats["lookups"] += 1
+            return index.search(query, limit)
+        # Stale: the lookup never waits for the rebuild, SQL answers meanwhile
+        _start_rebuild()
+    query = normalize(query)
+    if not query:
+        return []
+    typeahead_stats["fallback_lookups"] += 1
+    return await _sql_lookup(query, limit)
+
+def get_typeahead_stats() -> dict:
+    index = _index
+    return {
+        **typeahead_stats,
+        "max_bytes": TYPEAHEAD_MAX_BYTES,
+        "employees": len(index.records) if index else 0,
+        "entries": len(index) if index else 0,
+        "memory_bytes": index.memory_bytes() if index else 0,
+        "age_seconds": round(time.time() - index.built_at, 1) if index else None,
+        "version": index.version if index else None,
+    }
+
+hub.add_listener(apply_change)
@@ -0,0 +1,72 @@
+"""Microbenchmarks for the authentication dependency.
+
+Run from the project root:
+
+    python -m benchmarks.auth_bench
+"""
+import asyncio
+import os
+import tempfile
+import time
+import timeit
+
+# Use a throwaway database so the benchmark never touches real data
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/bench.db"
+
+from jose import jwt
+from starlette.requests import Request
+
+import app.db as db
+from app import auth
+from app.schemas import TokenData
+
+ITERATIONS = 20000
+
+
+def make_request(token: str) -> Request:
+    """Build a bare ASGI request carrying the access_token cookie"""
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/home",
+        "headers": [(b"cookie", f"access_token={token}".encode())],
+    }
+    return Request(scope)
+
+
+def bench_decode(token: str):
+    def uncached():
+        payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+        TokenData(username=payload.get("sub"))
+
+    def cached():
+        auth.decode_token(token)
+
+    for name, fn in (("jwt.decode + TokenData", uncached), ("decode_token (cached)", cached)):
+        seconds = timeit.timeit(fn, number=ITERATIONS)
+        print(f"{name:<28} {seconds / ITERATIONS * 1e6:8.2f} us/call")
+
+
+async def bench_dependency(token: str):
+    await db.connect_db()
+    try:
+        request = make_request(token)
+        start = time.perf_counter()
+        for _ in range(ITERATIONS // 10):
+            await auth.get_current_user(request)
+        seconds = time.perf_counter() - start
+        print(f"{'get_current_user':<28} {seconds / (ITERATIONS // 10) * 1e6:8.2f} us/call")
+    finally:
+        await db.disconnect_db()
+
+
+def main():
+    token = auth.create_token_response("admin").access_token
+    bench_decode(token)
+    asyncio.run(bench_dependency(token))
+    print("token cache:", auth.get_token_cache_stats())
+
+
+if __name__ == "__main__":
+    main()
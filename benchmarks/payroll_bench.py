@@ -0,0 +1,56 @@
+"""Benchmark for the vectorized payroll projection.
+
+Run from the project root:
+
+    python -m benchmarks.payroll_bench [employees]
+"""
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.payroll import PayrollFrame, project
+
+EMPLOYEES = 1_000_000
+MONTHS = 12
+
+
+def synthetic_columns(n: int):
+    """Column lists shaped like rows read from SQLite (ISO date strings, None for blanks)"""
+    rng = np.random.default_rng(42)
+    origin = date(2015, 1, 1)
+    start_offsets = rng.integers(0, 365 * 10, n)
+    tenure = rng.integers(30, 365 * 8, n)
+    leaves = rng.random(n) < 0.3
+
+    salary = rng.uniform(15000, 120000, n).round(2).tolist()
+    start_date = [(origin + timedelta(days=int(d))).isoformat() for d in start_offsets]
+    leave_date = [
+        (origin + timedelta(days=int(s + t))).isoformat() if left else None
+        for s, t, left in zip(start_offsets, tenure, leaves)
+    ]
+    employment = rng.choice(["full-time", "part-time", "contract", "intern"], n).tolist()
+    return salary, start_date, leave_date, employment
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else EMPLOYEES
+    columns = synthetic_columns(n)
+
+    start = time.perf_counter()
+    frame = PayrollFrame.from_columns(*columns)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = project(frame, date(2024, 1, 1), MONTHS)
+    project_seconds = time.perf_counter() - start
+
+    print(f"employees:           {n:,}")
+    print(f"columns -> arrays:   {load_seconds * 1000:8.1f} ms")
+    print(f"{MONTHS}-month projection: {project_seconds * 1000:8.1f} ms")
+    print(f"total projected:     {result['total_cost']:,.2f}")
+
+
+if __name__ == "__main__":
+    main()
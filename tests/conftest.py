@@ -0,0 +1,91 @@
+"""Shared fixtures: a throwaway SQLite database and a logged-in admin client.
+
+The environment is set before app.main is imported, so every module reads
+the test configuration (load_dotenv never overrides variables already set).
+"""
+import os
+import shutil
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix="ems-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{TEST_DIR}/test.db",
+    "JOBS_DIR": os.path.join(TEST_DIR, "jobs"),
+    "ANALYTICS_DIR": os.path.join(TEST_DIR, "analytics"),
+    "PHOTOS_DIR": os.path.join(TEST_DIR, "photos"),
+    "MAINTENANCE_BACKUP_DIR": os.path.join(TEST_DIR, "backups"),
+    # Background schedulers stay off; tests run the passes they need by hand
+    "TRANSITIONS_ENABLED": "0",
+    "ARCHIVE_INTERVAL_HOURS": "0",
+    "ANALYTICS_INTERVAL_MINUTES": "0",
+    "MAINTENANCE_INTERVAL_HOURS": "0",
+    "LOOP_MONITOR_ENABLED": "0",
+    "BCRYPT_ROUNDS": "4",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+import app.db as db
+from app.events import notify_change
+from app.main import app
+
+# Tables emptied before every test; users and shared state are kept
+DATA_TABLES = (
+    "Employee", "EmployeeArchive", "Log", "LogSubject", "AnalyticsTombstone",
+    "EmployeeBlockKey", "DuplicateCandidate",
+)
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        response = test_client.post(
+            "/login", data={"username": "admin", "password": "admin123"}, follow_redirects=False
+        )
+        test_client.cookies.set("access_token", response.cookies.get("access_token"))
+        yield test_client
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+@pytest.fixture
+def call(client):
+    """Run a coroutine function on the app's event loop"""
+    return client.portal.call
+
+async def _clear_tables():
+    for table in DATA_TABLES:
+        await db.database.execute(f"DELETE FROM {table}")
+    # Bumps the data version, so cached reports and indexes are rebuilt
+    await notify_change("all", "refresh")
+
+@pytest.fixture(autouse=True)
+def clean_tables(call):
+    call(_clear_tables)
+
+async def _insert_employee(fields: dict) -> int:
+    values = {
+        "emp_code": fields.pop("emp_code"),
+        "first_name": "Test",
+        "last_name": "Employee",
+        "created_at": "2020-01-01 00:00:00",
+        "updated_at": "2020-01-01 00:00:00",
+        **fields,
+    }
+    columns = ", ".join(values)
+    placeholders = ", ".join(f":{name}" for name in values)
+    employee_id = await db.database.execute(f"INSERT INTO Employee ({columns}) VALUES ({placeholders})", values)
+    await notify_change("employee", "created", [employee_id])
+    return employee_id
+
+@pytest.fixture
+def add_employee(call):
+    """Insert an Employee row directly (no audit entry) and return its id"""
+    def add(emp_code: str, **fields) -> int:
+        return call(_insert_employee, {"emp_code": emp_code, **fields})
+    return add
+
+@pytest.fixture
+def fetch_one(call):
+    """A single row as a dict, or None"""
+    def fetch(query: str, values: dict = None):
+        row = call(db.database.fetch_one, query, values or {})
+        return dict(row._mapping) if row else None
+    return fetch
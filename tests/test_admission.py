@@ -0,0 +1,88 @@
+"""Admission control per route class (app/admission.py)"""
+import asyncio
+import app.admission as admission
+from app.admission import RouteClassLimiter, classify
+
+def test_classify():
+    assert classify("POST", "/login") == "auth"
+    assert classify("POST", "/users/3/reset-password") == "auth"
+    assert classify("POST", "/employees/3/update") == "write"
+    assert classify("GET", "/employees") == "render"
+    assert classify("GET", "/api/reports/headcount") == "render"
+    assert classify("GET", "/employees/3") is None
+    assert classify("GET", "/health") is None
+
+async def _fifo_handoff(order: list):
+    limiter = RouteClassLimiter("test", 1, 5, 1.0)
+    assert await limiter.acquire()
+
+    async def worker(name: str):
+        assert await limiter.acquire()
+        order.append(name)
+        await asyncio.sleep(0)
+        limiter.release()
+
+    tasks = [asyncio.ensure_future(worker(name)) for name in ("first", "second", "third")]
+    await asyncio.sleep(0)
+    queued = len(limiter._waiters)
+    limiter.release()
+    await asyncio.gather(*tasks)
+    return queued, limiter.stats()
+
+def test_waiters_are_admitted_in_order(client, call):
+    order = []
+    queued, stats = call(_fifo_handoff, order)
+    assert queued == 3
+    assert order == ["first", "second", "third"]
+    assert stats["active"] == 0 and stats["admitted"] == 4 and stats["max_queue_depth"] == 3
+
+async def _overflow():
+    limiter = RouteClassLimiter("test", 1, 1, 0.05)
+    assert await limiter.acquire()
+    waiting = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    # The queue holds one request, so the next is shed at once
+    full = await limiter.acquire()
+    timed_out = await waiting
+    return full, timed_out, limiter.stats()
+
+def test_full_queue_and_deadline_shed_requests(client, call):
+    full, timed_out, stats = call(_overflow)
+    assert full is False and timed_out is False
+    assert stats["rejected_queue_full"] == 1 and stats["rejected_timeout"] == 1
+    assert stats["active"] == 1 and stats["queued"] == 0
+
+async def _cancel_after_handoff():
+    limiter = RouteClassLimiter("test", 1, 5, 1.0)
+    assert await limiter.acquire()
+    waiting = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    # Hand the slot over, then cancel the waiter before it runs
+    limiter.release()
+    waiting.cancel()
+    try:
+        # Some Python versions still admit a waiter whose slot was already handed over
+        if await waiting:
+            limiter.release()
+    except asyncio.CancelledError:
+        pass
+    return limiter.stats()
+
+def test_cancelled_waiter_gives_its_slot_back(client, call):
+    stats = call(_cancel_after_handoff)
+    assert stats["active"] == 0 and stats["queued"] == 0
+
+def test_busy_route_class_gets_a_fast_503(client, monkeypatch):
+    monkeypatch.setitem(admission.limiters, "render", RouteClassLimiter("render", 0, 0, 0.1))
+
+    response = client.get("/api/employees")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(admission.ADMISSION_RETRY_AFTER)
+    assert "render" in response.json()["detail"]
+
+    page = client.get("/employees", headers={"Accept": "text/html"})
+    assert page.status_code == 503 and "Server busy" in page.text
+
+    # Cheap routes and other classes are not affected
+    assert client.get("/health").status_code == 200
+    assert client.get("/api/admin/stats").json()["admission"]["render"]["rejected_queue_full"] == 2
@@ -0,0 +1,75 @@
+"""Incremental Parquet export (app/analytics.py)"""
+import os
+import shutil
+import pyarrow.parquet as pq
+import pytest
+import app.db as db
+from app import analytics, transitions
+
+async def _reset_state():
+    await db.database.execute(
+        "DELETE FROM SharedState WHERE key LIKE :prefix", {"prefix": analytics.ANALYTICS_STATE_PREFIX + "%"}
+    )
+
+@pytest.fixture(autouse=True)
+def fresh_export(call, monkeypatch):
+    call(_reset_state)
+    shutil.rmtree(analytics.ANALYTICS_DIR, ignore_errors=True)
+    # Rows written during the test count as settled
+    monkeypatch.setattr(analytics, "ANALYTICS_SETTLE_SECONDS", 0)
+
+def read_file(dataset: str, name: str) -> list:
+    return pq.read_table(os.path.join(analytics.dataset_dir(dataset), name)).to_pylist()
+
+def test_export_writes_only_rows_past_the_watermark(call, add_employee):
+    add_employee("A1")
+    add_employee("A2")
+    first = call(analytics.export_employee_changes)
+    assert first["rows"] == 2
+    assert [row["emp_code"] for row in read_file("employees", first["file"])] == ["A1", "A2"]
+
+    assert call(analytics.export_employee_changes) == {"rows": 0, "file": None}
+    add_employee("A3")
+    assert [row["emp_code"] for row in read_file("employees", call(analytics.export_employee_changes)["file"])] == ["A3"]
+
+def test_deleted_employees_are_exported_as_tombstones(client, call, add_employee):
+    employee_id = add_employee("A1")
+    call(analytics.export_employee_changes)
+    assert client.post("/api/employees/bulk-delete", json={"ids": [employee_id]}).status_code == 200
+
+    rows = read_file("employees", call(analytics.export_employee_changes)["file"])
+    assert [(row["employee_id"], row["_deleted"]) for row in rows] == [(employee_id, True)]
+
+def test_compaction_replaces_the_deltas_with_one_base_file(client, call, add_employee):
+    keep = add_employee("A1")
+    gone = add_employee("A2")
+    call(analytics.export_employee_changes)
+    client.post("/api/employees/bulk-delete", json={"ids": [gone]})
+    call(analytics.export_employee_changes)
+
+    result = call(analytics.compact_employees)
+    assert result["replaced"] == 2
+    assert [row["employee_id"] for row in read_file("employees", result["file"])] == [keep]
+    assert call(analytics.get_state, "employees")["files"] == [result["file"]]
+    assert sorted(os.listdir(analytics.dataset_dir("employees"))) == sorted([result["file"], "manifest.json"])
+    assert call(db.database.fetch_val, "SELECT COUNT(*) FROM AnalyticsTombstone") == 0
+
+def test_log_compaction_keeps_every_row(client, call, add_employee):
+    employee_id = add_employee("A1")
+    client.post("/api/employees/bulk-update", json={"ids": [employee_id], "patch": {"status": "inactive"}})
+    call(analytics.export_log_changes)
+    client.post("/api/employees/bulk-update", json={"ids": [employee_id], "patch": {"status": "active"}})
+    call(analytics.export_log_changes)
+
+    result = call(analytics.compact_logs)
+    assert [row["action"] for row in read_file("logs", result["file"])] == ["EMPLOYEE_BULK_UPDATED"] * 2
+
+def test_photo_removal_and_status_repair_reach_the_next_delta(client, call, add_employee):
+    photo = add_employee("A1", photo_hash="0" * 64)
+    repaired = add_employee("A2", status="Resigned")
+    call(analytics.export_employee_changes)
+
+    assert client.post(f"/employees/{photo}/photo/delete", follow_redirects=False).status_code == 303
+    call(transitions.repair_leaver_statuses)
+    rows = read_file("employees", call(analytics.export_employee_changes)["file"])
+    assert {row["employee_id"]: row["photo_hash"] for row in rows} == {photo: None, repaired: None}
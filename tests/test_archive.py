@@ -0,0 +1,104 @@
+"""Archiving departed employees and re-hiring them (app/archive.py)"""
+from datetime import date, timedelta
+from urllib.parse import unquote_plus
+import pytest
+import app.db as db
+from app import archive
+
+def archive_now(call):
+    return call(archive.archive_departed)
+
+def long_gone() -> str:
+    return (archive.archive_cutoff() - timedelta(days=1)).isoformat()
+
+def test_moves_only_employees_who_left_before_the_cutoff(call, add_employee, fetch_one):
+    gone = add_employee("R1", start_date="2010-01-01", leave_date=long_gone())
+    recent = add_employee("R2", start_date="2010-01-01", leave_date=archive.archive_cutoff().isoformat())
+    add_employee("R3", start_date="2010-01-01")
+
+    assert archive_now(call)["archived"] == 1
+    assert fetch_one("SELECT employee_id FROM EmployeeArchive") == {"employee_id": gone}
+    assert fetch_one("SELECT 1 AS hot FROM Employee WHERE employee_id = :id", {"id": gone}) is None
+    assert fetch_one("SELECT 1 AS hot FROM Employee WHERE employee_id = :id", {"id": recent}) == {"hot": 1}
+    log = fetch_one("SELECT details FROM Log WHERE action = 'EMPLOYEE_ARCHIVED'")
+    assert '"codes":["R1"]' in log["details"]
+
+def test_archiving_records_an_analytics_tombstone(call, add_employee, fetch_one):
+    employee_id = add_employee("R1", leave_date=long_gone())
+    archive_now(call)
+    assert fetch_one("SELECT employee_id FROM AnalyticsTombstone") == {"employee_id": employee_id}
+
+def test_rehire_starts_a_new_period_and_keeps_the_old_one(client, call, add_employee, fetch_one):
+    employee_id = add_employee("R1", start_date="2015-01-01", leave_date="2018-06-30", salary=1000)
+    archive_now(call)
+
+    response = client.post(f"/api/employees/archive/{employee_id}/restore", params={"start_date": "2021-03-01"})
+    assert response.status_code == 200
+    assert response.json()["start_date"] == "2021-03-01"
+
+    hot = fetch_one(
+        "SELECT emp_code, start_date, leave_date, employment_status, salary FROM Employee WHERE employee_id = :id",
+        {"id": employee_id}
+    )
+    assert hot == {"emp_code": "R1", "start_date": "2021-03-01", "leave_date": None, "employment_status": None, "salary": 1000}
+    old = fetch_one("SELECT start_date, leave_date FROM EmployeeArchive WHERE employee_id = :id", {"id": employee_id})
+    assert old == {"start_date": "2015-01-01", "leave_date": "2018-06-30"}
+    # The pending tombstone would otherwise delete the new row from analytics
+    assert fetch_one("SELECT COUNT(*) AS n FROM AnalyticsTombstone")["n"] == 0
+
+    event = client.get(f"/api/employees/{employee_id}/history").json()["events"][0]
+    assert event["action"] == "EMPLOYEE_RESTORED"
+    assert event["details"]["previous_leave_date"] == "2018-06-30"
+
+def test_rehire_must_start_after_the_previous_leave_date(client, call, add_employee):
+    employee_id = add_employee("R1", start_date="2015-01-01", leave_date="2018-06-30")
+    archive_now(call)
+    response = client.post(f"/api/employees/archive/{employee_id}/restore", params={"start_date": "2018-06-30"})
+    assert response.status_code == 400
+
+def test_rehire_of_an_employed_or_unknown_employee(client, call, add_employee):
+    employee_id = add_employee("R1", start_date="2015-01-01", leave_date="2018-06-30")
+    archive_now(call)
+    assert client.post(f"/api/employees/archive/{employee_id}/restore").status_code == 200
+    assert client.post(f"/api/employees/archive/{employee_id}/restore").status_code == 400
+    assert client.post("/api/employees/archive/9999/restore").status_code == 404
+
+async def _set_leave_date(employee_id: int, leave_date: str):
+    await db.database.execute(
+        "UPDATE Employee SET leave_date = :leave_date WHERE employee_id = :id", {"leave_date": leave_date, "id": employee_id}
+    )
+
+def test_second_departure_archives_a_second_period(call, add_employee, fetch_one):
+    employee_id = add_employee("R1", start_date="2010-01-01", leave_date="2012-12-31")
+    archive_now(call)
+    call(archive.restore_employee, employee_id, None, date(2013, 6, 1))
+    with pytest.raises(ValueError):
+        call(archive.restore_employee, employee_id, None, date(2014, 1, 1))
+
+    call(_set_leave_date, employee_id, long_gone())
+    archive_now(call)
+    periods = fetch_one(
+        "SELECT COUNT(*) AS n, MAX(start_date) AS latest FROM EmployeeArchive WHERE employee_id = :id", {"id": employee_id}
+    )
+    assert periods == {"n": 2, "latest": "2013-06-01"}
+    assert call(archive.find_archived, employee_id)["start_date"] == "2013-06-01"
+
+def test_search_finds_archived_employees_by_name(client, call, add_employee):
+    add_employee("R1", first_name="Somchai", last_name="Jaidee", leave_date=long_gone())
+    add_employee("R2", first_name="Other", last_name="Person", leave_date=long_gone())
+    archive_now(call)
+    found = client.get("/api/employees/archive", params={"q": "somchai"}).json()
+    assert [row["emp_code"] for row in found["employees"]] == ["R1"]
+
+def test_rehire_under_a_new_code_is_flagged_as_a_duplicate(client, call, add_employee):
+    add_employee("R1", first_name="Somchai", last_name="Jaidee", thai_id_or_passport="1-2345-67890-12-1", leave_date=long_gone())
+    archive_now(call)
+
+    response = client.post("/employees", data={
+        "emp_code": "R9", "first_name": "Somchai", "last_name": "Jaidee",
+        "thai_id_or_passport": "1234567890121", "start_date": "2024-01-02",
+    }, follow_redirects=False)
+    assert response.status_code == 303
+    assert "Possible duplicate of R1 (archived)" in unquote_plus(response.headers["location"])
+    pair = client.get("/api/employees/duplicates").json()["duplicates"][0]
+    assert {pair["employee"]["emp_code"], pair["duplicate"]["emp_code"]} == {"R1", "R9"}
@@ -0,0 +1,90 @@
+"""Structured audit log (app/audit.py)"""
+from datetime import date
+import app.db as db
+from app import audit
+
+def test_parse_legacy_single_employee_row():
+    parsed = audit.parse_legacy("EMPLOYEE_UPDATED", "Employee EMP000001 (Jon Doe) updated")
+    assert parsed == {
+        "entity_type": "employee", "emp_code": "EMP000001", "changed_fields": None, "details": {"name": "Jon Doe"},
+    }
+
+def test_parse_legacy_keeps_unknown_text_as_message():
+    assert audit.parse_legacy("LOGIN_WEIRD", "free text")["details"] == {"message": "free text"}
+    assert audit.parse_legacy("EMPLOYEE_CREATED", "")["details"] == {}
+
+def test_changed_fields_ignores_formatting_differences():
+    stored = {"first_name": "Jon", "salary": 2000.0, "start_date": "2020-01-01", "email": None}
+    after = {"first_name": "Jon ", "salary": "2000", "start_date": date(2020, 1, 1), "email": ""}
+    assert audit.changed_fields(stored, after) == []
+    assert audit.changed_fields(stored, {"salary": "2500", "start_date": date(2020, 1, 2)}) == ["salary", "start_date"]
+
+def test_update_records_only_the_changed_fields(client, add_employee):
+    employee_id = add_employee("A1", first_name="Jon", last_name="Doe", start_date="2020-01-01")
+    form = {"emp_code": "A1", "first_name": "Jon", "last_name": "Doe", "start_date": "2020-01-01"}
+    client.post(f"/employees/{employee_id}/update", data={**form, "salary": "2000"}, follow_redirects=False)
+
+    events = client.get(f"/api/employees/{employee_id}/history").json()["events"]
+    assert [event["action"] for event in events] == ["EMPLOYEE_UPDATED"]
+    assert events[0]["changed_fields"] == ["salary"]
+    assert events[0]["username"] == "admin"
+
+def test_history_of_a_deleted_employee_is_found_by_code(client, add_employee):
+    employee_id = add_employee("A1")
+    client.post(f"/employees/{employee_id}/delete", follow_redirects=False)
+    events = client.get("/api/employees/history", params={"emp_code": "A1"}).json()["events"]
+    assert [event["action"] for event in events] == ["EMPLOYEE_DELETED"]
+
+def audit_history(client, employee_id, **params):
+    return client.get(f"/api/employees/{employee_id}/history", params=params).json()["events"]
+
+async def _log_updates(employee_id: int, count: int):
+    for salary in range(count):
+        await audit.log_event(
+            "EMPLOYEE_UPDATED", entity_id=employee_id, emp_code="A1", changed_fields=["salary"], salary=salary
+        )
+
+def test_history_pages_back_with_before(client, call, add_employee):
+    employee_id = add_employee("A1")
+    call(_log_updates, employee_id, 3)
+    newest, middle, oldest = [event["log_id"] for event in audit_history(client, employee_id)]
+    assert [event["log_id"] for event in audit_history(client, employee_id, before=middle)] == [oldest]
+    assert [event["details"]["salary"] for event in audit_history(client, employee_id, limit=1)] == [2]
+
+async def _insert_legacy_rows(rows):
+    await db.database.execute_many("INSERT INTO Log (user_id, action, details) VALUES (1, :action, :details)", rows)
+
+def test_migrate_legacy_rows_links_them_to_current_employees(client, call, add_employee):
+    employee_id = add_employee("EMP000001")
+    call(_insert_legacy_rows, [
+        {"action": "EMPLOYEE_UPDATED", "details": "Employee EMP000001 (Jon Doe) updated"},
+        {"action": "EMPLOYEE_DELETED", "details": "Employee EMP000777 (Gone Guy) deleted"},
+    ])
+    assert call(audit.migrate_legacy_rows) == 2
+    # Every row now has an entity_type, so a rerun finds nothing
+    assert call(audit.migrate_legacy_rows) == 0
+
+    actions = [event["action"] for event in audit_history(client, employee_id)]
+    assert actions == ["EMPLOYEE_UPDATED"]
+    deleted = client.get("/api/employees/history", params={"emp_code": "EMP000777"}).json()["events"]
+    assert deleted[0]["entity_id"] is None
+    assert deleted[0]["details"] == {"name": "Gone Guy"}
+
+def test_migration_does_not_link_rows_older_than_a_reused_code(client, call, add_employee):
+    employee_id = add_employee("EMP000001", created_at="2024-06-01 09:00:00.123456")
+    call(db.database.execute_many, "INSERT INTO Log (user_id, action, details, timestamp) VALUES (1, :action, :details, :timestamp)", [
+        # Written by an earlier, deleted holder of the code
+        {"action": "EMPLOYEE_UPDATED", "details": "Employee EMP000001 (Old Holder) updated", "timestamp": "2023-01-01 00:00:00"},
+        # Same second as the create, without microseconds
+        {"action": "EMPLOYEE_CREATED", "details": "Employee EMP000001 (Jon Doe) created", "timestamp": "2024-06-01 09:00:00"},
+    ])
+    call(audit.migrate_legacy_rows)
+    assert [event["details"]["name"] for event in audit_history(client, employee_id)] == ["Jon Doe"]
+    by_code = client.get("/api/employees/history", params={"emp_code": "EMP000001"}).json()["events"]
+    assert {event["details"]["name"]: event["entity_id"] for event in by_code} == {"Jon Doe": employee_id, "Old Holder": None}
+
+def test_only_formats_the_app_wrote_are_parsed():
+    assert audit.parse_legacy("USER_CREATED", "Admin admin created new user jane")["details"] == {"username": "jane"}
+    bulk = audit.parse_legacy("EMPLOYEE_BULK_UPDATED", "Bulk update of 3 employees (status)")
+    assert bulk["changed_fields"] is None
+    assert bulk["details"] == {"message": "Bulk update of 3 employees (status)"}
@@ -0,0 +1,57 @@
+"""POST /api/employees/bulk-update"""
+
+def bulk_update(client, ids, patch):
+    return client.post("/api/employees/bulk-update", json={"ids": ids, "patch": patch})
+
+def statuses(response):
+    return {item["employee_id"]: item["status"] for item in response.json()["results"]}
+
+def test_updates_existing_and_reports_missing(client, add_employee, fetch_one):
+    first = add_employee("B1")
+    second = add_employee("B2")
+    response = bulk_update(client, [first, second, 9999], {"employment": " Part-Time ", "salary": 1500})
+    assert response.status_code == 200
+    assert response.json()["affected"] == 2
+    assert statuses(response) == {first: "updated", second: "updated", 9999: "not_found"}
+    row = fetch_one("SELECT employment, salary FROM Employee WHERE employee_id = :id", {"id": first})
+    assert row == {"employment": "part-time", "salary": 1500}
+
+def test_writes_one_audit_entry_with_a_subject_per_employee(client, add_employee, fetch_one):
+    ids = [add_employee(f"B{i}") for i in range(3)]
+    bulk_update(client, ids, {"status": "married"})
+    log = fetch_one("SELECT log_id, changed_fields FROM Log WHERE action = 'EMPLOYEE_BULK_UPDATED'")
+    assert log["changed_fields"] == "status"
+    subjects = fetch_one("SELECT COUNT(*) AS n FROM LogSubject WHERE log_id = :log_id", {"log_id": log["log_id"]})
+    assert subjects["n"] == 3
+    history = client.get(f"/api/employees/{ids[1]}/history").json()
+    assert [event["action"] for event in history["events"]] == ["EMPLOYEE_BULK_UPDATED"]
+
+def test_blank_required_names_are_rejected(client, add_employee, fetch_one):
+    employee_id = add_employee("B1")
+    for patch in ({"first_name": "  "}, {"last_name": None}):
+        response = bulk_update(client, [employee_id], patch)
+        assert response.status_code == 400
+    assert fetch_one("SELECT first_name FROM Employee")["first_name"] == "Test"
+
+def test_emp_code_and_empty_patches_are_rejected(client, add_employee):
+    employee_id = add_employee("B1")
+    assert bulk_update(client, [employee_id], {"emp_code": "B9"}).status_code == 400
+    assert bulk_update(client, [employee_id], {}).status_code == 400
+    assert bulk_update(client, [], {"status": "single"}).status_code == 400
+
+def test_leave_date_before_stored_start_date_is_skipped(client, add_employee, fetch_one):
+    early = add_employee("B1", start_date="2020-01-01")
+    late = add_employee("B2", start_date="2024-06-01")
+    response = bulk_update(client, [early, late], {"leave_date": "2023-12-31"})
+    assert statuses(response) == {early: "updated", late: "invalid_dates"}
+    assert fetch_one("SELECT leave_date FROM Employee WHERE employee_id = :id", {"id": late})["leave_date"] is None
+
+def test_start_date_after_stored_leave_date_is_skipped(client, add_employee):
+    employee_id = add_employee("B1", start_date="2020-01-01", leave_date="2021-01-01")
+    response = bulk_update(client, [employee_id], {"start_date": "2022-01-01"})
+    assert statuses(response) == {employee_id: "invalid_dates"}
+
+def test_patch_with_both_dates_out_of_order_is_rejected(client, add_employee):
+    employee_id = add_employee("B1")
+    response = bulk_update(client, [employee_id], {"start_date": "2022-01-01", "leave_date": "2021-01-01"})
+    assert response.status_code == 400
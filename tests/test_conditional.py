@@ -0,0 +1,51 @@
+"""ETag / Last-Modified revalidation (app/conditional.py)"""
+import app.db as db
+import app.routes.employees as employee_routes
+from app import events
+
+def test_unchanged_data_revalidates_with_304(client, add_employee):
+    add_employee("C1")
+    first = client.get("/api/employees")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    again = client.get("/api/employees", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+def test_a_write_changes_the_etag(client, add_employee):
+    employee_id = add_employee("C1")
+    etag = client.get("/api/employees").headers["etag"]
+    client.post("/api/employees/bulk-update", json={"ids": [employee_id], "patch": {"salary": 100}})
+
+    response = client.get("/api/employees", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()[0]["salary"] == 100
+
+def test_etags_differ_per_url(client):
+    assert client.get("/api/employees").headers["etag"] != client.get("/api/employees/count").headers["etag"]
+
+def test_if_modified_since(client, add_employee):
+    add_employee("C1")
+    last_modified = client.get("/api/employees").headers["last-modified"]
+    assert client.get("/api/employees", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/api/employees", headers={"If-Modified-Since": "Thu, 01 Jan 1970 00:00:00 GMT"}).status_code == 200
+
+def test_the_version_moves_when_the_write_commits(client, call, add_employee, monkeypatch):
+    employee_id = add_employee("C1")
+    before, _ = call(db.get_data_version)
+    seen = []
+
+    async def notify(entity, action, ids=(), version=None):
+        # Right after the commit, before anything else runs
+        seen.append((await db.get_data_version())[0])
+        await events.notify_change(entity, action, ids, version)
+
+    monkeypatch.setattr(employee_routes, "notify_change", notify)
+    client.post("/api/employees/bulk-update", json={"ids": [employee_id], "patch": {"salary": 100}})
+    assert seen == [before + 1]
+    # One bump per write, so listeners can still spot missed writes by a gap
+    assert call(db.get_data_version)[0] == before + 1
@@ -0,0 +1,69 @@
+"""Duplicate detection (app/dedupe.py)"""
+import asyncio
+from datetime import datetime
+import app.db as db
+from app import dedupe
+from app.events import notify_change
+
+def pairs(call) -> set:
+    return {
+        frozenset((pair["employee"]["emp_code"], pair["duplicate"]["emp_code"]))
+        for pair in call(dedupe.fetch_duplicates)
+    }
+
+def test_normalizers():
+    assert dedupe.normalize_id("1-2345 67890-12-1") == "1234567890121"
+    assert dedupe.normalize_email(" Jon.Doe+hr@Example.com ") == "jon.doe@example.com"
+    assert dedupe.normalize_phone("+66 81 234 5678") == dedupe.normalize_phone("081-234-5678")
+    assert dedupe.soundex("Robert") == dedupe.soundex("Rupert") == "R163"
+
+def test_new_employees_are_scored_against_their_blocks(call, add_employee):
+    add_employee("D1", first_name="Somchai", last_name="Jaidee", email="som@example.com")
+    add_employee("D2", first_name="Somchai", last_name="Jaidee", email="SOM+work@example.com")
+    add_employee("D3", first_name="Anna", last_name="Lee", email="anna@example.com")
+    assert pairs(call) == {frozenset(("D1", "D2"))}
+    reasons = call(dedupe.fetch_duplicates)[0]["reasons"]
+    assert set(reasons) == {"email", "name"}
+
+def test_rebuild_finds_the_same_pairs(call, add_employee):
+    add_employee("D1", thai_id_or_passport="1234567890121")
+    add_employee("D2", thai_id_or_passport="1-2345-67890-12-1")
+    before = pairs(call)
+    stats = call(dedupe.rebuild_index)
+    assert stats["duplicates"] == 1
+    assert pairs(call) == before == {frozenset(("D1", "D2"))}
+
+async def _create_duplicate():
+    employee_id = await db.database.execute(
+        """
+        INSERT INTO Employee (emp_code, first_name, last_name, thai_id_or_passport, created_at, updated_at)
+        VALUES ('D3', 'Test', 'Employee', '1234567890121', :now, :now)
+        """,
+        {"now": datetime.utcnow()}
+    )
+    await notify_change("employee", "created", [employee_id])
+
+async def _delete(employee_id: int):
+    await db.database.execute("DELETE FROM Employee WHERE employee_id = :id", {"id": employee_id})
+    await notify_change("employee", "deleted", [employee_id])
+
+async def _rebuild_with_writes(monkeypatch, *writes):
+    """Run rebuild_index with the writes landing while it scores in its thread"""
+    loop = asyncio.get_running_loop()
+    score_blocks = dedupe._score_blocks
+
+    def scoring(records):
+        for write in writes:
+            asyncio.run_coroutine_threadsafe(write(), loop).result()
+        return score_blocks(records)
+
+    monkeypatch.setattr(dedupe, "_score_blocks", scoring)
+    return await dedupe.rebuild_index()
+
+def test_rebuild_keeps_writes_made_while_it_scores(call, add_employee, monkeypatch):
+    add_employee("D1", thai_id_or_passport="1234567890121")
+    gone = add_employee("D2", thai_id_or_passport="1-2345-67890-12-1")
+    stats = call(_rebuild_with_writes, monkeypatch, _create_duplicate, lambda: _delete(gone))
+    assert stats["reindexed"] == 1
+    assert pairs(call) == {frozenset(("D1", "D3"))}
+    assert call(db.database.fetch_val, "SELECT COUNT(*) FROM EmployeeBlockKey WHERE employee_id = :id", {"id": gone}) == 0
@@ -0,0 +1,82 @@
+"""Change hub and the /events stream (app/events.py, app/routes/events.py)"""
+import asyncio
+import json
+import app.routes.events as events_route
+from app.events import ChangeHub, hub
+
+def decode(encoded: str) -> dict:
+    return json.loads(encoded.split("data: ", 1)[1])
+
+async def _publish(hub_: ChangeHub, *events):
+    for entity, action, ids in events:
+        await hub_.publish(entity, action, ids)
+
+def test_events_are_encoded_once_and_filtered_by_entity(call):
+    local = ChangeHub(history=10)
+    call(_publish, local, ("employee", "created", [1]), ("user", "updated", [2]))
+    encoded, cursor, missed = local.events_after(0, {"employee"})
+    assert (cursor, missed) == (2, False)
+    assert [decode(text) for text in encoded] == [{"id": 1, "entity": "employee", "action": "created", "ids": [1]}]
+    assert encoded[0].startswith("id: 1\nevent: change\n")
+    assert local.events_after(2) == ([], 2, False)
+
+def test_cursors_older_than_the_buffer_are_reported_as_missed(call):
+    local = ChangeHub(history=2)
+    call(_publish, local, *[("employee", "updated", [n]) for n in range(4)])
+    encoded, _, missed = local.events_after(1)
+    assert missed
+    assert [decode(text)["ids"] for text in encoded] == [[2], [3]]
+    assert local.events_after(2)[2] is False
+
+async def _wait_for_publish(local: ChangeHub):
+    waiter = asyncio.ensure_future(local.wait(local.last_id, 5))
+    await asyncio.sleep(0)
+    await local.publish("employee", "updated", [1])
+    return await waiter, await local.wait(local.last_id, 0.01)
+
+def test_wait_wakes_on_publish_and_times_out_otherwise(call):
+    assert call(_wait_for_publish, ChangeHub()) == (True, False)
+
+def test_a_failing_listener_does_not_stop_the_others(call):
+    local, seen = ChangeHub(), []
+
+    def broken(event):
+        raise RuntimeError("listener failed")
+
+    local.add_listener(broken)
+    local.add_listener(seen.append)
+    call(_publish, local, ("employee", "deleted", [7]))
+    assert [event["ids"] for event in seen] == [[7]]
+
+class FakeRequest:
+    """Just enough of a Request for the stream: headers and a disconnect after a few polls"""
+
+    def __init__(self, headers: dict, polls: int):
+        self.headers = headers
+        self.polls = polls
+
+    async def is_disconnected(self) -> bool:
+        self.polls -= 1
+        return self.polls < 0
+
+async def _read_stream(request: FakeRequest, role: str) -> list:
+    response = await events_route.change_events(request, {"user_id": 1, "role": role})
+    return [chunk async for chunk in response.body_iterator]
+
+def test_stream_replays_events_after_last_event_id(call, monkeypatch):
+    monkeypatch.setattr(events_route, "KEEPALIVE_SECONDS", 0.01)
+    cursor = hub.last_id
+    call(_publish, hub, ("user", "updated", [1]), ("employee", "updated", [42]))
+
+    chunks = call(_read_stream, FakeRequest({"last-event-id": str(cursor)}, polls=2), "hr")
+    assert chunks[0] == "retry: 3000\n\n"
+    # Non-admins do not see user changes; an idle poll sends a keep-alive
+    assert [decode(chunk)["ids"] for chunk in chunks[1:-1]] == [[42]]
+    assert chunks[-1] == ": keep-alive\n\n"
+    assert hub.subscribers == 0
+
+def test_a_client_too_far_behind_is_told_to_refresh(call, monkeypatch):
+    monkeypatch.setattr(events_route, "KEEPALIVE_SECONDS", 0.01)
+    call(_publish, hub, ("employee", "updated", [1]))
+    chunks = call(_read_stream, FakeRequest({"last-event-id": "-5000"}, polls=1), "admin")
+    assert decode(chunks[1]) == {"entity": "all", "action": "refresh", "ids": []}
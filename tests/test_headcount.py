@@ -0,0 +1,68 @@
+"""Headcount and turnover series (app/headcount.py, GET /api/reports/headcount)"""
+from datetime import date
+from app.headcount import headcount_series, series_to_csv
+
+def test_daily_headcount_counts_the_leave_date_as_a_working_day():
+    series = headcount_series(["2024-03-02"], ["2024-03-04"], date(2024, 3, 1), date(2024, 3, 5), "day")
+    assert [day["headcount"] for day in series] == [0, 1, 1, 1, 0]
+    assert [day["hires"] for day in series] == [0, 1, 0, 0, 0]
+    assert [day["leavers"] for day in series] == [0, 0, 0, 1, 0]
+
+def test_missing_dates_mean_before_and_after_the_range():
+    series = headcount_series([None, "2000-01-01"], [None, None], date(2024, 1, 1), date(2024, 1, 2), "day")
+    assert [day["headcount"] for day in series] == [2, 2]
+    assert sum(day["hires"] for day in series) == 0
+
+def test_monthly_series_reports_period_end_average_and_turnover():
+    starts = ["2020-01-01", "2020-01-01", "2024-02-16"]
+    leaves = [None, "2024-01-31", None]
+    january, february = headcount_series(starts, leaves, date(2024, 1, 1), date(2024, 2, 29))
+    assert january == {
+        "period": "2024-01", "headcount": 2, "average_headcount": 2.0,
+        "hires": 0, "leavers": 1, "turnover_rate": 50.0,
+    }
+    assert february["headcount"] == 2
+    assert february["hires"] == 1
+    # One person for 15 days, two for 14 days of a 29-day month
+    assert february["average_headcount"] == round((15 + 2 * 14) / 29, 2)
+
+def test_csv_has_one_row_per_period():
+    csv_text = series_to_csv(headcount_series([], [], date(2024, 1, 1), date(2024, 3, 31)))
+    lines = csv_text.strip().splitlines()
+    assert lines[0] == "period,headcount,average_headcount,hires,leavers,turnover_rate"
+    assert [line.split(",")[0] for line in lines[1:]] == ["2024-01", "2024-02", "2024-03"]
+
+def test_report_filters_by_employment(client, add_employee):
+    add_employee("H1", start_date="2024-01-16", leave_date="2024-03-15", employment="part-time")
+    add_employee("H2", start_date="2024-02-01", employment="full-time")
+    report = client.get(
+        "/api/reports/headcount", params={"start": "2024-01-01", "end": "2024-04-30", "employment": "part-time"}
+    ).json()
+    assert report["employees"] == 1
+    assert [month["headcount"] for month in report["series"]] == [1, 1, 0, 0]
+
+def test_report_includes_archived_employees(client, call, add_employee):
+    from app import archive
+    add_employee("H1", start_date="2010-01-01", leave_date="2012-12-31")
+    call(archive.archive_departed)
+    report = client.get("/api/reports/headcount", params={"start": "2012-12-01", "end": "2013-01-31"}).json()
+    # The leave date is a working day, so December still ends with them employed
+    assert [month["headcount"] for month in report["series"]] == [1, 0]
+    assert [month["leavers"] for month in report["series"]] == [1, 0]
+
+def test_report_as_csv(client, add_employee):
+    add_employee("H1", start_date="2024-03-14")
+    response = client.get(
+        "/api/reports/headcount",
+        params={"start": "2024-03-13", "end": "2024-03-15", "interval": "day", "format": "csv"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines()[1:] == [
+        "2024-03-13,0,0.0,0,0,0.0", "2024-03-14,1,1.0,1,0,0.0", "2024-03-15,1,1.0,0,0,0.0",
+    ]
+
+def test_report_rejects_bad_parameters(client):
+    assert client.get("/api/reports/headcount", params={"interval": "week"}).status_code == 400
+    assert client.get("/api/reports/headcount", params={"start": "2024-05-01", "end": "2024-01-01"}).status_code == 400
+    assert client.get("/api/reports/headcount", params={"format": "xml"}).status_code == 400
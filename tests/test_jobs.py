@@ -0,0 +1,110 @@
+"""Background job runner and heartbeat (app/jobs.py)"""
+import asyncio
+import threading
+import time
+import sqlalchemy
+import app.db as db
+import app.jobs as jobs
+
+calls = {"flaky": 0, "busy": 0}
+
+@jobs.job_type("test_flaky")
+async def flaky(ctx: jobs.JobContext) -> dict:
+    calls["flaky"] += 1
+    if calls["flaky"] == 1:
+        raise RuntimeError("first attempt fails")
+    return {"calls": calls["flaky"]}
+
+@jobs.job_type("test_slow")
+async def slow(ctx: jobs.JobContext) -> dict:
+    for step in range(200):
+        await asyncio.sleep(0.02)
+        await ctx.progress(step / 200, checkpoint={"step": step})
+    return {}
+
+@jobs.job_type("test_busy")
+async def busy(ctx: jobs.JobContext) -> dict:
+    calls["busy"] += 1
+    # Holds the event loop, so only the heartbeat thread can keep the claim alive
+    started = time.monotonic()
+    while time.monotonic() - started < 1.5:
+        sum(range(10000))
+    return {"ok": True}
+
+def wait_for(client, job_id: str, statuses=("succeeded", "failed", "cancelled")) -> dict:
+    for _ in range(100):
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} stuck in {job['status']}")
+
+def test_export_job_writes_a_downloadable_file(client, add_employee):
+    add_employee("J1")
+    add_employee("J2")
+    response = client.post("/api/jobs", json={"kind": "employee_export"})
+    assert response.status_code == 202
+
+    job = wait_for(client, response.json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"rows": 2} and job["progress"] == 1 and job["has_file"]
+    lines = client.get(f"/api/jobs/{job['job_id']}/result").text.splitlines()
+    assert len(lines) == 3 and "J2" in lines[2]
+
+def test_unknown_kind_is_rejected(client):
+    response = client.post("/api/jobs", json={"kind": "nope"})
+    assert response.status_code == 400
+
+def test_fixed_job_id_is_idempotent_and_retry_requeues_failures(client, call):
+    calls["flaky"] = 0
+    job_id = call(lambda: jobs.submit_job("test_flaky", job_id="flaky-once"))
+    assert wait_for(client, job_id)["status"] == "failed"
+
+    # Submitting the same id again does nothing...
+    call(lambda: jobs.submit_job("test_flaky", job_id="flaky-once"))
+    time.sleep(0.3)
+    assert client.get(f"/api/jobs/{job_id}").json()["status"] == "failed"
+
+    # ...unless the caller asks to retry a failed job
+    call(lambda: jobs.submit_job("test_flaky", job_id="flaky-once", retry_failed=True))
+    job = wait_for(client, job_id)
+    assert job["status"] == "succeeded" and job["result"] == {"calls": 2}
+    assert job["attempts"] == 1 and job["error"] is None
+
+def test_cancel_stops_a_running_job(client):
+    job_id = client.post("/api/jobs", json={"kind": "test_slow"}).json()["job_id"]
+    wait_for(client, job_id, statuses=("running",))
+    time.sleep(0.2)
+
+    client.post(f"/api/jobs/{job_id}/cancel")
+    job = wait_for(client, job_id)
+    assert job["status"] == "cancelled"
+    assert 0 < job["progress"] < 1
+
+def test_heartbeat_keeps_a_busy_job_claimed(client, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_HEARTBEAT_SECONDS", 0.1)
+    calls["busy"] = 0
+    requeued = []
+
+    def other_worker():
+        # Another worker's recover_stale with a short stale window
+        time.sleep(1)
+        with db.engine.begin() as connection:
+            result = connection.execute(
+                sqlalchemy.text(
+                    "UPDATE Job SET status = 'queued', claim = NULL "
+                    "WHERE status = 'running' AND heartbeat_at < :cutoff"
+                ),
+                {"cutoff": time.time() - 0.5}
+            )
+            requeued.append(result.rowcount)
+
+    job_id = client.post("/api/jobs", json={"kind": "test_busy"}).json()["job_id"]
+    worker = threading.Thread(target=other_worker)
+    worker.start()
+    job = wait_for(client, job_id)
+    worker.join()
+
+    assert requeued == [0]
+    assert job["status"] == "succeeded" and job["attempts"] == 1
+    assert calls["busy"] == 1
@@ -0,0 +1,66 @@
+"""Per-request batching loader (app/loader.py)"""
+import asyncio
+import app.db as db
+from app.loader import RequestLoader
+
+async def _gather_users(loader: RequestLoader, ids):
+    return await asyncio.gather(*(loader.load("user", user_id) for user_id in ids))
+
+def test_loads_in_one_tick_share_one_query(client, call):
+    loader = RequestLoader()
+    admin, missing, again = call(_gather_users, loader, [1, 999, 1])
+    assert admin["username"] == "admin"
+    assert missing is None and again is admin
+    assert loader.stats == {"queries": 1, "hits": 1}
+
+    # Cached for the rest of the request, including "not found"
+    call(_gather_users, loader, [1, 999])
+    assert loader.stats == {"queries": 1, "hits": 3}
+
+def test_employee_rows_are_batched_too(client, call, add_employee):
+    first, second = add_employee("L1"), add_employee("L2")
+    loader = RequestLoader()
+    rows = call(lambda: loader.load_many("employee", [first, second]))
+    assert [row.emp_code for row in rows] == ["L1", "L2"]
+    assert loader.stats["queries"] == 1
+
+async def _memo_twice(loader: RequestLoader, calls: list):
+    async def fetch():
+        calls.append(1)
+        return "value"
+    return await asyncio.gather(loader.memo("key", fetch), loader.memo("key", fetch))
+
+def test_memo_runs_each_key_once(client, call):
+    loader, calls = RequestLoader(), []
+    assert call(_memo_twice, loader, calls) == ["value", "value"]
+    assert calls == [1]
+
+async def _prime_and_load(loader: RequestLoader):
+    loader.prime("user", 1, {"user_id": 1, "username": "primed"})
+    return await loader.load("user", 1)
+
+def test_prime_replaces_the_cached_row(client, call):
+    loader = RequestLoader()
+    assert call(_prime_and_load, loader)["username"] == "primed"
+    assert loader.stats["queries"] == 0
+
+async def _load_inside_transaction(loader: RequestLoader):
+    transaction = await db.database.transaction().start()
+    try:
+        await db.database.execute("UPDATE User SET email = 'changed@example.com' WHERE user_id = 1")
+        return await loader.load("user", 1)
+    finally:
+        await transaction.rollback()
+
+def test_load_sees_the_callers_uncommitted_writes(client, call):
+    assert call(_load_inside_transaction, RequestLoader())["email"] == "changed@example.com"
+
+async def _cancel_first_loader(loader: RequestLoader):
+    first = asyncio.ensure_future(loader.load("user", 1))
+    second = asyncio.ensure_future(loader.load("user", 999))
+    await asyncio.sleep(0)
+    first.cancel()
+    return await asyncio.wait_for(second, 5)
+
+def test_other_waiters_are_answered_when_the_loading_task_is_cancelled(client, call):
+    assert call(_cancel_first_loader, RequestLoader()) is None
@@ -0,0 +1,61 @@
+"""Payroll projection (app/payroll.py, GET /api/reports/payroll)"""
+from datetime import date
+import pytest
+from app.payroll import PayrollFrame, project
+
+def frame(*employees):
+    """employees as (salary, start_date, leave_date, employment) tuples"""
+    return PayrollFrame.from_columns(*zip(*employees))
+
+def test_full_months_cost_the_whole_salary():
+    result = project(frame((3000, "2020-01-01", None, "full-time")), date(2024, 1, 1), months=2)
+    assert [month["total_cost"] for month in result["months"]] == [3000, 3000]
+    assert result["total_cost"] == 6000
+
+def test_partial_months_are_prorated_by_day():
+    # Starts on the 16th of a 31-day month and leaves on 15 March (last paid day)
+    result = project(frame((3100, "2024-01-16", "2024-03-15", "part-time")), date(2024, 1, 1), months=4)
+    months = result["months"]
+    assert [month["total_cost"] for month in months] == [1600, 3100, 1500, 0]
+    assert [month["headcount"] for month in months] == [1, 1, 1, 0]
+    assert [month["prorated_headcount"] for month in months] == [1, 0, 1, 0]
+
+def test_costs_are_broken_down_by_employment_type():
+    result = project(
+        frame((1000, "2020-01-01", None, "Full-Time"), (500, "2020-01-01", None, None)), date(2024, 1, 1), months=1
+    )
+    assert result["months"][0]["by_employment"] == {
+        "full-time": {"cost": 1000, "headcount": 1},
+        "unspecified": {"cost": 500, "headcount": 1},
+    }
+
+def test_annual_salaries_are_divided_by_twelve(monkeypatch):
+    monkeypatch.setattr("app.payroll.PAYROLL_SALARY_PERIOD", "annual")
+    result = project(frame((12000, "2020-01-01", None, "full-time")), date(2024, 1, 1), months=1)
+    assert result["total_cost"] == 1000
+
+def test_report_counts_archived_periods_and_not_the_gap(client, call, add_employee):
+    from app import archive
+    employee_id = add_employee("P1", salary=1000, start_date="2010-01-01", leave_date="2012-12-31", employment="full-time")
+    add_employee("P2", salary=2000, start_date="2010-01-01", employment="full-time")
+    call(archive.archive_departed)
+    call(archive.restore_employee, employee_id, None, date(2014, 1, 1))
+
+    def month(start):
+        return client.get("/api/reports/payroll", params={"start": start, "months": 1}).json()["months"][0]
+
+    assert (month("2012-06")["headcount"], month("2012-06")["total_cost"]) == (2, 3000)
+    assert (month("2013-06")["headcount"], month("2013-06")["total_cost"]) == (1, 2000)
+    assert (month("2014-06")["headcount"], month("2014-06")["total_cost"]) == (2, 3000)
+
+def test_report_is_recomputed_after_a_write(client, add_employee):
+    add_employee("P1", salary=1000, start_date="2020-01-01")
+    first = client.get("/api/reports/payroll", params={"start": "2024-01", "months": 1}).json()
+    add_employee("P2", salary=500, start_date="2020-01-01")
+    second = client.get("/api/reports/payroll", params={"start": "2024-01", "months": 1}).json()
+    assert (first["total_cost"], second["total_cost"]) == (1000, 1500)
+    assert second["data_version"] > first["data_version"]
+
+@pytest.mark.parametrize("params", [{"start": "2024-13"}, {"start": "bad"}, {"months": 0}])
+def test_report_rejects_bad_parameters(client, params):
+    assert client.get("/api/reports/payroll", params=params).status_code in (400, 422)
@@ -0,0 +1,69 @@
+"""Employee photos and thumbnails (app/photos.py, app/routes/photos.py)"""
+import hashlib
+import io
+import os
+from urllib.parse import unquote_plus
+from PIL import Image
+from app import photos
+
+def png_bytes(size=(300, 200)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+def upload(client, employee_id: int, content: bytes):
+    return client.post(
+        f"/employees/{employee_id}/photo",
+        files={"photo": ("photo.png", content, "image/png")},
+        follow_redirects=False,
+    )
+
+def test_upload_stores_the_photo_by_content_hash(client, add_employee, fetch_one):
+    employee_id = add_employee("P1")
+    content = png_bytes()
+    assert upload(client, employee_id, content).status_code == 303
+
+    photo_hash = hashlib.sha256(content).hexdigest()
+    assert fetch_one("SELECT photo_hash FROM Employee WHERE employee_id = :id", {"id": employee_id}) == {"photo_hash": photo_hash}
+    with open(photos.original_path(photo_hash), "rb") as stored:
+        assert stored.read() == content
+
+def test_thumbnails_are_served_with_immutable_caching(client):
+    missing = client.get(f"/photos/{'0' * 64}/80.webp")
+    assert missing.status_code == 404
+    assert missing.headers["cache-control"] == "no-store"
+
+    # Not uploaded, so no thumbnail job races this test
+    content = png_bytes((120, 400))
+    photo_hash = hashlib.sha256(content).hexdigest()
+    os.makedirs(os.path.dirname(photos.original_path(photo_hash)), exist_ok=True)
+    with open(photos.original_path(photo_hash), "wb") as original:
+        original.write(content)
+    assert len(photos.make_thumbnails(photo_hash)) == len(photos.PHOTO_THUMB_SIZES) * len(photos.PHOTO_THUMB_FORMATS)
+
+    response = client.get(f"/photos/{photo_hash}/80.webp")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "private, max-age=31536000, immutable"
+    assert Image.open(io.BytesIO(response.content)).size == (80, 80)
+    assert client.get(f"/photos/{photo_hash}/81.webp").status_code == 404
+
+def test_files_that_are_not_images_are_rejected(client, add_employee, fetch_one):
+    employee_id = add_employee("P1")
+    response = upload(client, employee_id, b"not an image")
+    assert "File is not a readable image" in unquote_plus(response.headers["location"])
+    assert fetch_one("SELECT photo_hash FROM Employee WHERE employee_id = :id", {"id": employee_id}) == {"photo_hash": None}
+
+def test_oversized_uploads_get_413(client, add_employee, monkeypatch):
+    employee_id = add_employee("P1")
+    monkeypatch.setattr(photos, "PHOTO_MAX_BYTES", 10 * 1024 * 1024)
+    response = upload(client, employee_id, b"\0" * (photos.PHOTO_MAX_BYTES + photos.PHOTO_FORM_OVERHEAD + 1))
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Photo is larger than 10 MB"}
+
+def test_size_limit_message_below_one_megabyte(client, add_employee, monkeypatch):
+    employee_id = add_employee("P1")
+    monkeypatch.setattr(photos, "PHOTO_MAX_BYTES", 500 * 1024)
+    response = upload(client, employee_id, b"\0" * (photos.PHOTO_MAX_BYTES + photos.PHOTO_FORM_OVERHEAD + 1))
+    assert response.json() == {"detail": "Photo is larger than 500 KB"}
+    monkeypatch.setattr(photos, "PHOTO_MAX_BYTES", 1536 * 1024)
+    assert photos._too_large_message() == "Photo is larger than 1.5 MB"
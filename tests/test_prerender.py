@@ -0,0 +1,58 @@
+"""Pre-rendered anonymous and error pages (app/prerender.py)"""
+import pytest
+import app.prerender as prerender
+from app.prerender import pages
+
+@pytest.fixture
+def anonymous(client):
+    """The shared client without its login cookie"""
+    saved = list(client.cookies.jar)
+    client.cookies.clear()
+    yield client
+    for cookie in saved:
+        client.cookies.jar.set_cookie(cookie)
+
+def test_login_page_is_served_from_cache(anonymous):
+    hits = pages.stats["hits"]
+    response = anonymous.get("/login", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.content == pages._pages["login"].body
+    assert response.headers["etag"] == pages._pages["login"].etag
+    assert "content-encoding" not in response.headers
+    assert pages.stats["hits"] == hits + 1
+
+    compressed = anonymous.get("/login", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.content == response.content
+
+    revalidated = anonymous.get("/login", headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["vary"] == "Cookie, Accept-Encoding"
+
+def test_flash_messages_render_live(anonymous):
+    live = pages.stats["live_renders"]
+    response = anonymous.get("/login", params={"message": "Password changed"})
+    assert "Password changed" in response.text
+    assert response.content != pages._pages["login"].body
+    assert pages.stats["live_renders"] == live + 1
+
+def test_not_found_page_keeps_its_status(anonymous):
+    response = anonymous.get("/no-such-page", headers={"Accept": "text/html"})
+    assert response.status_code == 404
+    assert response.content == pages._pages["not_found"].body
+
+    # Error pages are never answered with 304
+    again = anonymous.get(
+        "/no-such-page", headers={"Accept": "text/html", "If-None-Match": response.headers["etag"]}
+    )
+    assert again.status_code == 404
+
+def test_template_change_rebuilds_pages(anonymous, monkeypatch):
+    builds = pages.stats["builds"]
+    monkeypatch.setattr(prerender, "PRERENDER_CHECK_INTERVAL", 0)
+    anonymous.get("/login")
+    assert pages.stats["builds"] == builds
+
+    monkeypatch.setattr(prerender, "templates_mtime", lambda: pages._mtime + 1)
+    anonymous.get("/login")
+    assert pages.stats["builds"] == builds + 1
@@ -0,0 +1,18 @@
+"""Profile routes (app/routes/profile.py)"""
+import app.db as db
+from app.auth import verify_password
+
+def change_password(client, current: str, new: str):
+    return client.post("/profile/change-password", data={"current_password": current, "new_password": new})
+
+def test_change_password_checks_the_current_one(client, call, fetch_one):
+    original = fetch_one("SELECT password_hash FROM User WHERE username = 'admin'")["password_hash"]
+    try:
+        assert "Current password is incorrect" in change_password(client, "wrong", "N3w-password!").text
+        assert "Password changed successfully" in change_password(client, "admin123", "N3w-password!").text
+        stored = fetch_one("SELECT password_hash FROM User WHERE username = 'admin'")["password_hash"]
+        assert verify_password("N3w-password!", stored)
+    finally:
+        call(
+            db.database.execute, "UPDATE User SET password_hash = :hash WHERE username = 'admin'", {"hash": original}
+        )
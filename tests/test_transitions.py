@@ -0,0 +1,73 @@
+"""Leave-date transitions (app/transitions.py)"""
+import json
+from datetime import date, timedelta
+from app import transitions
+
+TODAY = date.today()
+
+def days_from_today(days: int) -> str:
+    return (TODAY + timedelta(days=days)).isoformat()
+
+def employment_status(fetch_one, employee_id):
+    return fetch_one(
+        "SELECT status, employment_status FROM Employee WHERE employee_id = :id", {"id": employee_id}
+    )
+
+def test_marks_only_employees_whose_leave_date_has_passed(call, add_employee, fetch_one):
+    past = add_employee("T1", leave_date=days_from_today(-1), status="married")
+    today = add_employee("T2", leave_date=days_from_today(0))
+    future = add_employee("T3", leave_date=days_from_today(5))
+    current = add_employee("T4")
+
+    assert call(transitions.apply_due_transitions) == [past]
+    # Marital status is left alone
+    assert employment_status(fetch_one, past) == {"status": "married", "employment_status": transitions.LEAVER_STATUS}
+    for employee_id in (today, future, current):
+        assert employment_status(fetch_one, employee_id)["employment_status"] is None
+
+def test_second_run_changes_nothing(call, add_employee):
+    add_employee("T1", leave_date=days_from_today(-3))
+    assert len(call(transitions.apply_due_transitions)) == 1
+    assert call(transitions.apply_due_transitions) == []
+
+def test_logs_one_entry_with_previous_values(call, add_employee, fetch_one):
+    first = add_employee("T1", leave_date=days_from_today(-2))
+    second = add_employee("T2", leave_date=days_from_today(-1))
+    call(transitions.apply_due_transitions)
+
+    log = fetch_one("SELECT log_id, changed_fields, details FROM Log WHERE action = 'EMPLOYEE_STATUS_TRANSITION'")
+    details = json.loads(log["details"])
+    assert log["changed_fields"] == "employment_status"
+    assert details["codes"] == ["T1", "T2"]
+    assert details["previous"] == {"T1": {"employment_status": None}, "T2": {"employment_status": None}}
+    subjects = fetch_one("SELECT COUNT(*) AS n FROM LogSubject WHERE log_id = :log_id", {"log_id": log["log_id"]})
+    assert subjects["n"] == 2
+
+def test_next_due_is_the_day_after_the_earliest_pending_leave_date(call, add_employee):
+    assert call(transitions.next_due_transition) is None
+    add_employee("T1", leave_date=days_from_today(10))
+    add_employee("T2", leave_date=days_from_today(3))
+    assert call(transitions.next_due_transition) == TODAY + timedelta(days=4)
+
+def test_repair_moves_leaver_status_out_of_marital_status(call, add_employee, fetch_one):
+    employee_id = add_employee("T1", leave_date=days_from_today(-30), status="Resigned")
+    assert call(transitions.repair_leaver_statuses) == 1
+    assert employment_status(fetch_one, employee_id) == {"status": None, "employment_status": "resigned"}
+    assert fetch_one("SELECT COUNT(*) AS n FROM Log WHERE action = 'EMPLOYEE_STATUS_REPAIRED'")["n"] == 1
+
+def test_moving_leave_date_into_the_future_clears_the_leaver_state(client, call, add_employee, fetch_one):
+    employee_id = add_employee("T1", start_date="2020-01-01", leave_date=days_from_today(-1))
+    call(transitions.apply_due_transitions)
+
+    response = client.post(
+        "/api/employees/bulk-update", json={"ids": [employee_id], "patch": {"leave_date": days_from_today(7)}}
+    )
+    assert response.json()["affected"] == 1
+    assert employment_status(fetch_one, employee_id)["employment_status"] is None
+
+def test_changing_to_another_past_leave_date_keeps_the_leaver_state(client, call, add_employee, fetch_one):
+    employee_id = add_employee("T1", start_date="2020-01-01", leave_date=days_from_today(-1))
+    call(transitions.apply_due_transitions)
+
+    client.post("/api/employees/bulk-update", json={"ids": [employee_id], "patch": {"leave_date": days_from_today(-5)}})
+    assert employment_status(fetch_one, employee_id)["employment_status"] == transitions.LEAVER_STATUS
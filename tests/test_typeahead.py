@@ -0,0 +1,80 @@
+"""Typeahead prefix index (app/typeahead.py)"""
+from app import typeahead
+
+def codes(client, q: str, **params) -> list:
+    response = client.get("/api/employees/lookup", params={"q": q, **params})
+    assert response.status_code == 200
+    return [employee["emp_code"] for employee in response.json()["employees"]]
+
+def test_exact_terms_then_codes_names_and_emails(client, add_employee):
+    add_employee("SOM01", first_name="Anna", last_name="Lee")
+    add_employee("X2", first_name="Somchai", last_name="Jaidee")
+    add_employee("X3", first_name="Som", last_name="Wong")
+    add_employee("X4", first_name="Ben", last_name="Kim", email="somsak@example.com")
+    assert codes(client, "som") == ["X3", "SOM01", "X2", "X4"]
+
+def test_matches_either_name_order(client, add_employee):
+    add_employee("X1", first_name="John", last_name="Smith")
+    add_employee("X2", first_name="Jane", last_name="Doe")
+    assert codes(client, "smith j") == ["X1"]
+    assert codes(client, "john sm") == ["X1"]
+
+def test_index_follows_creates_updates_and_deletes(client, add_employee):
+    employee_id = add_employee("X1", first_name="Somchai")
+    assert codes(client, "somc") == ["X1"]
+    client.post("/api/employees/bulk-update", json={"ids": [employee_id], "patch": {"first_name": "Niran"}})
+    assert codes(client, "somc") == []
+    assert codes(client, "nir") == ["X1"]
+    client.post("/api/employees/bulk-delete", json={"ids": [employee_id]})
+    assert codes(client, "nir") == []
+    assert typeahead.get_typeahead_stats()["incremental_updates"] > 0
+
+def test_limit_and_empty_query(client, add_employee):
+    for n in range(5):
+        add_employee(f"X{n}")
+    assert len(codes(client, "x", limit=3)) == 3
+    assert codes(client, "  ") == []
+
+def test_scan_limit_keeps_exact_and_code_matches(monkeypatch):
+    monkeypatch.setattr(typeahead, "TYPEAHEAD_SCAN_LIMIT", 2)
+    index = typeahead.PrefixIndex([
+        (1, "X1", "Ea", "Lee", None, None),
+        (2, "X2", "Eb", "Lee", None, None),
+        (3, "X3", "Ec", "Lee", None, None),
+        (4, "EMP4", "Ann", "Lee", None, None),
+        (5, "X5", "E", "Wong", None, None),
+    ])
+    # The two name entries scanned ("e", "e wong") are both X5's
+    assert [record["emp_code"] for record in index.search("e", 3)] == ["X5", "EMP4"]
+
+async def _mark_stale():
+    typeahead._index.version = None
+
+async def _wait_for_rebuild():
+    await typeahead._rebuild_task
+
+def test_stale_lookup_answers_from_sql_and_rebuilds_in_the_background(client, call, add_employee):
+    add_employee("X1", first_name="Somchai")
+    call(_mark_stale)
+    before = typeahead.get_typeahead_stats()
+    assert codes(client, "somc") == ["X1"]
+    after = typeahead.get_typeahead_stats()
+    assert after["fallback_lookups"] == before["fallback_lookups"] + 1
+    assert after["stale_rebuilds"] == before["stale_rebuilds"] + 1
+
+    call(_wait_for_rebuild)
+    assert typeahead.get_typeahead_stats()["version"] is not None
+    assert codes(client, "somc") == ["X1"]
+
+def test_over_the_byte_cap_lookups_use_sql(client, call, add_employee, monkeypatch):
+    add_employee("X1", first_name="Somchai")
+    monkeypatch.setattr(typeahead, "TYPEAHEAD_MAX_BYTES", 100)
+    call(typeahead.build)
+    assert typeahead.get_typeahead_stats()["over_capacity"] is True
+    assert codes(client, "somc") == ["X1"]
+
+    monkeypatch.undo()
+    call(typeahead.build)
+    stats = typeahead.get_typeahead_stats()
+    assert stats["over_capacity"] is False
+    assert 0 < stats["memory_bytes"] < stats["max_bytes"]